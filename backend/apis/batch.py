@@ -0,0 +1,184 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, ValidationError
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from apis.conduit import add_conduit, edit_conduit, remove_conduit
+from apis.junction import add_junction, edit_junction, remove_junction
+from apis.outfall import add_outfall, edit_outfall, remove_outfall
+from apis.subcatchment import add_subcatchment, edit_subcatchment, remove_subcatchment
+from apis.timeseries import add_timeseries, edit_timeseries, remove_timeseries
+from apis.transect import add_transect, edit_transect, remove_transect
+from schemas.batch import (
+    BatchAction,
+    BatchEntityType,
+    BatchOperationModel,
+    BatchRequest,
+)
+from schemas.conduit import ConduitRequestModel
+from schemas.junction import JunctionModel
+from schemas.outfall import OutfallModel
+from schemas.result import Result
+from schemas.subcatchment import PolygonModel, SubCatchmentModel
+from schemas.timeseries import TimeSeriesModel
+from schemas.transect import TransectModel
+from utils.model_store import ModelStore
+from utils.utils import IfMatchHeader, with_exception_handler
+
+batchRouter = APIRouter()
+
+E, A = BatchEntityType, BatchAction
+
+
+def _create_subcatchment(INP, operation, data: PolygonModel) -> None:
+    # 新建子汇水区的数据为边界(与 POST /subcatchment 相同),新建的默认参数不作为结果返回
+    add_subcatchment(INP, data)
+
+
+# (实体类型, 操作) -> (data 的数据模型, 执行函数)
+# 执行函数为 fn(INP, operation, data),返回被级联修改/删除的对象名称(没有时返回 None)
+_OPERATIONS: Dict[
+    Tuple[BatchEntityType, BatchAction],
+    Tuple[Optional[Type[BaseModel]], Callable],
+] = {
+    (E.JUNCTION, A.CREATE): (JunctionModel, lambda INP, op, d: add_junction(INP, d)),
+    (E.JUNCTION, A.UPDATE): (
+        JunctionModel,
+        lambda INP, op, d: edit_junction(INP, op.id, d),
+    ),
+    (E.JUNCTION, A.DELETE): (None, lambda INP, op, d: remove_junction(INP, op.id)),
+    (E.OUTFALL, A.CREATE): (OutfallModel, lambda INP, op, d: add_outfall(INP, d)),
+    (E.OUTFALL, A.UPDATE): (
+        OutfallModel,
+        lambda INP, op, d: edit_outfall(INP, op.id, d),
+    ),
+    (E.OUTFALL, A.DELETE): (None, lambda INP, op, d: remove_outfall(INP, op.id)),
+    (E.CONDUIT, A.CREATE): (
+        ConduitRequestModel,
+        lambda INP, op, d: add_conduit(INP, d),
+    ),
+    (E.CONDUIT, A.UPDATE): (
+        ConduitRequestModel,
+        lambda INP, op, d: edit_conduit(INP, op.id, d),
+    ),
+    (E.CONDUIT, A.DELETE): (None, lambda INP, op, d: remove_conduit(INP, op.id)),
+    (E.SUBCATCHMENT, A.CREATE): (PolygonModel, _create_subcatchment),
+    (E.SUBCATCHMENT, A.UPDATE): (
+        SubCatchmentModel,
+        lambda INP, op, d: edit_subcatchment(INP, op.id, d),
+    ),
+    (E.SUBCATCHMENT, A.DELETE): (
+        None,
+        lambda INP, op, d: remove_subcatchment(INP, op.id),
+    ),
+    (E.TRANSECT, A.CREATE): (TransectModel, lambda INP, op, d: add_transect(INP, d)),
+    (E.TRANSECT, A.UPDATE): (
+        TransectModel,
+        lambda INP, op, d: edit_transect(INP, op.id, d),
+    ),
+    (E.TRANSECT, A.DELETE): (None, lambda INP, op, d: remove_transect(INP, op.id)),
+    (E.TIMESERIES, A.CREATE): (
+        TimeSeriesModel,
+        lambda INP, op, d: add_timeseries(INP, d, op.type),
+    ),
+    (E.TIMESERIES, A.UPDATE): (
+        TimeSeriesModel,
+        lambda INP, op, d: edit_timeseries(INP, op.id, d, op.type),
+    ),
+    (E.TIMESERIES, A.DELETE): (
+        None,
+        lambda INP, op, d: remove_timeseries(INP, op.id, op.type),
+    ),
+}
+
+
+def _describe(index: int, operation: BatchOperationModel) -> str:
+    target = f" [ {operation.id} ]" if operation.id else ""
+    kind = f"{operation.entity.value} {operation.action.value}"
+    return f"第 {index + 1} 个操作({kind}{target})"
+
+
+def _error_text(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+            for error in exc.errors()
+        )
+    return str(getattr(exc, "detail", exc))
+
+
+def _parse_data(index: int, operation: BatchOperationModel) -> Optional[BaseModel]:
+    """按实体类型和操作校验 data,与单个接口的请求体校验一致"""
+    model, _ = _OPERATIONS[(operation.entity, operation.action)]
+    if model is None:
+        return None
+    try:
+        return model.model_validate(operation.data)
+    except (ValidationError, HTTPException) as exc:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{_describe(index, operation)} 数据格式错误: {_error_text(exc)}",
+        )
+
+
+def _target_name(operation: BatchOperationModel, data: Optional[BaseModel]) -> str:
+    """操作完成后对象的名称(新建、改名后为新名称)"""
+    if data is None:
+        return operation.id
+    if isinstance(data, PolygonModel):
+        return data.subcatchment
+    return data.name
+
+
+@batchRouter.post(
+    "/batch",
+    summary="批量新建/修改/删除模型对象",
+    description=(
+        "按顺序执行节点、出口、渠道、子汇水区、不规则断面、时间序列的新建/修改/删除操作,"
+        "各操作的数据与对应单个接口相同。全部操作在同一次模型修改中执行并只写一次文件,"
+        "任一操作失败时全部撤销;成功时返回每个操作的结果及新的模型版本号"
+    ),
+    response_model=Result,
+)
+@with_exception_handler(default_message="批量修改失败,文件有误,发生未知错误")
+async def batch_mutate(request: BatchRequest, if_match: IfMatchHeader = None):
+    # 1. 先在内存中校验全部操作的数据,不通过时不修改模型
+    operations = request.operations
+    parsed = [_parse_data(i, operation) for i, operation in enumerate(operations)]
+
+    # 2. 在同一次 mutate 中依次执行,任一操作失败时恢复快照
+    results: List[dict] = []
+    async with ModelStore.mutate(if_match, atomic=True) as INP:
+        for i, (operation, data) in enumerate(zip(operations, parsed)):
+            name = _target_name(operation, data)
+            _, execute = _OPERATIONS[(operation.entity, operation.action)]
+            try:
+                related = execute(INP, operation, data)
+            except Exception as exc:
+                # 任何异常都会使 mutate 恢复快照,这里只负责说明是哪个操作失败
+                reason = _error_text(exc)
+                raise HTTPException(
+                    status_code=getattr(exc, "status_code", 500),
+                    detail={
+                        "message": (
+                            f"批量修改失败,{_describe(i, operation)}失败: {reason},"
+                            f"全部操作均未生效"
+                        ),
+                        "failed_index": i,
+                        "reason": reason,
+                        "results": results,
+                    },
+                )
+            results.append(
+                {
+                    "index": i,
+                    "entity": operation.entity.value,
+                    "action": operation.action.value,
+                    "id": name,
+                    "related": related or [],
+                }
+            )
+
+    return Result.success_result(
+        message=f"批量修改成功,共执行 {len(results)} 个操作",
+        data={"results": results},
+    )
@@ -1,20 +1,51 @@
-from fastapi import APIRouter, HTTPException
-from swmm_api import SwmmInput, swmm5_run
-from swmm_api.input_file.sections import OptionSection
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from typing import Annotated, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+import pandas as pd
+from swmm_api import SwmmInput
+from swmm_api.input_file.sections import OptionSection, RainGage
+from swmm_api.input_file.sections.link import Conduit
+from swmm_api.input_file.sections.others import TimeseriesData
 from datetime import datetime, timezone, timedelta
-from pathlib import Path
-import re
-from schemas.calculate import CalculateModel
+from schemas.calculate import (
+    CalculateModel,
+    CalculateJobRequest,
+    CalculateJobStatus,
+    ScenarioBatchRequest,
+    ScenarioModel,
+    ScenarioSummaryModel,
+)
 from schemas.result import Result
-from swmm_api import SwmmOutput
+from schemas.timeseries import TIMESERIES_PREFIXES_MAP, TimeSeriesTypeModel
 from utils.swmm_constant import (
+    ENCODING,
     NODE_RESULT_VARIABLE_SELECT,
     LINK_RESULT_VARIABLE_SELECT,
-    SWMM_FILE_INP_PATH,
-    SWMM_FILE_OUT_PATH,
-    ENCODING,
+    SWMM_JOBS_DIR,
+)
+from utils.decimation import (
+    EndQuery,
+    MaxPointsQuery,
+    MethodQuery,
+    StartQuery,
+    decimate,
+    window_slice,
+)
+from utils.model_store import ModelStore
+from utils.out_store import OutStore
+from utils.out_summary import SUMMARY_FIELDS
+from utils.swmm_runner import SimulationJobManager, extract_errors
+from utils.utils import (
+    IfMatchHeader,
+    remove_timeseries_prefix,
+    with_exception_handler,
 )
-from utils.utils import with_exception_handler
 from utils.logger import get_logger
 
 # 获取日志记录器
@@ -24,6 +55,24 @@ logger = get_logger("calculate")
 calculateRouter = APIRouter()
 
 
+def apply_calculate_options(INP, calculate_model: CalculateModel) -> None:
+    """把计算选项写入模型的 [OPTIONS]"""
+    inp_options = INP.check_for_section(OptionSection)
+    inp_options.update(
+        {
+            "FLOW_UNITS": calculate_model.flow_units,
+            "REPORT_STEP": calculate_model.report_step,
+            "FLOW_ROUTING": calculate_model.flow_routing,
+            "START_DATE": calculate_model.start_datetime.date(),
+            "START_TIME": calculate_model.start_datetime.time(),
+            "END_DATE": calculate_model.end_datetime.date(),
+            "END_TIME": calculate_model.end_datetime.time(),
+            "REPORT_START_DATE": calculate_model.start_report_datetime.date(),
+            "REPORT_START_TIME": calculate_model.start_report_datetime.time(),
+        }
+    )
+
+
 # 获取计算选项(参数)
 @calculateRouter.get(
     "/calculate/options",
@@ -39,34 +88,34 @@ calculateRouter = APIRouter()
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_calculate_options():
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_options = INP.check_for_section(OptionSection)
-    flow_units = inp_options.get("FLOW_UNITS")
-    report_step = inp_options.get("REPORT_STEP")
-    flow_routing = inp_options.get("FLOW_ROUTING")
-    start_date = inp_options.get("START_DATE")
-    start_time = inp_options.get("START_TIME")
-    end_date = inp_options.get("END_DATE")
-    end_time = inp_options.get("END_TIME")
-    report_start_date = inp_options.get("REPORT_START_DATE")
-    report_start_time = inp_options.get("REPORT_START_TIME")
-    # 拼接为 datetime
-    start_datetime = datetime.combine(start_date, start_time)
-    end_datetime = datetime.combine(end_date, end_time)
-    start_report_datetime = datetime.combine(report_start_date, report_start_time)
-
-    calculate_model = CalculateModel(
-        flow_units=flow_units,
-        start_datetime=start_datetime,
-        end_datetime=end_datetime,
-        report_step=report_step,
-        flow_routing=flow_routing,
-        start_report_datetime=start_report_datetime,
-    )
-    return Result.success_result(
-        message="成功获取计算选项",
-        data=calculate_model,
-    )
+    async with ModelStore.read() as INP:
+        inp_options = INP.check_for_section(OptionSection)
+        flow_units = inp_options.get("FLOW_UNITS")
+        report_step = inp_options.get("REPORT_STEP")
+        flow_routing = inp_options.get("FLOW_ROUTING")
+        start_date = inp_options.get("START_DATE")
+        start_time = inp_options.get("START_TIME")
+        end_date = inp_options.get("END_DATE")
+        end_time = inp_options.get("END_TIME")
+        report_start_date = inp_options.get("REPORT_START_DATE")
+        report_start_time = inp_options.get("REPORT_START_TIME")
+        # 拼接为 datetime
+        start_datetime = datetime.combine(start_date, start_time)
+        end_datetime = datetime.combine(end_date, end_time)
+        start_report_datetime = datetime.combine(report_start_date, report_start_time)
+
+        calculate_model = CalculateModel(
+            flow_units=flow_units,
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            report_step=report_step,
+            flow_routing=flow_routing,
+            start_report_datetime=start_report_datetime,
+        )
+        return Result.success_result(
+            message="成功获取计算选项",
+            data=calculate_model,
+        )
 
 
 # 保存更新计算选项(参数)
@@ -76,26 +125,14 @@ async def get_calculate_options():
     description="保存更新计算选项",
 )
 @with_exception_handler(default_message="更新失败,文件有误,发生未知错误")
-async def update_calculate_options(calculate_model: CalculateModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_options = INP.check_for_section(OptionSection)
+async def update_calculate_options(
+    calculate_model: CalculateModel,
+    if_match: IfMatchHeader = None,
+):
+    async with ModelStore.mutate(if_match) as INP:
+        # 更新选项
+        apply_calculate_options(INP, calculate_model)
 
-    # 更新选项
-    inp_options.update(
-        {
-            "FLOW_UNITS": calculate_model.flow_units,
-            "REPORT_STEP": calculate_model.report_step,
-            "FLOW_ROUTING": calculate_model.flow_routing,
-            "START_DATE": calculate_model.start_datetime.date(),
-            "START_TIME": calculate_model.start_datetime.time(),
-            "END_DATE": calculate_model.end_datetime.date(),
-            "END_TIME": calculate_model.end_datetime.time(),
-            "REPORT_START_DATE": calculate_model.start_report_datetime.date(),
-            "REPORT_START_TIME": calculate_model.start_report_datetime.time(),
-        }
-    )
-    # 保存文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
     return Result.success_result(message="成功更新计算选项")
 
 
@@ -107,26 +144,12 @@ async def update_calculate_options(calculate_model: CalculateModel):
 )
 @with_exception_handler(default_message="查询失败,没有计算结果,请先计算")
 async def query_entity_kind_select(name: str):
-    OUT = SwmmOutput(SWMM_FILE_OUT_PATH, encoding=ENCODING)
-    df = OUT.to_frame()
-    # 获取节点列名
-    columns_for_node = (
-        df.columns[df.columns.get_level_values(0) == "node"]
-        .get_level_values(1)
-        .unique()
-        .tolist()
-    )
-    if name in columns_for_node:
+    # 通过缓存的名称索引判断实体类型,无需读取全部计算结果
+    kind = OutStore.get().kind_of(name)
+    if kind == "node":
         data = {"kind": "node", "select": NODE_RESULT_VARIABLE_SELECT}
         return Result.success_result(message="查询实体成功", data=data)
-    # 获取链接列名
-    columns_for_link = (
-        df.columns[df.columns.get_level_values(0) == "link"]
-        .get_level_values(1)
-        .unique()
-        .tolist()
-    )
-    if name in columns_for_link:
+    if kind == "link":
         data = {"kind": "link", "select": LINK_RESULT_VARIABLE_SELECT}
         return Result.success_result(message="查询实体成功", data=data)
     # 如果都不属于,则返回提示信息
@@ -170,20 +193,36 @@ async def query_entity_kind_select(name: str):
 
 通过传入上述参数,返回对应对象在整个模拟时间范围内的时序计算结果。
 实例:kind=node name=J1 variable=depth
+
+可选参数:
+- `start` / `end`:只返回该时间范围内的结果
+- `max_points`:最多返回的点数,超过时按 `method` 降采样(lttb / minmax / mean,默认 lttb)
 """,
 )
 @with_exception_handler(default_message="查询失败,文件有误,发生未知错误")
-async def query_calculate_result(kind: str, name: str, variable: str):
-    OUT = SwmmOutput(SWMM_FILE_OUT_PATH, encoding=ENCODING)
-    data = OUT.get_part(kind, name, variable)
+async def query_calculate_result(
+    kind: str,
+    name: str,
+    variable: str,
+    start: StartQuery = None,
+    end: EndQuery = None,
+    max_points: MaxPointsQuery = None,
+    method: MethodQuery = "lttb",
+):
+    data = OutStore.get().series(kind, name, variable)
     if data.empty:
         return Result.error(
             message="查询结果为空,请检查输入的名称是否正确",
             data=[],
         )
+    # 时间范围与降采样都在结果数组上完成,只有最终返回的点才会被复制
+    data = data.iloc[window_slice(data.index, start, end)]
+    rows, values = decimate(data.to_numpy(), max_points, method)
+    data = pd.Series(values, index=data.index[rows])
     # 格式化 data 输出
     # 1.将数据转换为list [[], []],方便前端 echarts 使用,并且值保留两位小数
-    data = data.round(2)
+    # 结果文件中为 float32,先转为 float64 再保留两位小数,避免出现 2.049999952 这样的值
+    data = data.astype("float64").round(2)
     data_list = [[index, value] for index, value in data.items()]
     logger.info(
         f"查询结果: kind={kind}, name={name}, variable={variable}, data={data_list}"
@@ -194,57 +233,293 @@ async def query_calculate_result(kind: str, name: str, variable: str):
     )
 
 
+# 计算结果统计查询
+@calculateRouter.get(
+    "/calculate/summary",
+    summary="计算结果统计查询",
+    description="""
+查询每次计算后预先统计好的各对象指标,支持排序和取前 N 个。
+
+参数说明:
+- `kind`:对象类型,`node`(节点) / `link`(链接) / `subcatchment`(子汇水区),默认 link
+- `sort_by`:排序字段,不传则按结果文件中的顺序
+  - node:peak_depth、peak_depth_time、mean_depth、peak_inflow、inflow_volume、peak_flooding、flooding_volume、flooding_hours
+  - link:peak_flow、peak_flow_time、mean_flow、flow_volume、peak_velocity、peak_depth、peak_capacity、surcharge_hours
+  - subcatchment:peak_runoff、peak_runoff_time、mean_runoff、runoff_volume、total_rainfall
+- `order`:`desc`(默认) / `asc`
+- `top`:只返回前 N 个
+
+体积类指标为 流量 x 秒(流量单位为 CMS 时为 m³),时长单位为小时。
+实例:kind=link sort_by=peak_flow top=10
+""",
+)
+@with_exception_handler(default_message="查询失败,没有计算结果,请先计算")
+async def query_calculate_summary(
+    kind: Literal["node", "link", "subcatchment"] = "link",
+    sort_by: Optional[str] = None,
+    order: Literal["desc", "asc"] = "desc",
+    top: Annotated[Optional[int], Query(ge=1)] = None,
+):
+    fields = SUMMARY_FIELDS[kind]
+    if sort_by is not None and sort_by not in fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"排序字段 [ {sort_by} ] 不存在,可选值: {', '.join(fields)}",
+        )
+    # 统计结果在计算完成时已经生成,首次读取(或统计文件缺失时重新统计)放到线程中进行
+    summary = await asyncio.to_thread(OutStore.get().summary)
+    rows = summary[kind]
+    if sort_by is not None:
+        # 空值始终排在最后
+        present = [row for row in rows if row[sort_by] is not None]
+        missing = [row for row in rows if row[sort_by] is None]
+        present.sort(key=lambda row: row[sort_by], reverse=order == "desc")
+        rows = present + missing
+    if top is not None:
+        rows = rows[:top]
+    return Result.success_result(
+        message=f"成功获取计算结果统计,共({len(rows)}个)",
+        data={"kind": kind, "fields": fields, "rows": rows},
+    )
+
+
 # 进行计算
 @calculateRouter.post(
     "/calculate/run",
     summary="进行计算",
-    description="进行计算",
+    description="进行计算,计算在后台进程中进行,接口等待计算结束后返回",
 )
 async def run_calculation():
     try:
-        # 运行 SWMM 模型
-        INP_ABSOLUTE_PATH = Path(SWMM_FILE_INP_PATH).resolve()
-        swmm5_run(INP_ABSOLUTE_PATH)
-        return Result.success_result(message="计算成功")
+        job = await SimulationJobManager.submit()
+        job = await SimulationJobManager.wait(job.id)
     except Exception as e:
         error_msg = extract_errors(str(e))
         logger.error(f"SWMM 计算失败: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
+    if job.status == CalculateJobStatus.FAILED:
+        logger.error(f"SWMM 计算失败: {job.error}")
+        raise HTTPException(status_code=500, detail=job.error)
+    return Result.success_result(message="计算成功")
+
+
+# 提交后台计算任务
+@calculateRouter.post(
+    "/calculate/jobs",
+    summary="提交计算任务",
+    description="""
+以当前模型提交一次后台计算任务,立即返回任务ID,可通过任务查询接口获取计算状态、耗时、错误信息和结果文件路径。
+
+请求体可选:
+- `stepping`:是否逐步计算并实时推送进度(默认 false),进度通过 `/calculate/jobs/{job_id}/events` 订阅
+- `nodes`:逐步计算时需要实时推送水深的节点名称列表
+- `links`:逐步计算时需要实时推送流量的链接名称列表
+""",
+)
+@with_exception_handler(default_message="提交失败,发生未知错误")
+async def submit_calculation_job(request: Optional[CalculateJobRequest] = None):
+    job = await SimulationJobManager.submit(request)
+    return Result.success_result(message="计算任务已提交", data=job)
 
 
-def extract_errors(log_text):
-    # 把错误解读的字符串转成 utf-8 字节,再用 GB2312 解码回来
-    log_text = fix_garbled_text(log_text)
-    # 将日志文本按行拆分
-    lines = log_text.splitlines()
-    # 用于存储提取的错误信息
-    errors = []
-    # 设一个标志位,标记是否已遇到 .inp 行
-    found_inp = False
-    # 遍历每一行
-    for line in lines:
-        # 如果找到 .inp 后缀的行,开始记录所有后续的行
-        if ".inp" in line:
-            found_inp = True
-        # 如果找到 ERROR 相关的行,且已经找到 .inp 行,保留这行及之后的所有行
-        if found_inp and line.startswith("ERROR"):
-            # 使用正则表达式提取单引号之间的内容
-            matches = re.findall(r"'(.*?)'", line)
-            errors.extend(matches)  # 将找到的错误信息添加到列表中
-
-    error_msg = "计算时发生错误:\n"
-    for index, error in enumerate(errors):  # 确保 index 在前面
-        error_msg += f"{index+1}、{error}\n"  # 添加换行符以便每个错误独占一行
-    return error_msg.strip()  # 去除首尾空白字符
-
-
-def fix_garbled_text(text: str) -> str:
-    """
-    修复可能因编码错误导致的乱码字符串
-    原始中文 → 用 gb2312 编码 → 被错误地当成 utf-8 解码 → 出现乱码
-    然后我们想办法通过 latin1 编码 → gb2312 解码 来"复原"。
-    """
+@calculateRouter.get(
+    "/calculate/jobs",
+    summary="获取计算任务列表",
+    description="按提交时间倒序获取全部计算任务的状态",
+)
+@with_exception_handler(default_message="获取失败,发生未知错误")
+async def get_calculation_jobs():
+    jobs = SimulationJobManager.list()
+    return Result.success_result(
+        message=f"成功获取计算任务,共({len(jobs)}个)", data=jobs
+    )
+
+
+@calculateRouter.get(
+    "/calculate/jobs/{job_id}",
+    summary="获取计算任务状态",
+    description="通过任务ID获取计算任务的状态(pending/running/success/failed)、耗时、错误信息和结果文件路径",
+)
+@with_exception_handler(default_message="获取失败,发生未知错误")
+async def get_calculation_job(job_id: str):
+    job = SimulationJobManager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"计算任务 [ {job_id} ] 不存在或已被清理"
+        )
+    return Result.success_result(message="成功获取计算任务", data=job)
+
+
+def check_scenario(INP, scenario: ScenarioModel) -> None:
+    """检查情景中引用的时间序列和管道是否存在"""
+    inp_timeseries = INP.check_for_section(TimeseriesData)
+    inp_conduits = INP.check_for_section(Conduit)
+    for timeseries in scenario.timeseries:
+        name = TIMESERIES_PREFIXES_MAP[timeseries.type] + timeseries.name
+        if name not in inp_timeseries:
+            raise HTTPException(
+                status_code=404,
+                detail=f"情景 [ {scenario.name} ] 中的时间序列 [ {timeseries.name} ] 不存在,请检查时间序列名称是否正确",
+            )
+    for conduit_name in scenario.conduit_roughness:
+        if conduit_name not in inp_conduits:
+            raise HTTPException(
+                status_code=404,
+                detail=f"情景 [ {scenario.name} ] 中的管道 [ {conduit_name} ] 不存在,请检查管道名称是否正确",
+            )
+
+
+def apply_scenario(INP, scenario: ScenarioModel) -> None:
+    """把情景的参数覆盖应用到模型上"""
+    if scenario.options is not None:
+        apply_calculate_options(INP, scenario.options)
+
+    inp_timeseries = INP.check_for_section(TimeseriesData)
+    inp_rain_gages = INP.check_for_section(RainGage)
+    for timeseries in scenario.timeseries:
+        name = TIMESERIES_PREFIXES_MAP[timeseries.type] + timeseries.name
+        inp_timeseries[name] = TimeseriesData(name=name, data=timeseries.data)
+        # 雨量序列的时间间隔变化时,同步更新雨量计的间隔
+        gage_name = remove_timeseries_prefix(name)
+        if timeseries.type != TimeSeriesTypeModel.RAINGAGE:
+            continue
+        if gage_name in inp_rain_gages:
+            inp_rain_gages[gage_name].interval = timeseries.get_interval()
+
+    inp_conduits = INP.check_for_section(Conduit)
+    if scenario.roughness_factor is not None:
+        for conduit in inp_conduits.values():
+            conduit.roughness *= scenario.roughness_factor
+    for conduit_name, roughness in scenario.conduit_roughness.items():
+        inp_conduits[conduit_name].roughness = roughness
+
+
+def materialize_scenario(base_text: str, scenario: ScenarioModel, inp_path: str):
+    """由基础模型文本生成情景模型并写入情景自己的工作目录"""
+    INP = SwmmInput.read_text(base_text)
+    apply_scenario(INP, scenario)
+    os.makedirs(os.path.dirname(inp_path), exist_ok=True)
+    INP.write_file(inp_path, encoding=ENCODING)
+
+
+# 多情景批量计算
+@calculateRouter.post(
+    "/calculate/scenarios",
+    summary="多情景批量计算",
+    description="""
+以当前模型为基础,按参数覆盖生成多个情景,并行计算后返回每个情景的结果汇总,不会修改当前模型和当前计算结果。
+
+每个情景(`scenarios`)可选的参数覆盖:
+- `options`:计算选项(同 `/calculate/options`)
+- `timeseries`:替换已有时间序列的数据,`type` 为 RAINGAGE(默认)或 INFLOW,`name` 不带前缀
+- `roughness_factor`:全部管道糙率乘以该倍数
+- `conduit_roughness`:指定管道的糙率 `{管道名称: 糙率}`
+
+`links`:需要在汇总中单独列出洪峰流量的链接名称。
+
+汇总内容:最大流量及所在链接、指定链接的洪峰流量、节点总溢流量(流量单位 x 秒)、发生溢流的节点数。
+""",
+)
+@with_exception_handler(default_message="计算失败,发生未知错误")
+async def run_scenarios(request: ScenarioBatchRequest):
+    names = [scenario.name for scenario in request.scenarios]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise HTTPException(
+            status_code=400,
+            detail=f"情景名称 [ {', '.join(duplicated)} ] 重复,请使用不同的情景名称",
+        )
+
+    async with ModelStore.read() as INP:
+        for scenario in request.scenarios:
+            check_scenario(INP, scenario)
+        base_text = INP.to_string()
+
+    batch_dir = os.path.abspath(
+        os.path.join(SWMM_JOBS_DIR, f"scenarios_{uuid.uuid4().hex[:12]}")
+    )
+    inp_paths = [
+        os.path.join(batch_dir, str(index), "swmm.inp")
+        for index in range(len(request.scenarios))
+    ]
     try:
-        return text.encode("latin1").decode("gb2312")
-    except (UnicodeEncodeError, UnicodeDecodeError):
-        return text  # 如果失败就原样返回 (一般是utf-8编码,解析也是utf-8)
+        # 各情景的模型在线程中生成,计算在进程池中并行进行
+        await asyncio.gather(
+            *(
+                asyncio.to_thread(materialize_scenario, base_text, scenario, inp_path)
+                for scenario, inp_path in zip(request.scenarios, inp_paths)
+            )
+        )
+        results = await asyncio.gather(
+            *(
+                SimulationJobManager.run_scenario(inp_path, request.links)
+                for inp_path in inp_paths
+            )
+        )
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+    summaries = [
+        ScenarioSummaryModel(
+            name=scenario.name,
+            status=(
+                CalculateJobStatus.SUCCESS
+                if result["error"] is None
+                else CalculateJobStatus.FAILED
+            ),
+            **result,
+        )
+        for scenario, result in zip(request.scenarios, results)
+    ]
+    failed = sum(1 for summary in summaries if summary.error is not None)
+    logger.info(f"情景计算完成: 共 {len(summaries)} 个,失败 {failed} 个")
+    return Result.success_result(
+        message=f"情景计算完成,共({len(summaries)}个),失败({failed}个)",
+        data=summaries,
+    )
+
+
+def _sse_message(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@calculateRouter.get(
+    "/calculate/jobs/{job_id}/events",
+    summary="订阅计算任务进度",
+    description="""
+以 Server-Sent Events(text/event-stream)推送计算任务进度,任务结束后关闭连接。
+
+事件类型:
+- `progress`:任务进度,`data` 中 `job` 为任务信息(含 `progress` 百分比和 `sim_time` 模拟时刻),
+  逐步计算的任务还包含 `nodes`(节点水深)和 `links`(链接流量)
+- `end`:任务结束(success/failed),`data` 中 `job` 为最终的任务信息
+""",
+)
+async def stream_calculation_job_events(job_id: str, request: Request):
+    job = SimulationJobManager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"计算任务 [ {job_id} ] 不存在或已被清理"
+        )
+    finished = job.status in (CalculateJobStatus.SUCCESS, CalculateJobStatus.FAILED)
+    subscriber = None if finished else SimulationJobManager.subscribe(job_id)
+
+    async def event_stream():
+        if subscriber is None:
+            yield _sse_message("end", {"job": job.model_dump(mode="json")})
+            return
+        try:
+            yield _sse_message("progress", {"job": job.model_dump(mode="json")})
+            while True:
+                message = await subscriber.get()
+                if message is None or await request.is_disconnected():
+                    break
+                yield _sse_message(message.pop("event"), message)
+        finally:
+            SimulationJobManager.unsubscribe(job_id, subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,16 +1,12 @@
 from fastapi import APIRouter, HTTPException
-from swmm_api import SwmmInput
 from swmm_api.input_file.sections.node_component import Coordinate
 from swmm_api.input_file.sections.link import Conduit
 from swmm_api.input_file.sections.link_component import CrossSection
 from swmm_api.input_file.sections.others import Transect
 from schemas.conduit import ConduitResponseModel, ConduitRequestModel
 from schemas.result import Result
-from utils.swmm_constant import (
-    SWMM_FILE_INP_PATH,
-    ENCODING,
-)
-from utils.utils import with_exception_handler
+from utils.model_store import ModelStore
+from utils.utils import IfMatchHeader, with_exception_handler
 from typing import List
 
 
@@ -24,29 +20,29 @@ conduitRouter = APIRouter()
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_conduits():
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_conduits = INP.check_for_section(Conduit)
-    inp_xsections = INP.check_for_section(CrossSection)
-    conduits = []
-    for conduit in inp_conduits.values():
-        xsection = inp_xsections.get(conduit.name)
-        conduit_model = ConduitResponseModel(
-            name=conduit.name,
-            from_node=conduit.from_node,
-            to_node=conduit.to_node,
-            length=conduit.length,
-            roughness=conduit.roughness,
-            transect=xsection.transect,
-            shape=xsection.shape,
-            height=xsection.height,
-            parameter_2=xsection.parameter_2,
-            parameter_3=xsection.parameter_3,
-            parameter_4=xsection.parameter_4,
+    async with ModelStore.read() as INP:
+        inp_conduits = INP.check_for_section(Conduit)
+        inp_xsections = INP.check_for_section(CrossSection)
+        conduits = []
+        for conduit in inp_conduits.values():
+            xsection = inp_xsections.get(conduit.name)
+            conduit_model = ConduitResponseModel(
+                name=conduit.name,
+                from_node=conduit.from_node,
+                to_node=conduit.to_node,
+                length=conduit.length,
+                roughness=conduit.roughness,
+                transect=xsection.transect,
+                shape=xsection.shape,
+                height=xsection.height,
+                parameter_2=xsection.parameter_2,
+                parameter_3=xsection.parameter_3,
+                parameter_4=xsection.parameter_4,
+            )
+            conduits.append(conduit_model)
+        return Result.success_result(
+            data=conduits, message=f"成功获取所有渠道数据,共({len(conduits)}个)"
         )
-        conduits.append(conduit_model)
-    return Result.success_result(
-        data=conduits, message=f"成功获取所有渠道数据,共({len(conduits)}个)"
-    )
 
 
 @conduitRouter.post(
@@ -57,34 +53,34 @@ async def get_conduits():
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def batch_get_conduits_by_ids(ids: List[str]):
     """通过渠道ID列表批量获取渠道信息"""
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_conduits = INP.check_for_section(Conduit)
-    inp_xsections = INP.check_for_section(CrossSection)
-    conduits = []
-    conduits_name = []
-    for conduit_id in ids:
-        conduit = inp_conduits.get(conduit_id)
-        if not conduit:
-            continue
-        xsection = inp_xsections.get(conduit.name)
-        conduit_model = ConduitResponseModel(
-            name=conduit.name,
-            from_node=conduit.from_node,
-            to_node=conduit.to_node,
-            length=conduit.length,
-            roughness=conduit.roughness,
-            transect=xsection.transect if xsection else None,
-            shape=xsection.shape if xsection else None,
-            height=xsection.height if xsection else None,
-            parameter_2=xsection.parameter_2 if xsection else None,
-            parameter_3=xsection.parameter_3 if xsection else None,
-            parameter_4=xsection.parameter_4 if xsection else None,
+    async with ModelStore.read() as INP:
+        inp_conduits = INP.check_for_section(Conduit)
+        inp_xsections = INP.check_for_section(CrossSection)
+        conduits = []
+        conduits_name = []
+        for conduit_id in ids:
+            conduit = inp_conduits.get(conduit_id)
+            if not conduit:
+                continue
+            xsection = inp_xsections.get(conduit.name)
+            conduit_model = ConduitResponseModel(
+                name=conduit.name,
+                from_node=conduit.from_node,
+                to_node=conduit.to_node,
+                length=conduit.length,
+                roughness=conduit.roughness,
+                transect=xsection.transect if xsection else None,
+                shape=xsection.shape if xsection else None,
+                height=xsection.height if xsection else None,
+                parameter_2=xsection.parameter_2 if xsection else None,
+                parameter_3=xsection.parameter_3 if xsection else None,
+                parameter_4=xsection.parameter_4 if xsection else None,
+            )
+            conduits.append(conduit_model)
+            conduits_name.append(conduit.name)
+        return Result.success_result(
+            data=conduits, message=f"成功获取指定渠道数据:`{conduits_name}`"
         )
-        conduits.append(conduit_model)
-        conduits_name.append(conduit.name)
-    return Result.success_result(
-        data=conduits, message=f"成功获取指定渠道数据:`{conduits_name}`"
-    )
 
 
 @conduitRouter.put(
@@ -94,11 +90,32 @@ async def batch_get_conduits_by_ids(ids: List[str]):
     description="通过指定渠道ID,更新渠道的相关信息",
 )
 @with_exception_handler(default_message="修改失败,文件有误,发生未知错误")
-async def update_conduit(conduit_id: str, conduit_update: ConduitRequestModel):
+async def update_conduit(
+    conduit_id: str,
+    conduit_update: ConduitRequestModel,
+    if_match: IfMatchHeader = None,
+):
     """
     更新渠道信息
     """
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+    async with ModelStore.mutate(if_match) as INP:
+        edit_conduit(INP, conduit_id, conduit_update)
+
+    return Result.success_result(
+        message=f"渠道 [ {conduit_update.name} ] 信息更新成功",
+        data={
+            "id": conduit_update.name,
+            "type": "conduit",
+        },
+    )
+
+
+def edit_conduit(INP, conduit_id: str, conduit_update: ConduitRequestModel) -> None:
+    """
+    校验并修改渠道及其断面(可改名),须在 ModelStore.mutate() 中调用
+
+    校验不通过时抛出 HTTPException,此时模型未被修改
+    """
     inp_conduits = INP.check_for_section(Conduit)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_xsections = INP.check_for_section(CrossSection)
@@ -150,6 +167,9 @@ async def update_conduit(conduit_id: str, conduit_update: ConduitRequestModel):
     conduit.name = conduit_update.name
     conduit.from_node = conduit_update.from_node
     conduit.to_node = conduit_update.to_node
+    topology = ModelStore.topology()
+    topology.remove(conduit_id)
+    topology.add(conduit.name, conduit.from_node, conduit.to_node)
     conduit.length = conduit_update.length
     conduit.roughness = conduit_update.roughness
 
@@ -164,14 +184,6 @@ async def update_conduit(conduit_id: str, conduit_update: ConduitRequestModel):
         parameter_4=conduit_update.parameter_4,
     )
     inp_xsections[conduit_update.name] = xsection
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(
-        message=f"渠道 [ {conduit_update.name} ] 信息更新成功",
-        data={
-            "id": conduit_update.name,
-            "type": "conduit",
-        },
-    )
 
 
 @conduitRouter.post(
@@ -181,11 +193,27 @@ async def update_conduit(conduit_id: str, conduit_update: ConduitRequestModel):
     description="创建一个新的渠道,并写入 SWMM 文件",
 )
 @with_exception_handler(default_message="创建失败,文件有误,发生未知错误")
-async def create_conduit(conduit_data: ConduitRequestModel):
+async def create_conduit(
+    conduit_data: ConduitRequestModel,
+    if_match: IfMatchHeader = None,
+):
     """
     添加渠道信息
     """
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+    async with ModelStore.mutate(if_match) as INP:
+        add_conduit(INP, conduit_data)
+
+    return Result.success_result(
+        message=f"渠道创建成功", data={"conduit_id": conduit_data.name}
+    )
+
+
+def add_conduit(INP, conduit_data: ConduitRequestModel) -> None:
+    """
+    校验并向模型中添加渠道及其断面,须在 ModelStore.mutate() 中调用
+
+    校验不通过时抛出 HTTPException,此时模型未被修改
+    """
     inp_conduits = INP.check_for_section(Conduit)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_xsections = INP.check_for_section(CrossSection)
@@ -216,18 +244,13 @@ async def create_conduit(conduit_data: ConduitRequestModel):
             detail=f"创建失败,终点节点 [ {conduit_data.to_node} ] 不存在,请检查节点名称是否正确",
         )
 
-    # 检查渠道是否已存在,起点和终点完全一样
-    for conduit in inp_conduits.values():
-        if (
-            conduit.from_node == conduit_data.from_node
-            and conduit.to_node == conduit_data.to_node
-            or conduit.from_node == conduit_data.to_node
-            and conduit.to_node == conduit_data.from_node
-        ):
-            raise HTTPException(
-                status_code=400,
-                detail=f"创建失败,启点和终点已存在渠道,请检查节点名称是否正确",
-            )
+    # 检查渠道是否已存在,起点和终点完全一样(不区分方向)
+    topology = ModelStore.topology()
+    if topology.links_between(conduit_data.from_node, conduit_data.to_node):
+        raise HTTPException(
+            status_code=400,
+            detail=f"创建失败,启点和终点已存在渠道,请检查节点名称是否正确",
+        )
 
     # 1. 创建新渠道对象
     new_conduit = Conduit(
@@ -238,6 +261,7 @@ async def create_conduit(conduit_data: ConduitRequestModel):
         roughness=conduit_data.roughness,
     )
     inp_conduits[conduit_data.name] = new_conduit
+    topology.add(conduit_data.name, conduit_data.from_node, conduit_data.to_node)
 
     # 2. 创建新的断面信息
     new_xsection = CrossSection(
@@ -251,12 +275,6 @@ async def create_conduit(conduit_data: ConduitRequestModel):
     )
     inp_xsections[conduit_data.name] = new_xsection
 
-    # 写入 SWMM 文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(
-        message=f"渠道创建成功", data={"conduit_id": conduit_data.name}
-    )
-
 
 @conduitRouter.delete(
     "/conduit/{conduit_id:path}",
@@ -265,12 +283,21 @@ async def create_conduit(conduit_data: ConduitRequestModel):
     description="通过指定渠道ID,删除渠道信息",
 )
 @with_exception_handler(default_message="删除失败,文件有误,发生未知错误")
-async def delete_conduit(conduit_id: str):
+async def delete_conduit(conduit_id: str, if_match: IfMatchHeader = None):
     """
     删除渠道信息
     """
     # 读取 SWMM 文件
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+    async with ModelStore.mutate(if_match) as INP:
+        remove_conduit(INP, conduit_id)
+
+    return Result.success_result(message=f"渠道 [ {conduit_id} ] 删除成功")
+
+
+def remove_conduit(INP, conduit_id: str) -> None:
+    """
+    删除渠道及其断面,须在 ModelStore.mutate() 中调用
+    """
     inp_conduits = INP.check_for_section(Conduit)
     inp_xsections = INP.check_for_section(CrossSection)
 
@@ -283,12 +310,8 @@ async def delete_conduit(conduit_id: str):
 
     # 删除渠道
     del inp_conduits[conduit_id]
+    ModelStore.topology().remove(conduit_id)
 
     # 删除断面信息(如果存在)
     if conduit_id in inp_xsections:
         del inp_xsections[conduit_id]
-
-    # 写入 SWMM 文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-
-    return Result.success_result(message=f"渠道 [ {conduit_id} ] 删除成功")
@@ -1,21 +1,21 @@
 from fastapi import APIRouter, HTTPException
-from swmm_api import SwmmInput
 from swmm_api.input_file.sections import Junction, Outfall
 from swmm_api.input_file.sections.node_component import Coordinate, Inflow
 from swmm_api.input_file.sections.link import Conduit
 from swmm_api.input_file.sections.link_component import CrossSection
 from swmm_api.input_file.sections.others import TimeseriesData
-from typing import List
+from typing import List, Optional, Tuple
 
-from utils.coordinate_converter import utm_to_wgs84, wgs84_to_utm
+from utils.coordinate_converter import (
+    coordinates_project_to_wgs84,
+    get_project_crs,
+    wgs84_to_project,
+)
 from schemas.junction import JunctionModel
 from schemas.result import Result
 from schemas.timeseries import TimeSeriesTypeModel, TIMESERIES_PREFIXES_MAP
-from utils.swmm_constant import (
-    SWMM_FILE_INP_PATH,
-    ENCODING,
-)
-from utils.utils import with_exception_handler, remove_timeseries_prefix
+from utils.model_store import ModelStore
+from utils.utils import IfMatchHeader, with_exception_handler, remove_timeseries_prefix
 
 
 junctionsRouter = APIRouter()
@@ -28,51 +28,52 @@ junctionsRouter = APIRouter()
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_junctions():
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_junctions = INP.check_for_section(Junction)
-    inp_coordinates = INP.check_for_section(Coordinate)
-    inp_inflows = INP.check_for_section(Inflow)
+    async with ModelStore.read() as INP:
+        inp_junctions = INP.check_for_section(Junction)
+        inp_coordinates = INP.check_for_section(Coordinate)
+        inp_inflows = INP.check_for_section(Inflow)
+
+        # 获取所有入流的名称
+        inflow_nodes = [inflow.node for inflow in inp_inflows.values()]
+        # 一次性批量转换所有节点坐标
+        lon_lats = coordinates_project_to_wgs84(
+            inp_coordinates, get_project_crs(INP), inp_junctions.keys()
+        )
 
-    # 获取所有入流的名称
-    inflow_nodes = [inflow.node for inflow in inp_inflows.values()]
-
-    junctions = []
-
-    for junction in inp_junctions.values():
-        # 获取坐标
-        coord = inp_coordinates.get(junction.name)
-        lon_lat = utm_to_wgs84(coord.x, coord.y)
-        lon = lon_lat[0]
-        lat = lon_lat[1]
-
-        # 判断是否有入流
-        has_inflow = junction.name in inflow_nodes
-
-        # 获取时间序列名(如果有入流)
-        if has_inflow:
-            timeseries_name = inp_inflows[(junction.name, "FLOW")].time_series
-            # 移除时间序列类型前缀
-            timeseries_name = remove_timeseries_prefix(timeseries_name)
-        else:
-            timeseries_name = ""
-
-        # 构造 JunctionModel 对象并添加到列表
-        junction_model = JunctionModel(
-            name=junction.name,
-            lon=lon,
-            lat=lat,
-            elevation=junction.elevation,
-            depth_init=junction.depth_init,
-            depth_max=junction.depth_max,
-            depth_surcharge=junction.depth_surcharge,
-            area_ponded=junction.area_ponded,
-            has_inflow=has_inflow,
-            timeseries_name=timeseries_name,
+        junctions = []
+
+        for junction in inp_junctions.values():
+            # 获取坐标
+            lon, lat = lon_lats[junction.name]
+
+            # 判断是否有入流
+            has_inflow = junction.name in inflow_nodes
+
+            # 获取时间序列名(如果有入流)
+            if has_inflow:
+                timeseries_name = inp_inflows[(junction.name, "FLOW")].time_series
+                # 移除时间序列类型前缀
+                timeseries_name = remove_timeseries_prefix(timeseries_name)
+            else:
+                timeseries_name = ""
+
+            # 构造 JunctionModel 对象并添加到列表
+            junction_model = JunctionModel(
+                name=junction.name,
+                lon=lon,
+                lat=lat,
+                elevation=junction.elevation,
+                depth_init=junction.depth_init,
+                depth_max=junction.depth_max,
+                depth_surcharge=junction.depth_surcharge,
+                area_ponded=junction.area_ponded,
+                has_inflow=has_inflow,
+                timeseries_name=timeseries_name,
+            )
+            junctions.append(junction_model)
+        return Result.success_result(
+            data=junctions, message=f"成功获取所有节点数据,共({len(junctions)}个)"
         )
-        junctions.append(junction_model)
-    return Result.success_result(
-        data=junctions, message=f"成功获取所有节点数据,共({len(junctions)}个)"
-    )
 
 
 @junctionsRouter.post(
@@ -83,58 +84,59 @@ async def get_junctions():
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def batch_get_junctions_by_ids(ids: List[str]):
     """通过节点ID列表批量获取节点信息"""
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_junctions = INP.check_for_section(Junction)
-    inp_coordinates = INP.check_for_section(Coordinate)
-    inp_inflows = INP.check_for_section(Inflow)
-
-    # 获取所有入流的名称
-    inflow_nodes = [inflow.node for inflow in inp_inflows.values()]
-
-    junctions = []
-    junctions_name = []
-
-    for junction_id in ids:
-        junction = inp_junctions.get(junction_id)
-        if not junction:
-            continue
-
-        # 获取坐标
-        coord = inp_coordinates.get(junction.name)
-        lon_lat = utm_to_wgs84(coord.x, coord.y)
-        lon = lon_lat[0]
-        lat = lon_lat[1]
-
-        # 判断是否有入流
-        has_inflow = junction.name in inflow_nodes
-
-        # 获取时间序列名(如果有入流)
-        if has_inflow:
-            timeseries_name = inp_inflows[(junction.name, "FLOW")].time_series
-            # 移除时间序列类型前缀
-            timeseries_name = remove_timeseries_prefix(timeseries_name)
-        else:
-            timeseries_name = ""
-
-        # 构造 JunctionModel 对象并添加到列表
-        junction_model = JunctionModel(
-            name=junction.name,
-            lon=lon,
-            lat=lat,
-            elevation=junction.elevation,
-            depth_init=junction.depth_init,
-            depth_max=junction.depth_max,
-            depth_surcharge=junction.depth_surcharge,
-            area_ponded=junction.area_ponded,
-            has_inflow=has_inflow,
-            timeseries_name=timeseries_name,
+    async with ModelStore.read() as INP:
+        inp_junctions = INP.check_for_section(Junction)
+        inp_coordinates = INP.check_for_section(Coordinate)
+        inp_inflows = INP.check_for_section(Inflow)
+
+        # 获取所有入流的名称
+        inflow_nodes = [inflow.node for inflow in inp_inflows.values()]
+        # 一次性批量转换所有请求节点的坐标
+        lon_lats = coordinates_project_to_wgs84(
+            inp_coordinates, get_project_crs(INP), ids
         )
-        junctions.append(junction_model)
-        junctions_name.append(junction.name)
 
-    return Result.success_result(
-        data=junctions, message=f"成功获取 {junctions_name} 节点数据"
-    )
+        junctions = []
+        junctions_name = []
+
+        for junction_id in ids:
+            junction = inp_junctions.get(junction_id)
+            if not junction:
+                continue
+
+            # 获取坐标
+            lon, lat = lon_lats[junction.name]
+
+            # 判断是否有入流
+            has_inflow = junction.name in inflow_nodes
+
+            # 获取时间序列名(如果有入流)
+            if has_inflow:
+                timeseries_name = inp_inflows[(junction.name, "FLOW")].time_series
+                # 移除时间序列类型前缀
+                timeseries_name = remove_timeseries_prefix(timeseries_name)
+            else:
+                timeseries_name = ""
+
+            # 构造 JunctionModel 对象并添加到列表
+            junction_model = JunctionModel(
+                name=junction.name,
+                lon=lon,
+                lat=lat,
+                elevation=junction.elevation,
+                depth_init=junction.depth_init,
+                depth_max=junction.depth_max,
+                depth_surcharge=junction.depth_surcharge,
+                area_ponded=junction.area_ponded,
+                has_inflow=has_inflow,
+                timeseries_name=timeseries_name,
+            )
+            junctions.append(junction_model)
+            junctions_name.append(junction.name)
+
+        return Result.success_result(
+            data=junctions, message=f"成功获取 {junctions_name} 节点数据"
+        )
 
 
 @junctionsRouter.put(
@@ -143,8 +145,26 @@ async def batch_get_junctions_by_ids(ids: List[str]):
     description="通过节点名称,更新指定节点的所有信息,包括名称、经纬度、高程、最大水深、初始水深、超载水深、积水面积、是否有入流及入流时间序列名称。",
 )
 @with_exception_handler(default_message="修改失败,文件有误,发生未知错误")
-async def update_junction(junction_id: str, junction_update: JunctionModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def update_junction(
+    junction_id: str,
+    junction_update: JunctionModel,
+    if_match: IfMatchHeader = None,
+):
+    async with ModelStore.mutate(if_match) as INP:
+        edit_junction(INP, junction_id, junction_update)
+
+    return Result.success_result(
+        message=f"节点 [ {junction_update.name} ] 信息更新成功",
+        data={"id": junction_update.name, "type": "junction"},
+    )
+
+
+def edit_junction(INP, junction_id: str, junction_update: JunctionModel) -> None:
+    """
+    校验并修改节点(可改名),须在 ModelStore.mutate() 中调用
+
+    节点改名时同步修改相连渠道的起终点和入流;校验不通过时抛出 HTTPException
+    """
     inp_junctions = INP.check_for_section(Junction)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_conduits = INP.check_for_section(Conduit)
@@ -176,6 +196,19 @@ async def update_junction(junction_id: str, junction_update: JunctionModel):
             detail=f"保存失败,坐标名称 [ {junction_update.name} ] 已存在,请使用不同的节点名称",
         )
 
+    # 检查入流的时间序列是否存在,需在修改模型之前完成校验
+    if junction_update.has_inflow:
+        # 补充时间序列名称前缀
+        junction_update.timeseries_name = (
+            TIMESERIES_PREFIXES_MAP[TimeSeriesTypeModel.INFLOW]
+            + junction_update.timeseries_name
+        )
+        if junction_update.timeseries_name not in inp_timeseries:
+            raise HTTPException(
+                status_code=404,
+                detail=f"保存失败,需要修改的时间序列名称 [ {remove_timeseries_prefix(junction_update.timeseries_name)} ] 不存在,请检查时间序列名称是否正确",
+            )
+
     # 1.更新JUNCTIONS数据
     del inp_junctions[junction_id]
     inp_junctions[junction_update.name] = Junction(
@@ -189,54 +222,36 @@ async def update_junction(junction_id: str, junction_update: JunctionModel):
 
     # 2.更新COORDINATES数据
     del inp_coordinates[junction_id]
-    utm_x, utm_y = wgs84_to_utm(junction_update.lon, junction_update.lat)
+    x, y = wgs84_to_project(
+        junction_update.lon, junction_update.lat, get_project_crs(INP)
+    )
     inp_coordinates[junction_update.name] = Coordinate(
-        node=junction_update.name, x=utm_x, y=utm_y
+        node=junction_update.name, x=x, y=y
     )
 
     # 3.更新CONDUITS的起点和终点的名称
     # 如果节点名称发生变化,则需要更新所有与该节点相关的渠道的起点和终点名称
     if junction_id != junction_update.name:
-        for conduit in inp_conduits.values():
-            if conduit.from_node == junction_id:
-                conduit.from_node = junction_update.name
-            elif conduit.to_node == junction_id:
-                conduit.to_node = junction_update.name
+        ModelStore.topology().rename_node(
+            junction_id, junction_update.name, inp_conduits
+        )
 
     # 4.更新入流的时间序列名称
     if junction_update.has_inflow:
-        # 补充时间序列名称前缀
-        junction_update.timeseries_name = (
-            TIMESERIES_PREFIXES_MAP[TimeSeriesTypeModel.INFLOW]
-            + junction_update.timeseries_name
-        )
-        # 4.1 检查时间序列名称是否已存在
-        if junction_update.timeseries_name not in inp_timeseries:
-            raise HTTPException(
-                status_code=404,
-                detail=f"保存失败,需要修改的时间序列名称 [ {remove_timeseries_prefix(junction_update.timeseries_name)} ] 不存在,请检查时间序列名称是否正确",
-            )
-        # 4.2 如果节点有入流,则删除原来的入流信息
+        # 4.1 如果节点有入流,则删除原来的入流信息
         if (junction_id, "FLOW") in inp_inflows:
             del inp_inflows[(junction_id, "FLOW")]
-        # 4.3 创建新的入流信息并添加到 INFLWS 中
+        # 4.2 创建新的入流信息并添加到 INFLWS 中
         new_inflow = Inflow(
             node=junction_update.name,
             time_series=junction_update.timeseries_name,
         )
         inp_inflows[(junction_update.name, "FLOW")] = new_inflow
     else:
-        # 4.4 如果节点没有入流,则删除入流信息
+        # 4.3 如果节点没有入流,则删除入流信息
         if (junction_id, "FLOW") in inp_inflows:
             del inp_inflows[(junction_id, "FLOW")]
 
-    # 5.保存数据到文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(
-        message=f"节点 [ {junction_update.name} ] 信息更新成功",
-        data={"id": junction_update.name, "type": "junction"},
-    )
-
 
 @junctionsRouter.post(
     "/junction",
@@ -244,9 +259,26 @@ async def update_junction(junction_id: str, junction_update: JunctionModel):
     description="在 SWMM 模型中创建一个新的 Junction,并更新坐标数据",
 )
 @with_exception_handler(default_message="创建失败,文件有误,发生未知错误")
-async def create_junction(junction_data: JunctionModel):
+async def create_junction(junction_data: JunctionModel, if_match: IfMatchHeader = None):
     # 读取 SWMM 输入文件
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+    async with ModelStore.mutate(if_match) as INP:
+        add_junction(INP, junction_data)
+
+    return Result.success_result(
+        message=f"节点 [ {junction_data.name} ] 创建成功",
+        data={"junction_id": junction_data.name},
+    )
+
+
+def add_junction(
+    INP, junction_data: JunctionModel, xy: Optional[Tuple[float, float]] = None
+) -> None:
+    """
+    校验并向模型中添加节点,须在 ModelStore.mutate() 中调用
+
+    校验不通过时抛出 HTTPException,此时模型未被修改;
+    xy 为已转换好的项目坐标系坐标,批量导入时可预先一次性转换,不传则按经纬度转换
+    """
     inp_junctions = INP.check_for_section(Junction)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_outfalls = INP.check_for_section(Outfall)
@@ -273,23 +305,17 @@ async def create_junction(junction_data: JunctionModel):
         area_ponded=junction_data.area_ponded,
     )
 
-    # 2. 计算 UTM 坐标并创建 Coordinate
-    utm_x, utm_y = wgs84_to_utm(junction_data.lon, junction_data.lat)
+    # 2. 计算项目坐标系坐标并创建 Coordinate
+    if xy is None:
+        xy = wgs84_to_project(junction_data.lon, junction_data.lat, get_project_crs(INP))
+    x, y = xy
     new_coordinate = Coordinate(
         node=junction_data.name,
-        x=utm_x,
-        y=utm_y,
+        x=x,
+        y=y,
     )
     inp_coordinates[junction_data.name] = new_coordinate
 
-    # 3. 写回 SWMM 输入文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-
-    return Result.success_result(
-        message=f"节点 [ {junction_data.name} ] 创建成功",
-        data={"junction_id": junction_data.name},
-    )
-
 
 @junctionsRouter.delete(
     "/junction/{junction_id:path}",
@@ -298,8 +324,23 @@ async def create_junction(junction_data: JunctionModel):
     response_model=Result,
 )
 @with_exception_handler(default_message="删除失败,文件有误,发生未知错误")
-async def delete_junction(junction_id: str):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def delete_junction(junction_id: str, if_match: IfMatchHeader = None):
+    async with ModelStore.mutate(if_match) as INP:
+        related_conduits = remove_junction(INP, junction_id)
+
+    # 构建响应信息
+    message = f"节点 [ {junction_id} ] 删除成功"
+    if related_conduits:
+        message += f",同时删除 {len(related_conduits)} 条关联渠道"
+    return Result.success_result(message=message)
+
+
+def remove_junction(INP, junction_id: str) -> List[str]:
+    """
+    删除节点及其坐标、入流,并级联删除相连的渠道,须在 ModelStore.mutate() 中调用
+
+    返回被级联删除的渠道名称
+    """
     inp_junctions = INP.check_for_section(Junction)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_conduits = INP.check_for_section(Conduit)
@@ -313,15 +354,13 @@ async def delete_junction(junction_id: str):
         )
 
     # 1. 检查关联渠道并记录
-    related_conduits = [
-        conduit.name
-        for conduit in inp_conduits.values()
-        if conduit.from_node == junction_id or conduit.to_node == junction_id
-    ]
+    topology = ModelStore.topology()
+    related_conduits = topology.links_of(junction_id)
 
     # 2. 删除关联渠道(强制级联删除)
     for conduit_id in related_conduits:
         del inp_conduits[conduit_id]
+        topology.remove(conduit_id)
         # 删除断面信息(如果存在)
         if conduit_id in inp_xsections:
             del inp_xsections[conduit_id]
@@ -337,11 +376,4 @@ async def delete_junction(junction_id: str):
     if (junction_id, "FLOW") in inp_inflows:
         del inp_inflows[(junction_id, "FLOW")]
 
-    # 保存修改
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-
-    # 构建响应信息
-    message = f"节点 [ {junction_id} ] 删除成功"
-    if related_conduits:
-        message += f",同时删除 {len(related_conduits)} 条关联渠道"
-    return Result.success_result(message=message)
+    return related_conduits
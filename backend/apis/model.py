@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from schemas.result import Result
+from utils.model_store import ModelStore
+from utils.out_store import OutStore
+from utils.utils import with_exception_handler
+
+
+modelRouter = APIRouter()
+
+
+@modelRouter.get(
+    "/model/cache",
+    summary="获取模型缓存统计",
+    description="获取进程内 INP 模型缓存和计算结果(.out)缓存的命中/未命中次数,以及当前缓存对应文件的 mtime、大小等信息",
+)
+@with_exception_handler(default_message="获取失败,发生未知错误")
+async def get_model_cache_stats():
+    return Result.success_result(
+        message="成功获取模型缓存统计",
+        data={**ModelStore.stats(), **OutStore.stats()},
+    )
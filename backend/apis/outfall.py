@@ -1,5 +1,4 @@
 from fastapi import APIRouter, HTTPException
-from swmm_api import SwmmInput
 from swmm_api.input_file.sections import Outfall
 from swmm_api.input_file.sections.node_component import Coordinate
 from swmm_api.input_file.sections import Junction
@@ -7,15 +6,16 @@ from swmm_api.input_file.sections.link import Conduit
 from swmm_api.input_file.sections.link_component import CrossSection
 from typing import List
 
-from utils.coordinate_converter import utm_to_wgs84, wgs84_to_utm
+from utils.coordinate_converter import (
+    coordinates_project_to_wgs84,
+    get_project_crs,
+    wgs84_to_project,
+)
 from schemas.outfall import OutfallModel
 from schemas.result import Result
-from utils.swmm_constant import (
-    SWMM_FILE_INP_PATH,
-    ENCODING,
-)
 import numpy as np
-from utils.utils import with_exception_handler
+from utils.model_store import ModelStore
+from utils.utils import IfMatchHeader, with_exception_handler
 
 
 outfallRouter = APIRouter()
@@ -35,27 +35,28 @@ outfallRouter = APIRouter()
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_outfalls():
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_outfalls = INP.check_for_section(Outfall)
-    inp_coordinates = INP.check_for_section(Coordinate)
-    outfalls = [
-        OutfallModel(
-            name=outfall.name,
-            lon=lon,
-            lat=lat,
-            elevation=outfall.elevation,
-            kind=outfall.kind,
-            data=outfall.data if outfall.kind == "FIXED" else None,
+    async with ModelStore.read() as INP:
+        inp_outfalls = INP.check_for_section(Outfall)
+        inp_coordinates = INP.check_for_section(Coordinate)
+        # 一次性批量转换所有出口坐标,没有坐标的出口会被跳过
+        lon_lats = coordinates_project_to_wgs84(
+            inp_coordinates, get_project_crs(INP), inp_outfalls.keys()
+        )
+        outfalls = [
+            OutfallModel(
+                name=outfall.name,
+                lon=lon_lats[outfall.name][0],
+                lat=lon_lats[outfall.name][1],
+                elevation=outfall.elevation,
+                kind=outfall.kind,
+                data=outfall.data if outfall.kind == "FIXED" else None,
+            )
+            for outfall in inp_outfalls.values()
+            if outfall.name in lon_lats
+        ]
+        return Result.success_result(
+            data=outfalls, message=f"成功获取所有出口数据,共({len(outfalls)}个)"
         )
-        for outfall in inp_outfalls.values()
-        if (coord := inp_coordinates.get(outfall.name))
-        and (lon_lat := utm_to_wgs84(coord.x, coord.y))
-        and (lon := lon_lat[0])
-        and (lat := lon_lat[1])
-    ]
-    return Result.success_result(
-        data=outfalls, message=f"成功获取所有出口数据,共({len(outfalls)}个)"
-    )
 
 
 @outfallRouter.post(
@@ -66,39 +67,41 @@ async def get_outfalls():
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def batch_get_outfalls_by_ids(ids: List[str]):
     """通过出口ID列表批量获取出口信息"""
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_outfalls = INP.check_for_section(Outfall)
-    inp_coordinates = INP.check_for_section(Coordinate)
+    async with ModelStore.read() as INP:
+        inp_outfalls = INP.check_for_section(Outfall)
+        inp_coordinates = INP.check_for_section(Coordinate)
 
-    outfalls = []
-    outfalls_name = []
-
-    for outfall_id in ids:
-        outfall = inp_outfalls.get(outfall_id)
-        if not outfall:
-            continue
-
-        # 获取坐标
-        coord = inp_coordinates.get(outfall.name)
-        lon_lat = utm_to_wgs84(coord.x, coord.y)
-        lon = lon_lat[0]
-        lat = lon_lat[1]
-
-        # 构造 OutfallModel 对象并添加到列表
-        outfall_model = OutfallModel(
-            name=outfall.name,
-            lon=lon,
-            lat=lat,
-            elevation=outfall.elevation,
-            kind=outfall.kind,
-            data=outfall.data if outfall.kind == "FIXED" else None,
+        # 一次性批量转换所有请求出口的坐标
+        lon_lats = coordinates_project_to_wgs84(
+            inp_coordinates, get_project_crs(INP), ids
         )
-        outfalls.append(outfall_model)
-        outfalls_name.append(outfall.name)
 
-    return Result.success_result(
-        data=outfalls, message=f"成功获取 {outfalls_name} 出口数据"
-    )
+        outfalls = []
+        outfalls_name = []
+
+        for outfall_id in ids:
+            outfall = inp_outfalls.get(outfall_id)
+            if not outfall:
+                continue
+
+            # 获取坐标
+            lon, lat = lon_lats[outfall.name]
+
+            # 构造 OutfallModel 对象并添加到列表
+            outfall_model = OutfallModel(
+                name=outfall.name,
+                lon=lon,
+                lat=lat,
+                elevation=outfall.elevation,
+                kind=outfall.kind,
+                data=outfall.data if outfall.kind == "FIXED" else None,
+            )
+            outfalls.append(outfall_model)
+            outfalls_name.append(outfall.name)
+
+        return Result.success_result(
+            data=outfalls, message=f"成功获取 {outfalls_name} 出口数据"
+        )
 
 
 @outfallRouter.put(
@@ -107,8 +110,26 @@ async def batch_get_outfalls_by_ids(ids: List[str]):
     description="通过指定出口ID,更新出口的相关信息",
 )
 @with_exception_handler(default_message="更新失败,文件有误,发生未知错误")
-async def update_outfall(outfall_id: str, outfall_update: OutfallModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def update_outfall(
+    outfall_id: str,
+    outfall_update: OutfallModel,
+    if_match: IfMatchHeader = None,
+):
+    async with ModelStore.mutate(if_match) as INP:
+        edit_outfall(INP, outfall_id, outfall_update)
+
+    return Result.success_result(
+        message=f"出口 [ {outfall_update.name} ] 更新成功",
+        data={"id": outfall_update.name, "type": "outfall"},
+    )
+
+
+def edit_outfall(INP, outfall_id: str, outfall_update: OutfallModel) -> None:
+    """
+    校验并修改出口(可改名),须在 ModelStore.mutate() 中调用
+
+    出口改名时同步修改相连渠道的起终点;校验不通过时抛出 HTTPException
+    """
     inp_outfalls = INP.check_for_section(Outfall)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_junctions = INP.check_for_section(Junction)
@@ -149,25 +170,19 @@ async def update_outfall(outfall_id: str, outfall_update: OutfallModel):
 
     # 2.更新坐标数据
     del inp_coordinates[outfall_id]
-    utm_x, utm_y = wgs84_to_utm(outfall_update.lon, outfall_update.lat)
+    x, y = wgs84_to_project(
+        outfall_update.lon, outfall_update.lat, get_project_crs(INP)
+    )
     inp_coordinates[outfall_update.name] = Coordinate(
-        node=outfall_update.name, x=utm_x, y=utm_y
+        node=outfall_update.name, x=x, y=y
     )
 
     # 3.更新CONDUITS的起点和终点的名称
     # 如果出口名称发生变化,则需要更新所有与该节点相关的渠道的出口和终点名称
     if outfall_id != outfall_update.name:
-        for conduit in inp_conduits.values():
-            if conduit.from_node == outfall_id:
-                conduit.from_node = outfall_update.name
-            elif conduit.to_node == outfall_id:
-                conduit.to_node = outfall_update.name
-
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(
-        message=f"出口 [ {outfall_update.name} ] 更新成功",
-        data={"id": outfall_update.name, "type": "outfall"},
-    )
+        ModelStore.topology().rename_node(
+            outfall_id, outfall_update.name, inp_conduits
+        )
 
 
 @outfallRouter.post(
@@ -176,8 +191,21 @@ async def update_outfall(outfall_id: str, outfall_update: OutfallModel):
     description="在 SWMM 模型中创建一个新的 Outfall,并更新坐标数据",
 )
 @with_exception_handler(default_message="创建失败,文件有误,发生未知错误")
-async def create_outfall(outfall_data: OutfallModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def create_outfall(outfall_data: OutfallModel, if_match: IfMatchHeader = None):
+    async with ModelStore.mutate(if_match) as INP:
+        add_outfall(INP, outfall_data)
+
+    return Result.success_result(
+        message="出口创建成功", data={"outfall_id": outfall_data.name}
+    )
+
+
+def add_outfall(INP, outfall_data: OutfallModel) -> None:
+    """
+    校验并向模型中添加出口,须在 ModelStore.mutate() 中调用
+
+    校验不通过时抛出 HTTPException,此时模型未被修改
+    """
     inp_outfalls = INP.check_for_section(Outfall)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_junctions = INP.check_for_section(Junction)
@@ -203,15 +231,12 @@ async def create_outfall(outfall_data: OutfallModel):
         data=outfall_data.data if outfall_data.kind == "FIXED" else np.nan,
     )
 
-    # 2. 计算 UTM 坐标并创建 Coordinate
-    utm_x, utm_y = wgs84_to_utm(outfall_data.lon, outfall_data.lat)
-    inp_coordinates[outfall_data.name] = Coordinate(
-        node=outfall_data.name, x=utm_x, y=utm_y
+    # 2. 计算项目坐标系坐标并创建 Coordinate
+    x, y = wgs84_to_project(
+        outfall_data.lon, outfall_data.lat, get_project_crs(INP)
     )
-
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(
-        message="出口创建成功", data={"outfall_id": outfall_data.name}
+    inp_coordinates[outfall_data.name] = Coordinate(
+        node=outfall_data.name, x=x, y=y
     )
 
 
@@ -222,8 +247,24 @@ async def create_outfall(outfall_data: OutfallModel):
     response_model=Result,
 )
 @with_exception_handler(default_message="删除失败,文件有误,发生未知错误")
-async def delete_outfall(outfall_id: str):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def delete_outfall(outfall_id: str, if_match: IfMatchHeader = None):
+    async with ModelStore.mutate(if_match) as INP:
+        related_conduits = remove_outfall(INP, outfall_id)
+
+    # 构建响应信息
+    message = f"节点 [ {outfall_id} ] 删除成功"
+    if related_conduits:
+        message += f",同时删除 {len(related_conduits)} 条关联渠道"
+
+    return Result.success_result(message=message)
+
+
+def remove_outfall(INP, outfall_id: str) -> List[str]:
+    """
+    删除出口及其坐标,并级联删除相连的渠道,须在 ModelStore.mutate() 中调用
+
+    返回被级联删除的渠道名称
+    """
     inp_outfalls = INP.check_for_section(Outfall)
     inp_coordinates = INP.check_for_section(Coordinate)
     inp_conduits = INP.check_for_section(Conduit)
@@ -237,15 +278,13 @@ async def delete_outfall(outfall_id: str):
         )
 
     # 1. 检查关联渠道并记录
-    related_conduits = [
-        conduit.name
-        for conduit in inp_conduits.values()
-        if conduit.from_node == outfall_id or conduit.to_node == outfall_id
-    ]
+    topology = ModelStore.topology()
+    related_conduits = topology.links_of(outfall_id)
 
     # 2. 删除关联渠道(强制级联删除)
     for conduit_id in related_conduits:
         del inp_conduits[conduit_id]
+        topology.remove(conduit_id)
         # 删除断面信息(如果存在)
         if conduit_id in inp_xsections:
             del inp_xsections[conduit_id]
@@ -257,11 +296,4 @@ async def delete_outfall(outfall_id: str):
     if outfall_id in inp_coordinates:
         del inp_coordinates[outfall_id]
 
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-
-    # 构建响应信息
-    message = f"节点 [ {outfall_id} ] 删除成功"
-    if related_conduits:
-        message += f",同时删除 {len(related_conduits)} 条关联渠道"
-
-    return Result.success_result(message=message)
+    return related_conduits
@@ -1,38 +1,44 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
-import os
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 import geopandas as gpd
+import numpy as np
+import shapely
 from shapely.geometry import Point, LineString, Polygon
 import pandas as pd
 import json
 from collections import defaultdict
-import tempfile
+from functools import partial
+import asyncio
 import uuid
 
 
+from config import SwmmConfig
 from schemas.river import (
     RiverClipRequest,
+    RiverJobModel,
     RiverNetworkRequest,
     RiverNetworkImportRequest,
 )
 from schemas.junction import JunctionModel
 from schemas.conduit import ConduitRequestModel
 from schemas.result import Result
-from utils.utils import with_exception_handler
-from apis.junction import create_junction as create_junction_api
-from apis.conduit import create_conduit as create_conduit_api
+from utils.utils import IfMatchHeader, with_exception_handler
+from utils.model_store import ModelStore
+from utils.coordinate_converter import get_project_crs, points_wgs84_to_project
+from utils.river_jobs import RiverJobCancelled, RiverJobManager
+from utils.river_cache import RiverResultCache, result_cache_key
+from utils.river_layer import RIVER_SHAPEFILE_PATH, RiverLayer, layer_fingerprint
+from apis.junction import add_junction
+from apis.conduit import add_conduit
 
 riverRouter = APIRouter()
 
-# 定义水系 shapefile 路径常量
-RIVER_SHAPEFILE_PATH = Path("static/river_network/研究区域水系.shp")
-# 配置 GDAL 环境变量，允许自动恢复或创建缺失的 .shx 文件
-os.environ["SHAPE_RESTORE_SHX"] = "YES"
-
 # 坐标参考系常量
 DEFAULT_CRS = "EPSG:4326"  # WGS84
 METRIC_EPSG = 3857  # Web Mercator，方便按"米"计算长度
+# 水系打断时合并相近节点的距离（米）
+RIVER_MERGE_DIST = 800.0
 
 CoordKey = Tuple[float, float]
 
@@ -66,6 +72,39 @@ def extract_point_coordinates(feature: dict) -> Optional[Tuple[float, float]]:
 # ==================== 水系打断相关函数 ====================
 
 
+def geojson_features(geojson: dict) -> List[dict]:
+    """把 GeoJSON（FeatureCollection / Feature / 几何对象）统一为要素列表"""
+    geojson_type = geojson.get("type")
+    if geojson_type == "FeatureCollection":
+        return geojson.get("features") or []
+    if geojson_type == "Feature":
+        return [geojson]
+    return [{"type": "Feature", "geometry": geojson, "properties": {}}]
+
+
+def read_geojson(geojson: dict) -> gpd.GeoDataFrame:
+    """在内存中把 GeoJSON 转换为 GeoDataFrame，未通过 crs 字段声明坐标系时按 WGS84 处理"""
+    crs_name = ((geojson.get("crs") or {}).get("properties") or {}).get("name")
+    return gpd.GeoDataFrame.from_features(
+        geojson_features(geojson), crs=crs_name or DEFAULT_CRS
+    )
+
+
+def count_geojson_vertices(geojson: dict) -> int:
+    """统计 GeoJSON 中线要素的顶点数（不解析几何），用于判断是否转为后台任务"""
+    count = 0
+    for feature in geojson_features(geojson):
+        geometry = feature.get("geometry") if isinstance(feature, dict) else None
+        if not isinstance(geometry, dict):
+            continue
+        coords = geometry.get("coordinates") or []
+        if geometry.get("type") == "MultiLineString":
+            count += sum(len(part) for part in coords if isinstance(part, list))
+        else:
+            count += len(coords)
+    return count
+
+
 def ensure_crs(
     gdf: gpd.GeoDataFrame, default_crs: str = DEFAULT_CRS
 ) -> gpd.GeoDataFrame:
@@ -89,36 +128,93 @@ def iter_lines(geom) -> Iterable:
                 yield part
 
 
+def round_like_builtin(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    按 Python round(value, ndigits) 的规则批量取整
+
+    np.round 只在数值接近 .5 个最小单位时可能与 round() 相差一个单位，
+    这些位置改用 round() 计算，其余直接使用 np.round 的结果
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, ndigits)
+    scaled = values * 10.0**ndigits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-3
+    rounded[near_half] = [round(v, ndigits) for v in values[near_half].tolist()]
+    return rounded
+
+
 def find_confluence_nodes(
     gdf_m: gpd.GeoDataFrame,
     precision: int = 0,
 ) -> Dict[CoordKey, Point]:
-    """在投影坐标下识别河流交汇点（基于不同几何要素的顶点重合）"""
-    node_features: Dict[CoordKey, Set[int]] = defaultdict(set)
-    node_geom: Dict[CoordKey, Tuple[float, float]] = {}
+    """
+    在投影坐标下识别河流交汇点（基于不同几何要素的顶点重合）
 
-    for feature_idx, geom in enumerate(gdf_m.geometry):
-        for line in iter_lines(geom):
-            for x, y, *_ in line.coords:
-                key = (round(x, precision), round(y, precision))
-                node_features[key].add(feature_idx)
-                node_geom[key] = (x, y)
+    全部线要素的顶点由 shapely.get_coordinates 一次取出，按 round(x/y, precision)
+    取整后排序分组，同一位置的顶点来自两个及以上要素时即为交汇点。
+    结果按位置首次出现的顺序排列，点坐标为该位置最后出现的顶点坐标
+    """
+    # 只处理线/多线（同 iter_lines）
+    geoms_m = np.asarray(gdf_m.geometry.values)
+    feature_idx = np.flatnonzero(
+        np.isin(
+            shapely.get_type_id(geoms_m),
+            (shapely.GeometryType.LINESTRING, shapely.GeometryType.MULTILINESTRING),
+        )
+    )
+    coords, vertex_feature = shapely.get_coordinates(
+        geoms_m[feature_idx], return_index=True
+    )
+    if len(coords) == 0:
+        return {}
+    vertex_feature = feature_idx[vertex_feature]
+    # + 0.0 把 -0.0 变为 0.0，与字典键的相等判断一致
+    key_x = round_like_builtin(coords[:, 0], precision) + 0.0
+    key_y = round_like_builtin(coords[:, 1], precision) + 0.0
+
+    # 稳定排序后同一位置的顶点相邻且保持原顺序，要素序号在组内不减，
+    # 组内首尾顶点的要素不同即说明该位置有两个及以上要素
+    order = np.lexsort((key_y, key_x))
+    sorted_x, sorted_y = key_x[order], key_y[order]
+    starts = np.flatnonzero(
+        np.r_[True, (sorted_x[1:] != sorted_x[:-1]) | (sorted_y[1:] != sorted_y[:-1])]
+    )
+    ends = np.r_[starts[1:], len(order)] - 1
+    first, last = order[starts], order[ends]
+    is_confluence = vertex_feature[first] != vertex_feature[last]
+    first, last = first[is_confluence], last[is_confluence]
+
+    by_first = np.argsort(first)
+    first, last = first[by_first], last[by_first]
+    keys = zip(key_x[first].tolist(), key_y[first].tolist())
+    return {key: Point(x, y) for key, (x, y) in zip(keys, coords[last].tolist())}
 
-    confluences: Dict[CoordKey, Point] = {}
-    for key, features in node_features.items():
-        if len(features) >= 2:
-            x, y = node_geom[key]
-            confluences[key] = Point(x, y)
 
-    return confluences
+def _unique_sorted(
+    groups: np.ndarray, values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """按 (groups, values) 排序并去掉重复项，相当于对每组的 values 做 sorted(set(...))"""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    keep = np.ones(len(groups), dtype=bool)
+    keep[1:] = (groups[1:] != groups[:-1]) | (values[1:] != values[:-1])
+    return groups[keep], values[keep]
 
 
 def generate_points_along_rivers(
     gdf: gpd.GeoDataFrame,
     spacing: float = 500.0,
     precision: int = 0,
+    check: Optional[Callable[[], None]] = None,
 ) -> gpd.GeoDataFrame:
-    """在河道上按规则打点（起点/交汇点/终点分段 + 区段内均匀）"""
+    """
+    在河道上按规则打点（起点/交汇点/终点分段 + 区段内均匀）
+
+    全部河段的断点和采样位置都以 NumPy 数组批量计算，采样点由
+    shapely.line_interpolate_point 一次生成，属性按 line_idx 从原表中按下标取出。
+    check 为取消检查函数，在各步骤之间调用
+    """
+    checkpoint = check or (lambda: None)
     if spacing <= 0:
         raise ValueError("spacing 必须为正数（单位：米）")
 
@@ -129,52 +225,117 @@ def generate_points_along_rivers(
     gdf_m = gdf.to_crs(epsg=METRIC_EPSG)
     confluence_nodes = find_confluence_nodes(gdf_m, precision=precision)
 
-    point_records: List[dict] = []
-    point_geoms_m: List[Point] = []
-
-    for line_idx, (geom_m, row) in enumerate(zip(gdf_m.geometry, gdf.itertuples())):
-        row_dict = row._asdict()
-        row_dict.pop("Index", None)
+    # 1. 拆分为单条 LineString（同 iter_lines，只处理线/多线），跳过零长度的线
+    geoms_m = np.asarray(gdf_m.geometry.values)
+    feature_idx = np.flatnonzero(
+        np.isin(
+            shapely.get_type_id(geoms_m),
+            (shapely.GeometryType.LINESTRING, shapely.GeometryType.MULTILINESTRING),
+        )
+    )
+    lines, part_of = shapely.get_parts(geoms_m[feature_idx], return_index=True)
+    line_idx = feature_idx[part_of]
+    lengths = shapely.length(lines)
+    has_length = lengths > 0
+    lines, line_idx = lines[has_length], line_idx[has_length]
+    lengths = lengths[has_length]
+
+    checkpoint()
+
+    # 2. 断点：起点、终点，以及线上顶点处交汇点在该线上的投影位置
+    coords, vertex_part = shapely.get_coordinates(lines, return_index=True)
+    keys = list(
+        zip(
+            round_like_builtin(coords[:, 0], precision).tolist(),
+            round_like_builtin(coords[:, 1], precision).tolist(),
+        )
+    )
+    is_confluence = np.array([key in confluence_nodes for key in keys], dtype=bool)
+    confluence_part = vertex_part[is_confluence]
+    confluence_pos = shapely.line_locate_point(
+        lines[confluence_part],
+        [confluence_nodes[key] for key in keys if key in confluence_nodes],
+    )
 
-        for line_geom in iter_lines(geom_m):
-            if line_geom.length == 0.0:
-                continue
+    parts = np.arange(len(lines))
+    break_part, break_pos = _unique_sorted(
+        np.concatenate([parts, parts, confluence_part]),
+        np.concatenate([np.zeros(len(lines)), lengths, confluence_pos]),
+    )
 
-            break_positions: Set[float] = {0.0, float(line_geom.length)}
+    checkpoint()
+
+    # 3. 相邻断点构成区段，区段内均匀打点（至少包含区段两端）
+    same_part = break_part[1:] == break_part[:-1]
+    seg_part = break_part[1:][same_part]
+    seg_start = break_pos[:-1][same_part]
+    seg_len = break_pos[1:][same_part] - seg_start
+
+    n_points = np.maximum(2, (seg_len / spacing).astype(np.int64) + 1)
+    step = seg_len / (n_points - 1)
+    seg_first = np.repeat(np.cumsum(n_points) - n_points, n_points)
+    offsets = np.arange(n_points.sum()) - seg_first
+    positions = np.repeat(seg_start, n_points) + offsets * np.repeat(step, n_points)
+    # 保留到毫米，与逐点 round(pos, 3) 的结果一致
+    rounded = round_like_builtin(positions, 3)
+    sample_part, sample_pos = _unique_sorted(np.repeat(seg_part, n_points), rounded)
+
+    checkpoint()
+
+    # 4. 批量插值生成采样点，属性按下标从原表取出
+    point_geoms_m = shapely.line_interpolate_point(lines[sample_part], sample_pos)
+    sample_line_idx = line_idx[sample_part]
+    attributes = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    point_records = (
+        attributes.iloc[sample_line_idx]
+        .reset_index(drop=True)
+        .assign(line_idx=sample_line_idx, s_m=sample_pos)
+    )
 
-            for x, y, *_ in line_geom.coords:
-                key = (round(x, precision), round(y, precision))
-                if key in confluence_nodes:
-                    p = confluence_nodes[key]
-                    d = float(line_geom.project(p))
-                    break_positions.add(d)
+    checkpoint()
 
-            sorted_breaks = sorted(break_positions)
-            sample_positions: Set[float] = set()
+    pts_gdf_m = gpd.GeoDataFrame(point_records, geometry=point_geoms_m, crs=gdf_m.crs)
+    pts_gdf = pts_gdf_m.to_crs(gdf.crs)
+    return pts_gdf
 
-            for start_d, end_d in zip(sorted_breaks[:-1], sorted_breaks[1:]):
-                seg_len = end_d - start_d
-                if seg_len <= 0:
-                    continue
 
-                n_points = max(2, int(seg_len / spacing) + 1)
-                step = seg_len / (n_points - 1)
+# 网格哈希中节点所在格及周围 8 个格的偏移
+_NEIGHBOR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
 
-                for i in range(n_points):
-                    pos = start_d + i * step
-                    sample_positions.add(round(pos, 3))
 
-            for s_m in sorted(sample_positions):
-                p_m = line_geom.interpolate(s_m)
-                point_geoms_m.append(p_m)
+def merge_close_nodes(xy: np.ndarray, merge_dist: float) -> List[List[int]]:
+    """
+    按距离合并相近节点，返回各簇的节点下标（簇内按下标升序）
 
-                rec = dict(row_dict)
-                rec.update({"line_idx": line_idx, "s_m": float(s_m)})
-                point_records.append(rec)
+    结果与逐对比较一致：按顺序取尚未归簇的节点，把距它小于 merge_dist 且尚未归簇的
+    节点并入同一簇。坐标按边长 merge_dist 的网格分桶，每个节点只与周围 3x3 格内的
+    节点计算距离，不再两两比较；坐标为 NaN 的节点（空几何）不参与合并
+    """
+    valid = np.isfinite(xy).all(axis=1)
+    used = ~valid
+    valid_idx = np.flatnonzero(valid)
+    cells = np.floor(xy[valid_idx] / merge_dist).astype(np.int64).tolist()
+
+    buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for idx, (cx, cy) in zip(valid_idx.tolist(), cells):
+        buckets[(cx, cy)].append(idx)
+    grid = {cell: np.array(members) for cell, members in buckets.items()}
+
+    clusters: List[List[int]] = []
+    for i, (cx, cy) in zip(valid_idx.tolist(), cells):
+        if used[i]:
+            continue
+        neighbors = ((cx + dx, cy + dy) for dx, dy in _NEIGHBOR_OFFSETS)
+        candidates = np.concatenate([grid[c] for c in neighbors if c in grid])
+        candidates = candidates[~used[candidates]]
+        # 与 shapely 点距离的计算方式相同（sqrt(dx² + dy²)），保证边界情况一致
+        delta = xy[candidates] - xy[i]
+        dist = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+        members = np.sort(candidates[dist < merge_dist])
+        used[members] = True
+        clusters.append(members.tolist())
 
-    pts_gdf_m = gpd.GeoDataFrame(point_records, geometry=point_geoms_m, crs=gdf_m.crs)
-    pts_gdf = pts_gdf_m.to_crs(gdf.crs)
-    return pts_gdf
+    return clusters
 
 
 def build_river_network(
@@ -182,186 +343,195 @@ def build_river_network(
     spacing: float = 3000.0,
     merge_dist: float = 800.0,
     precision: int = 0,
+    check: Optional[Callable[[], None]] = None,
 ) -> gpd.GeoDataFrame:
-    """从河网 GeoDataFrame 生成节点+渠道网络"""
-    pts_full = generate_points_along_rivers(gdf, spacing=spacing, precision=precision)
+    """
+    从河网 GeoDataFrame 生成节点+渠道网络
+
+    check 为取消检查函数（见 RiverJobManager），在各处理阶段之间调用
+    """
+    checkpoint = check or (lambda: None)
+    pts_full = generate_points_along_rivers(
+        gdf, spacing=spacing, precision=precision, check=checkpoint
+    )
+    if "line_idx" not in pts_full.columns or "s_m" not in pts_full.columns:
+        raise ValueError(
+            "generate_points_along_rivers 输出必须包含 line_idx 和 s_m 字段"
+        )
 
     pts_full = ensure_crs(pts_full)
     pts_m = pts_full.to_crs(epsg=METRIC_EPSG)
 
-    node_key_to_id: Dict[CoordKey, int] = {}
-    node_geoms_m: List[Point] = []
-    node_records: List[dict] = []
-    point_to_node: Dict[int, int] = {}
-
-    next_node_id = 1
-
-    for idx, geom in enumerate(pts_m.geometry):
-        if geom is None or geom.is_empty:
-            continue
-        key = (round(geom.x, precision), round(geom.y, precision))
-        node_id = node_key_to_id.get(key)
-        if node_id is None:
-            node_id = next_node_id
-            next_node_id += 1
-            node_key_to_id[key] = node_id
-            node_geoms_m.append(geom)
-            node_records.append({"node_id": node_id})
-        point_to_node[idx] = node_id
-
-    nodes_m = gpd.GeoDataFrame(node_records, geometry=node_geoms_m, crs=pts_m.crs)
+    # 1. 坐标按 round(x/y, precision) 取整后相同的采样点为同一节点，
+    #    节点按首次出现的顺序从 1 编号，几何取首次出现的采样点
+    geoms_m = np.asarray(pts_m.geometry.values)
+    point_idx = np.flatnonzero(
+        ~(shapely.is_missing(geoms_m) | shapely.is_empty(geoms_m))
+    )
+    xy_m = shapely.get_coordinates(geoms_m[point_idx])
+    # + 0.0 把 -0.0 变为 0.0，与字典键的相等判断一致
+    key_x = round_like_builtin(xy_m[:, 0], precision) + 0.0
+    key_y = round_like_builtin(xy_m[:, 1], precision) + 0.0
+    order = np.lexsort((key_y, key_x))
+    new_key = np.ones(len(order), dtype=bool)
+    new_key[1:] = (key_x[order][1:] != key_x[order][:-1]) | (
+        key_y[order][1:] != key_y[order][:-1]
+    )
+    # 稳定排序后组内保持原顺序，每组第一个即首次出现的采样点
+    first = order[new_key]
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    point_node = np.empty(len(order), dtype=np.int64)  # 各有效采样点的节点编号
+    point_node[order] = rank[np.cumsum(new_key) - 1] + 1
+    node_geoms_m = geoms_m[point_idx[np.sort(first)]]
+
+    nodes_m = gpd.GeoDataFrame(
+        {"node_id": np.arange(1, len(node_geoms_m) + 1)},
+        geometry=node_geoms_m,
+        crs=pts_m.crs,
+    )
     nodes_gdf = nodes_m.to_crs(gdf.crs)
+    checkpoint()
 
     if merge_dist > 0:
-        used_idx: Set[int] = set()
-        old_to_new_id: Dict[int, int] = {}
-        merged_geoms_m: List[Point] = []
-        merged_records: List[dict] = []
-
-        geoms_nodes_m = list(nodes_m.geometry)
-        node_ids_arr = list(nodes_m["node_id"])
-
-        new_node_id = 1
-        for i, geom_i in enumerate(geoms_nodes_m):
-            if i in used_idx:
-                continue
-            if geom_i is None or geom_i.is_empty:
-                continue
-
-            cluster_idx = [i]
-            used_idx.add(i)
-
-            for j in range(i + 1, len(geoms_nodes_m)):
-                if j in used_idx:
-                    continue
-                geom_j = geoms_nodes_m[j]
-                if geom_j is None or geom_j.is_empty:
-                    continue
-                if geom_i.distance(geom_j) < merge_dist:
-                    used_idx.add(j)
-                    cluster_idx.append(j)
-
-            xs = [geoms_nodes_m[k].x for k in cluster_idx]
-            ys = [geoms_nodes_m[k].y for k in cluster_idx]
-            rep_geom = Point(sum(xs) / len(xs), sum(ys) / len(ys))
-
-            curr_new_id = new_node_id
-            new_node_id += 1
-            merged_geoms_m.append(rep_geom)
-            merged_records.append({"node_id": curr_new_id})
+        # 2. 合并相近节点，新节点位于簇内节点的平均位置，按簇的顺序从 1 编号
+        xy = np.full((len(node_geoms_m), 2), np.nan)
+        empty = shapely.is_missing(node_geoms_m) | shapely.is_empty(node_geoms_m)
+        xy[~empty] = shapely.get_coordinates(node_geoms_m[~empty])
+
+        clusters = merge_close_nodes(xy, merge_dist)
+        sizes = np.fromiter((len(c) for c in clusters), dtype=np.int64)
+        members = np.fromiter(
+            (k for c in clusters for k in c), dtype=np.int64, count=sizes.sum()
+        )
+        cluster_of = np.repeat(np.arange(len(clusters)), sizes)
+        # bincount 按簇内下标顺序逐个累加，与 sum() 的结果一致
+        mean_x = np.bincount(cluster_of, xy[members, 0], len(clusters)) / sizes
+        mean_y = np.bincount(cluster_of, xy[members, 1], len(clusters)) / sizes
 
-            for k in cluster_idx:
-                old_id = int(node_ids_arr[k])
-                old_to_new_id[old_id] = curr_new_id
+        # 旧编号 -> 新编号，未归簇的节点保持原编号
+        node_map = np.arange(len(node_geoms_m) + 1)
+        node_map[members + 1] = cluster_of + 1
+        point_node = node_map[point_node]
 
         nodes_m = gpd.GeoDataFrame(
-            merged_records, geometry=merged_geoms_m, crs=nodes_m.crs
+            {"node_id": np.arange(1, len(clusters) + 1)},
+            geometry=shapely.points(mean_x, mean_y),
+            crs=nodes_m.crs,
         )
         nodes_gdf = nodes_m.to_crs(gdf.crs)
+        checkpoint()
+
+    # 3. 同一河道上的采样点按里程排序，相邻两点属于不同节点时生成一条渠道
+    line_of = pts_full["line_idx"].to_numpy()[point_idx]
+    s_m = pts_full["s_m"].to_numpy()[point_idx]
+    order = np.lexsort((s_m, line_of))
+    line_sorted, node_sorted = line_of[order], point_node[order]
+    is_link = (line_sorted[1:] == line_sorted[:-1]) & (
+        node_sorted[1:] != node_sorted[:-1]
+    )
+    from_ids, to_ids = node_sorted[:-1][is_link], node_sorted[1:][is_link]
 
-        for idx, old_id in list(point_to_node.items()):
-            new_id = old_to_new_id.get(int(old_id))
-            if new_id is None:
-                new_id = int(old_id)
-            point_to_node[idx] = new_id
-
-    node_geom_map: Dict[int, Point] = {
-        int(row.node_id): row.geometry for row in nodes_gdf.itertuples()
-    }
-
-    link_records: List[dict] = []
-    link_geoms: List[LineString] = []
-
-    # 为渠道顺序编号，便于下游直接使用 node_id 作为唯一标识
-    link_id = 1
-
-    if "line_idx" not in pts_full.columns or "s_m" not in pts_full.columns:
-        raise ValueError(
-            "generate_points_along_rivers 输出必须包含 line_idx 和 s_m 字段"
-        )
-
-    for line_idx in sorted(pts_full["line_idx"].unique()):
-        sub = pts_full[pts_full["line_idx"] == line_idx].copy()
-        if sub.empty:
-            continue
-
-        node_ids: List[int] = []
-        for i in sub.index:
-            n_id = point_to_node.get(i)
-            if n_id is None:
-                continue
-            node_ids.append(n_id)
-        if len(node_ids) != len(sub):
-            sub = sub.loc[[i for i in sub.index if i in point_to_node]]
-            if sub.empty:
-                continue
+    # 节点编号即其在 nodes_gdf 中的行号 + 1，渠道几何一次生成
+    node_geoms = np.asarray(nodes_gdf.geometry.values)
+    node_xy = shapely.get_coordinates(
+        node_geoms, include_z=bool(shapely.has_z(node_geoms).any())
+    )
+    link_geoms = shapely.linestrings(
+        np.stack([node_xy[from_ids - 1], node_xy[to_ids - 1]], axis=1)
+    )
+    checkpoint()
 
-        sub = sub.assign(node_id=[point_to_node[i] for i in sub.index])
-        sub = sub.sort_values("s_m")
+    # 4. 生成节点/渠道编号，如 A3-J1、A3-C1
+    base_prefix = new_id_prefix()
+    nodes_out = nodes_gdf.drop(columns=["node_id"])
+    nodes_out["type"] = "node"
+    nodes_out["id"] = [f"{base_prefix}-J{i}" for i in nodes_gdf["node_id"].tolist()]
+
+    links_out = gpd.GeoDataFrame(
+        {
+            "type": "link",
+            "id": [f"{base_prefix}-C{i}" for i in range(1, len(link_geoms) + 1)],
+            "from_id": [f"{base_prefix}-J{i}" for i in from_ids.tolist()],
+            "to_id": [f"{base_prefix}-J{i}" for i in to_ids.tolist()],
+        },
+        geometry=link_geoms,
+        crs=gdf.crs,
+    )
 
-        prev_row = None
-        for row in sub.itertuples():
-            if prev_row is None:
-                prev_row = row
-                continue
+    network_gdf = gpd.GeoDataFrame(
+        pd.concat([nodes_out, links_out], ignore_index=True), crs=nodes_gdf.crs
+    )
 
-            from_id = int(prev_row.node_id)
-            to_id = int(row.node_id)
-            if from_id == to_id:
-                prev_row = row
-                continue
+    # 确保输出坐标系为 WGS84 (EPSG:4326)
+    if network_gdf.crs is None:
+        network_gdf = network_gdf.set_crs("EPSG:4326")
+    elif str(network_gdf.crs) != "EPSG:4326":
+        network_gdf = network_gdf.to_crs("EPSG:4326")
 
-            from_geom = node_geom_map[from_id]
-            to_geom = node_geom_map[to_id]
-            link_geoms.append(LineString([from_geom, to_geom]))
+    return network_gdf
 
-            rec = {
-                "node_id": link_id,
-                "from_id": from_id,
-                "to_id": to_id,
-            }
 
-            link_records.append(rec)
-            link_id += 1
-            prev_row = row
+def new_id_prefix() -> str:
+    """节点/渠道编号的随机前缀，如 A3-J1、A3-C1（使用短前缀避免前端标注过长）"""
+    return uuid.uuid4().hex[:2].upper()
 
-    links_gdf = gpd.GeoDataFrame(link_records, geometry=link_geoms, crs=gdf.crs)
 
-    nodes_out = nodes_gdf.copy()
-    nodes_out["type"] = "node"
-    # 使用短前缀避免前端标注过长
-    base_prefix = uuid.uuid4().hex[:2].upper()
+def with_id_prefix(result: dict, prefix: str) -> dict:
+    """
+    返回把打断结果中节点/渠道编号（id、from_id、to_id）换成新前缀的副本
 
-    # 为节点生成唯一 id，并记录映射方便渠道引用
-    node_id_map: Dict[int, str] = {}
-    for idx, row in enumerate(nodes_out.itertuples(), start=1):
-        node_id_map[int(row.node_id)] = f"{base_prefix}-J{idx}"
+    缓存命中时使用，每次返回的编号前缀与未缓存时一样是新生成的，
+    重复打断同一输入后导入不会与已导入的节点/渠道重名；缓存中的结果不被修改
+    """
 
-    nodes_out["id"] = nodes_out["node_id"].apply(lambda x: node_id_map[int(x)])
-    nodes_out = nodes_out.drop(columns=["node_id"])
+    def renamed(value):
+        return f"{prefix}-{value.partition('-')[2]}" if value is not None else None
 
-    links_out = links_gdf.copy()
-    links_out["type"] = "link"
-    link_id_map: Dict[int, str] = {}
-    for idx, row in enumerate(links_out.itertuples(), start=1):
-        link_id_map[int(row.node_id)] = f"{base_prefix}-C{idx}"
+    features = []
+    for feature in result["geojson"]["features"]:
+        properties = dict(feature["properties"])
+        for field in ("id", "from_id", "to_id"):
+            if field in properties:
+                properties[field] = renamed(properties[field])
+        features.append({**feature, "properties": properties})
+    return {**result, "geojson": {**result["geojson"], "features": features}}
 
-    links_out["id"] = links_out["node_id"].apply(lambda x: link_id_map[int(x)])
-    links_out["from_id"] = links_out["from_id"].apply(lambda x: node_id_map[int(x)])
-    links_out["to_id"] = links_out["to_id"].apply(lambda x: node_id_map[int(x)])
-    links_out = links_out.drop(columns=["node_id"])
 
-    network_gdf = gpd.GeoDataFrame(
-        pd.concat([nodes_out, links_out], ignore_index=True), crs=nodes_gdf.crs
-    )
+def network_to_geojson(network_gdf: gpd.GeoDataFrame) -> dict:
+    """
+    把 build_river_network 的结果直接写成 GeoJSON FeatureCollection 字典
 
-    # 确保输出坐标系为 WGS84 (EPSG:4326)
-    if network_gdf.crs is None:
-        network_gdf = network_gdf.set_crs("EPSG:4326")
-    elif str(network_gdf.crs) != "EPSG:4326":
-        network_gdf = network_gdf.to_crs("EPSG:4326")
+    结构与 to_json(drop_id=True) 相同（不含 crs 字段，缺失的属性为 null），
+    坐标一次性从 shapely 数组取出，不经过 JSON 字符串的序列化与解析。
+    网络中只有节点（Point）和渠道（LineString）
+    """
+    geoms = np.asarray(network_gdf.geometry.values)
+    coords = shapely.get_coordinates(geoms).tolist()
+    ends = np.cumsum(shapely.get_num_coordinates(geoms)).tolist()
+    is_point = (shapely.get_type_id(geoms) == shapely.GeometryType.POINT).tolist()
+
+    columns = [col for col in network_gdf.columns if col != network_gdf.geometry.name]
+    properties = network_gdf[columns].astype(object)
+    properties = properties.where(properties.notna(), None)
+
+    features = []
+    start = 0
+    for values, end, point in zip(properties.itertuples(index=False), ends, is_point):
+        if point:
+            geometry = {"type": "Point", "coordinates": coords[start]}
+        else:
+            geometry = {"type": "LineString", "coordinates": coords[start:end]}
+        features.append(
+            {
+                "type": "Feature",
+                "properties": dict(zip(columns, values)),
+                "geometry": geometry,
+            }
+        )
+        start = end
 
-    return network_gdf
+    return {"type": "FeatureCollection", "features": features}
 
 
 # ==================== 水系切割相关函数 ====================
@@ -388,14 +558,18 @@ def clip_river_by_polygon(
     shapefile_path: Path,
     polygon_coords: List[List[float]],
     boundary_crs: str = "EPSG:4326",
+    check: Optional[Callable[[], None]] = None,
 ) -> dict:
     """
     根据边界坐标裁剪水系 shapefile，返回 GeoJSON 格式
 
+    水系图层由 RiverLayer 缓存并建有空间索引,只对与边界相交的要素做精确裁剪
+
     Args:
         shapefile_path: shapefile 文件路径
         polygon_coords: 边界坐标列表 [[lon, lat], ...]
         boundary_crs: 边界坐标的坐标系，默认 WGS84
+        check: 取消检查函数，在读取、裁剪、转换各步骤之间调用
 
     Returns:
         裁剪后的 GeoJSON 字典
@@ -413,34 +587,26 @@ def clip_river_by_polygon(
     if boundary_poly.is_empty:
         raise HTTPException(status_code=400, detail="边界多边形为空，请检查坐标列表")
 
-    # 读取水系 shapefile
-    river_gdf = gpd.read_file(shapefile_path)
+    checkpoint = check or (lambda: None)
+    checkpoint()
+
+    # 读取水系图层(已缓存,文件未变化时不会重新读取)
+    river_gdf = RiverLayer.get(shapefile_path)
     if river_gdf.empty:
         raise HTTPException(
             status_code=500, detail=f"水系文件 {shapefile_path} 没有数据"
         )
 
-    # 创建边界 GeoDataFrame
-    boundary_gdf = gpd.GeoDataFrame(
-        index=[0], geometry=[boundary_poly], crs=boundary_crs
-    )
-
-    # 检查坐标系，如果没有则设置为默认的 WGS84
-    if river_gdf.crs is None:
-        river_gdf = river_gdf.set_crs("EPSG:4326")
-
-    # 如果坐标系不一致，转换边界坐标系
-    if river_gdf.crs != boundary_gdf.crs:
-        boundary_gdf = boundary_gdf.to_crs(river_gdf.crs)
-
-    # 执行裁剪
-    clipped = gpd.clip(river_gdf, boundary_gdf)
+    # 执行裁剪(边界坐标系与水系不一致时先转换边界坐标系)
+    clipped = RiverLayer.clip(boundary_poly, boundary_crs, shapefile_path, check=check)
 
     if clipped.empty:
         raise HTTPException(
             status_code=400, detail="裁剪结果为空，请确保边界与水系数据有重叠区域"
         )
 
+    checkpoint()
+
     # 转换为 WGS84 以便前端使用
     if clipped.crs is None:
         clipped = clipped.set_crs("EPSG:4326")
@@ -458,6 +624,105 @@ def clip_river_by_polygon(
     return geojson_dict
 
 
+def clip_river_job(polygon: List[List[float]], check: Callable[[], None]) -> dict:
+    """水系切割任务（在 RiverJobManager 的进程池中执行），返回接口的 data"""
+    geojson_result = clip_river_by_polygon(
+        shapefile_path=RIVER_SHAPEFILE_PATH,
+        polygon_coords=polygon,
+        boundary_crs="EPSG:4326",
+        check=check,
+    )
+    return {"geojson": geojson_result}
+
+
+def break_river_job(
+    geojson: dict, break_distance: float, check: Callable[[], None]
+) -> dict:
+    """水系打断任务（在 RiverJobManager 的进程池中执行），返回接口的 data"""
+    try:
+        # 在内存中将 GeoJSON 转换为 GeoDataFrame
+        gdf = read_geojson(geojson)
+
+        if gdf.empty:
+            raise HTTPException(status_code=400, detail="输入的 GeoJSON 数据为空")
+
+        # 检查几何类型
+        valid_types = {"LineString", "MultiLineString"}
+        geom_types = set(gdf.geometry.geom_type.unique())
+        if not geom_types.intersection(valid_types):
+            raise HTTPException(
+                status_code=400,
+                detail=f"GeoJSON 必须包含 LineString 或 MultiLineString 几何类型，当前类型: {geom_types}",
+            )
+
+        # 确保输入数据使用 WGS84
+        if gdf.crs is None:
+            gdf = gdf.set_crs("EPSG:4326")
+        elif str(gdf.crs) != "EPSG:4326":
+            gdf = gdf.to_crs("EPSG:4326")
+
+        # 执行水系打断
+        network_gdf = build_river_network(
+            gdf=gdf,
+            spacing=break_distance,
+            merge_dist=RIVER_MERGE_DIST,
+            precision=0,
+            check=check,
+        )
+
+        # 统计节点和渠道数量
+        node_count = len(network_gdf[network_gdf["type"] == "node"])
+        link_count = len(network_gdf[network_gdf["type"] == "link"])
+
+        # 转换为 GeoJSON（不包含 CRS 信息，因为 GeoJSON 默认就是 WGS84）
+        network_geojson = network_to_geojson(network_gdf)
+
+        response_data = {
+            "geojson": network_geojson,
+            "node_count": node_count,
+            "link_count": link_count,
+            "spacing": break_distance,
+            "message": f"水系打断成功，生成 {node_count} 个节点和 {link_count} 条渠道",
+        }
+
+        return response_data
+
+    except (HTTPException, RiverJobCancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
+
+
+def clip_cache_key(polygon: List[List[float]], source: str) -> str:
+    """水系切割结果的缓存键：边界坐标 + 水系图层指纹"""
+    params = {
+        "polygon": [[float(lon), float(lat)] for lon, lat in polygon],
+        "crs": DEFAULT_CRS,
+    }
+    return result_cache_key("clip", params, source=source)
+
+
+def break_cache_key(geojson: dict, break_distance: float) -> str:
+    """
+    水系打断结果的缓存键：输入 GeoJSON + 打点间距 + 节点合并距离
+
+    打断只依赖请求中的 GeoJSON，不读取水系图层，因此不含图层指纹
+    """
+    params = {
+        "geojson": geojson,
+        "break_distance": float(break_distance),
+        "merge_dist": RIVER_MERGE_DIST,
+    }
+    return result_cache_key("break", params)
+
+
+def background_job_result(job: RiverJobModel) -> Result:
+    return Result.success_result(
+        message=f"已转为后台任务，可通过 /river/jobs/{job.id} 查询处理状态和结果",
+        data=job.model_dump(mode="json", exclude={"result"}),
+    )
+
+
 @riverRouter.post(
     "/clip",
     summary="水系切割",
@@ -465,7 +730,7 @@ def clip_river_by_polygon(
     response_model=Result,
 )
 @with_exception_handler(default_message="水系切割失败，发生未知错误")
-async def clip_river(request: RiverClipRequest):
+async def clip_river(request: RiverClipRequest, http_request: Request):
     """
     水系切割 API
 
@@ -475,6 +740,9 @@ async def clip_river(request: RiverClipRequest):
       - 经度范围：-180 到 180
       - 纬度范围：-90 到 90
       - 坐标系：WGS84 (EPSG:4326)
+    - background: 为 true 时作为后台任务执行，立即返回任务信息（可选）
+
+    相同边界的请求在水系文件未变化时直接返回缓存结果
 
     **返回结果：**
     - geojson: 裁剪后的水系数据（GeoJSON 格式）
@@ -493,17 +761,29 @@ async def clip_river(request: RiverClipRequest):
     }
     ```
     """
-    # 执行水系裁剪
-    geojson_result = clip_river_by_polygon(
-        shapefile_path=RIVER_SHAPEFILE_PATH,
-        polygon_coords=request.polygon,
-        boundary_crs="EPSG:4326",
+    # 相同边界且水系文件未变化时直接返回缓存结果
+    source = layer_fingerprint(RIVER_SHAPEFILE_PATH)
+    await RiverResultCache.drop_stale("clip", source)
+    cache_key = clip_cache_key(request.polygon, source)
+    cached = await RiverResultCache.get(cache_key)
+    if cached is not None:
+        if request.background:
+            return background_job_result(RiverJobManager.completed("clip", cached))
+        return Result.success_result(data=cached, message="水系获取成功")
+
+    # 在进程池中执行水系裁剪，成功后写入缓存
+    job = RiverJobManager.submit(
+        "clip",
+        clip_river_job,
+        request.polygon,
+        on_success=partial(RiverResultCache.put, cache_key),
     )
+    if request.background:
+        return background_job_result(job)
 
-    # 构造响应
-    response_data = {"geojson": geojson_result}
-
-    return Result.success_result(data=response_data, message="水系获取成功")
+    job = await RiverJobManager.wait(job.id, disconnected=http_request.is_disconnected)
+    RiverJobManager.raise_for_status(job)
+    return Result.success_result(data=job.result, message="水系获取成功")
 
 
 @riverRouter.post(
@@ -513,13 +793,21 @@ async def clip_river(request: RiverClipRequest):
     response_model=Result,
 )
 @with_exception_handler(default_message="水系打断失败，发生未知错误")
-async def generate_river_network(request: RiverNetworkRequest):
+async def generate_river_network(
+    request: RiverNetworkRequest, http_request: Request
+):
     """
     水系打断生成网络 API
 
     **请求参数：**
     - geojson: 水系 GeoJSON 数据（必须包含 LineString 或 MultiLineString 几何）
     - spacing: 沿河打点的目标间距，单位米（默认 3000 米）
+    - background: 是否作为后台任务执行并立即返回任务信息（可选，
+      不传时顶点数超过 RIVER_BACKGROUND_VERTICES 自动转为后台任务）
+
+    处理在进程池中进行，超过 RIVER_JOB_TIMEOUT 秒未完成时返回 504，
+    后台任务通过 /river/jobs/{job_id} 查询状态和结果；
+    相同 GeoJSON 和间距的请求直接返回缓存结果（节点/渠道编号前缀每次重新生成）
 
     **返回结果：**
     - network: 包含节点和渠道的 GeoJSON 数据
@@ -540,85 +828,51 @@ async def generate_river_network(request: RiverNetworkRequest):
     }
     ```
     """
-    try:
-        # 将 GeoJSON 转换为 GeoDataFrame
-        # 使用临时文件方式处理 GeoJSON
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".geojson", delete=False, encoding="utf-8"
-        ) as tmp_file:
-            json.dump(request.geojson, tmp_file)
-            tmp_path = tmp_file.name
-
-        try:
-            gdf = gpd.read_file(tmp_path)
-        finally:
-            # 清理临时文件
-            Path(tmp_path).unlink(missing_ok=True)
-
-        if gdf.empty:
-            raise HTTPException(status_code=400, detail="输入的 GeoJSON 数据为空")
-
-        # 检查几何类型
-        valid_types = {"LineString", "MultiLineString"}
-        geom_types = set(gdf.geometry.geom_type.unique())
-        if not geom_types.intersection(valid_types):
-            raise HTTPException(
-                status_code=400,
-                detail=f"GeoJSON 必须包含 LineString 或 MultiLineString 几何类型，当前类型: {geom_types}",
-            )
-
-        # 确保输入数据使用 WGS84
-        if gdf.crs is None:
-            gdf = gdf.set_crs("EPSG:4326")
-        elif str(gdf.crs) != "EPSG:4326":
-            gdf = gdf.to_crs("EPSG:4326")
-
-        # 执行水系打断
-        network_gdf = build_river_network(
-            gdf=gdf,
-            spacing=request.break_distance,
-            merge_dist=800.0,
-            precision=0,
-        )
-
-        # 统计节点和渠道数量
-        node_count = len(network_gdf[network_gdf["type"] == "node"])
-        link_count = len(network_gdf[network_gdf["type"] == "link"])
-
-        # 转换为 GeoJSON（不包含 CRS 信息，因为 GeoJSON 默认就是 WGS84）
-        geojson_str = network_gdf.to_json(drop_id=True, show_bbox=False)
-        network_geojson = json.loads(geojson_str)
-
-        # 确保移除任何 CRS 相关字段（GeoJSON RFC 7946 规范不应包含 crs 字段）
-        if "crs" in network_geojson:
-            del network_geojson["crs"]
-
-        response_data = {
-            "geojson": network_geojson,
-            "node_count": node_count,
-            "link_count": link_count,
-            "spacing": request.break_distance,
-            "message": f"水系打断成功，生成 {node_count} 个节点和 {link_count} 条渠道",
-        }
-
-        return Result.success_result(
-            data=response_data, message=response_data["message"]
-        )
+    # 相同输入和间距时直接返回缓存结果（输入较大时计算摘要较慢，在线程中进行）
+    cache_key = await asyncio.to_thread(
+        break_cache_key, request.geojson, request.break_distance
+    )
+    cached = await RiverResultCache.get(cache_key)
+    if cached is not None:
+        # 编号前缀不随结果缓存，每次命中重新生成
+        cached = await asyncio.to_thread(with_id_prefix, cached, new_id_prefix())
+        if request.background:
+            return background_job_result(RiverJobManager.completed("break", cached))
+        return Result.success_result(data=cached, message=cached["message"])
+
+    background = request.background
+    if background is None:
+        vertices = count_geojson_vertices(request.geojson)
+        background = vertices > SwmmConfig.RIVER_BACKGROUND_VERTICES
+
+    job = RiverJobManager.submit(
+        "break",
+        break_river_job,
+        request.geojson,
+        request.break_distance,
+        on_success=partial(RiverResultCache.put, cache_key),
+    )
+    if background:
+        return background_job_result(job)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
+    job = await RiverJobManager.wait(job.id, disconnected=http_request.is_disconnected)
+    RiverJobManager.raise_for_status(job)
+    return Result.success_result(data=job.result, message=job.result["message"])
 
 
 @riverRouter.post(
     "/import",
     summary="根据 GeoJSON 创建节点与渠道",
-    description="提取 GeoJSON 中的节点/渠道特征,自动创建 Junction 与 Conduit",
+    description=(
+        "提取 GeoJSON 中的节点/渠道特征,自动创建 Junction 与 Conduit;"
+        "全部要素在同一次模型修改中写入,只保存一次 INP 文件"
+    ),
     response_model=Result,
 )
 @with_exception_handler(default_message="导入失败，发生未知错误")
-async def import_river_network(payload: RiverNetworkImportRequest):
+async def import_river_network(
+    payload: RiverNetworkImportRequest, if_match: IfMatchHeader = None
+):
     geojson = payload.geojson
     geojson_type = geojson.get("type")
 
@@ -650,6 +904,8 @@ async def import_river_network(payload: RiverNetworkImportRequest):
     created_junctions: List[str] = []
     junction_errors: List[dict] = []
 
+    # 1. 在内存中校验节点要素,得到待创建的节点
+    pending_junctions: List[JunctionModel] = []
     for feature in node_features:
         props = feature.get("properties") or {}
         raw_node_id = props.get("id")
@@ -681,82 +937,92 @@ async def import_river_network(payload: RiverNetworkImportRequest):
             continue
 
         lon, lat = coords
-        junction_payload = JunctionModel(name=node_name, lon=lon, lat=lat)
-
-        try:
-            await create_junction_api(junction_payload)
-            created_junctions.append(node_name)
-        except HTTPException as exc:
-            reason = getattr(exc, "detail", str(exc))
-            reason_text = (
-                json.dumps(reason, ensure_ascii=False)
-                if isinstance(reason, dict)
-                else str(reason)
-            )
-            junction_errors.append(
-                {
-                    "name": node_name,
-                    "reason": reason_text,
-                }
-            )
-            if "已存在" not in reason_text:
-                # 创建失败，移除可用节点
-                available_node_ids.discard(normalized_id)
+        pending_junctions.append(JunctionModel(name=node_name, lon=lon, lat=lat))
 
     conduit_names_in_use: Set[str] = set()
     created_conduits: List[str] = []
     conduit_errors: List[dict] = []
 
-    for idx, feature in enumerate(link_features, start=1):
-        props = feature.get("properties") or {}
-        raw_link_id = props.get("id")
-        normalized_link_id = normalize_identifier(raw_link_id)
-        base_name = normalized_link_id if normalized_link_id else f"AUTO_{idx}"
-        link_name = base_name
-        suffix = 1
-        while link_name in conduit_names_in_use:
-            suffix += 1
-            link_name = f"{base_name}_{suffix}"
-        conduit_names_in_use.add(link_name)
-
-        from_id = normalize_identifier(props.get("from_id"))
-        to_id = normalize_identifier(props.get("to_id"))
-
-        if not from_id or not to_id:
-            conduit_errors.append(
-                {
-                    "name": link_name,
-                    "reason": "渠道缺少 from_id 或 to_id",
-                }
-            )
-            continue
-
-        if from_id not in available_node_ids or to_id not in available_node_ids:
-            conduit_errors.append(
-                {
-                    "name": link_name,
-                    "reason": "渠道引用的节点不存在",
-                }
-            )
-            continue
+    # 2. 所有节点与渠道在同一次 mutate 中加入模型,退出时只写一次文件
+    async with ModelStore.mutate(if_match) as INP:
+        # 经纬度一次性批量转换为项目坐标
+        project_points = points_wgs84_to_project(
+            [(junction.lon, junction.lat) for junction in pending_junctions],
+            get_project_crs(INP),
+        ).tolist()
+
+        for junction_payload, xy in zip(pending_junctions, project_points):
+            node_name = junction_payload.name
+            try:
+                add_junction(INP, junction_payload, xy=tuple(xy))
+                created_junctions.append(node_name)
+            except HTTPException as exc:
+                reason = getattr(exc, "detail", str(exc))
+                reason_text = (
+                    json.dumps(reason, ensure_ascii=False)
+                    if isinstance(reason, dict)
+                    else str(reason)
+                )
+                junction_errors.append(
+                    {
+                        "name": node_name,
+                        "reason": reason_text,
+                    }
+                )
+                if "已存在" not in reason_text:
+                    # 创建失败，移除可用节点
+                    available_node_ids.discard(node_name)
+
+        for idx, feature in enumerate(link_features, start=1):
+            props = feature.get("properties") or {}
+            raw_link_id = props.get("id")
+            normalized_link_id = normalize_identifier(raw_link_id)
+            base_name = normalized_link_id if normalized_link_id else f"AUTO_{idx}"
+            link_name = base_name
+            suffix = 1
+            while link_name in conduit_names_in_use:
+                suffix += 1
+                link_name = f"{base_name}_{suffix}"
+            conduit_names_in_use.add(link_name)
+
+            from_id = normalize_identifier(props.get("from_id"))
+            to_id = normalize_identifier(props.get("to_id"))
+
+            if not from_id or not to_id:
+                conduit_errors.append(
+                    {
+                        "name": link_name,
+                        "reason": "渠道缺少 from_id 或 to_id",
+                    }
+                )
+                continue
 
-        conduit_payload = ConduitRequestModel(
-            name=link_name,
-            from_node=from_id,
-            to_node=to_id,
-        )
+            if from_id not in available_node_ids or to_id not in available_node_ids:
+                conduit_errors.append(
+                    {
+                        "name": link_name,
+                        "reason": "渠道引用的节点不存在",
+                    }
+                )
+                continue
 
-        try:
-            await create_conduit_api(conduit_payload)
-            created_conduits.append(link_name)
-        except HTTPException as exc:
-            conduit_errors.append(
-                {
-                    "name": link_name,
-                    "reason": getattr(exc, "detail", str(exc)),
-                }
+            conduit_payload = ConduitRequestModel(
+                name=link_name,
+                from_node=from_id,
+                to_node=to_id,
             )
 
+            try:
+                add_conduit(INP, conduit_payload)
+                created_conduits.append(link_name)
+            except HTTPException as exc:
+                conduit_errors.append(
+                    {
+                        "name": link_name,
+                        "reason": getattr(exc, "detail", str(exc)),
+                    }
+                )
+
     message = (
         f"导入完成: 创建节点 {len(created_junctions)} 个, "
         f"渠道 {len(created_conduits)} 条"
@@ -774,3 +1040,56 @@ async def import_river_network(payload: RiverNetworkImportRequest):
     }
 
     return Result.success_result(data=response_payload, message=message)
+
+
+@riverRouter.get(
+    "/jobs",
+    summary="获取水系任务列表",
+    description="按提交时间倒序获取水系裁剪/打断任务的状态（不含结果数据）",
+)
+@with_exception_handler(default_message="获取失败，发生未知错误")
+async def get_river_jobs():
+    jobs = [
+        job.model_dump(mode="json", exclude={"result"})
+        for job in RiverJobManager.list()
+    ]
+    return Result.success_result(message=f"成功获取水系任务，共({len(jobs)}个)", data=jobs)
+
+
+@riverRouter.get(
+    "/jobs/{job_id}",
+    summary="获取水系任务状态和结果",
+    description=(
+        "获取水系任务的状态(pending/running/success/failed/cancelled)，"
+        "成功时 result 为与同步接口相同的 data；"
+        "wait 为最多等待任务结束的秒数，可用于长轮询"
+    ),
+)
+@with_exception_handler(default_message="获取失败，发生未知错误")
+async def get_river_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="最多等待任务结束的秒数"),
+):
+    job = RiverJobManager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"水系任务 [ {job_id} ] 不存在或已被清理"
+        )
+    if wait > 0:
+        job = await RiverJobManager.wait(job_id, timeout=wait)
+    return Result.success_result(message="成功获取水系任务", data=job)
+
+
+@riverRouter.post(
+    "/jobs/{job_id}/cancel",
+    summary="取消水系任务",
+    description="取消排队中或处理中的水系任务，已结束的任务不受影响",
+)
+@with_exception_handler(default_message="取消失败，发生未知错误")
+async def cancel_river_job(job_id: str):
+    job = RiverJobManager.cancel(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"水系任务 [ {job_id} ] 不存在或已被清理"
+        )
+    return Result.success_result(message=f"水系任务状态: {job.status.value}", data=job)
@@ -1,56 +1,164 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from datetime import datetime
+from typing import Annotated, List, Literal, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from schemas.result import Result
-from utils.swmm_constant import SWMM_FILE_OUT_PATH, SWMM_FILE_INP_PATH, ENCODING
-from swmm_api import SwmmOutput, SwmmInput
 from swmm_api.input_file.sections import Junction
 from swmm_api.input_file.sections.link import Conduit
 from swmm_api.input_file.sections.node_component import Coordinate
 from swmm_api.input_file.sections import Outfall
-from utils.coordinate_converter import utm_to_wgs84
+from utils.decimation import (
+    EndQuery,
+    MaxPointsQuery,
+    MethodQuery,
+    StartQuery,
+    decimate,
+    window_slice,
+)
+from utils.coordinate_converter import coordinates_project_to_wgs84, get_project_crs
+from utils.model_store import ModelStore
+from utils.binary_payload import (
+    BINARY_MEDIA_TYPE,
+    pack_float32_payload,
+    wants_binary,
+)
+from utils.out_store import OutStore
 from utils.utils import with_exception_handler
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
 showRouter = APIRouter()
 
 
-@showRouter.get("/show", summary="计算结果滚动展示")
+@showRouter.get(
+    "/show",
+    summary="计算结果滚动展示",
+    description="""
+获取全部管道的拓扑信息及 flow / depth / velocity 计算结果,用于滚动展示。
+
+通过查询参数 `format=binary` 或请求头 `Accept: application/octet-stream` 获取紧凑二进制格式:
+`[4 字节小端 uint32 头长度 n][n 字节 UTF-8 JSON 头][float32 数据]`,
+JSON 头包含 `variables`、`links`(与 JSON 格式相同的拓扑信息)、`time`(`start`、`step_seconds`、`count`)、
+`variables_extremes` 和 `shape`(变量数, 管道数, 时间步数),
+数据区从第 4 + n 字节开始,管道 i 变量 v 的序列位于下标 `(v * 管道数 + i) * 时间步数` 起的连续 `时间步数` 个值。
+降采样后时间不再等间隔,`time.step_seconds` 为 null,各时间点在 `time.values` 中给出。
+
+可选参数:
+- `start` / `end`:只返回该时间范围内的结果
+- `max_points`:最多返回的时间点数,超过时按 `method` 降采样(lttb / minmax / mean,默认 lttb),
+  所有管道、所有变量共用降采样后的时间点
+""",
+)
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
-async def show_calculate_result():
-    OUT = SwmmOutput(SWMM_FILE_OUT_PATH, encoding=ENCODING)
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_junctions = INP.check_for_section(Junction)
-    inp_coordinates = INP.check_for_section(Coordinate)
-    inp_conduits = INP.check_for_section(Conduit)
-    inp_outfalls = INP.check_for_section(Outfall)
-    df = OUT.to_frame()
-    columns_for_node = df.columns[df.columns.get_level_values(0) == "link"]
-    conduit_names = columns_for_node.get_level_values(1).unique().tolist()
+async def show_calculate_result(
+    format: Annotated[
+        Optional[Literal["json", "binary"]],
+        Query(description="返回格式,不传时根据 Accept 请求头判断,默认 json"),
+    ] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    start: StartQuery = None,
+    end: EndQuery = None,
+    max_points: MaxPointsQuery = None,
+    method: MethodQuery = "lttb",
+):
+    entry = OutStore.get()
+    reader = entry.reader
+    async with ModelStore.read() as INP:
+        conduit_names = reader.labels["link"]
+        links = build_conduit_topology(INP, conduit_names)
+        version = ModelStore.version()
+
     variables = ["flow", "depth", "velocity"]
-    # 0.1 变量极值
-    variables_extremes = get_link_variable_extremes(df, variables=variables)
+    # 每个变量取时间范围内 (时间步, 链接) 的零拷贝视图,不再构造完整的 DataFrame
+    window = window_slice(reader.index, start, end)
+    time_index = reader.index[window]
+    link_values = {
+        variable: reader.kind_values("link", variable)[window]
+        for variable in variables
+    }
+    # 0.1 变量极值,查询全部时间范围时直接使用计算完成时统计好的结果
+    if start is None and end is None:
+        summary = await asyncio.to_thread(entry.summary)
+        variables_extremes = summary["link_extremes"]
+    else:
+        variables_extremes = get_link_variable_extremes(link_values)
+    # 降采样:三个变量拼接后一起选点,保证所有管道、变量共用同一组时间点
+    decimated = max_points is not None and len(time_index) > max_points
+    if decimated:
+        rows, values = decimate(
+            np.concatenate([link_values[variable] for variable in variables], axis=1),
+            max_points,
+            method,
+        )
+        time_index = time_index[rows]
+        link_values = dict(zip(variables, np.split(values, len(variables), axis=1)))
+
+    if wants_binary(format, accept):
+        header = {
+            "version": version,
+            "variables": variables,
+            "links": links,
+            "time": {
+                "start": time_index[0].strftime("%Y-%m-%d %H:%M")
+                if len(time_index)
+                else None,
+                "step_seconds": None
+                if decimated
+                else reader.report_interval.total_seconds(),
+                "count": len(time_index),
+            },
+            "variables_extremes": variables_extremes,
+        }
+        if decimated:
+            header["time"]["values"] = time_index.strftime("%Y-%m-%d %H:%M").tolist()
+        # (变量, 管道, 时间步),每个管道的序列连续存放
+        values = np.stack([link_values[variable].T for variable in variables])
+        return Response(
+            content=pack_float32_payload(header, values),
+            media_type=BINARY_MEDIA_TYPE,
+        )
+
     data = {}
     data["variables_extremes"] = variables_extremes
-    # 0.2 计算时间列表
-    # 获取时间索引
-    time_index = df.index.tolist()
-    # 转换为字符串格式
-    time_list = [time.strftime("%Y-%m-%d %H:%M") for time in time_index]
+    # 0.2 计算时间列表,转换为字符串格式
+    time_list = time_index.strftime("%Y-%m-%d %H:%M").tolist()
     data["time"] = time_list
     result_data = []
-    for name in conduit_names:
-        temp_data = {}
-        # 1.基础数据
-        temp_data["name"] = name
-        temp_data["type"] = "conduit"
-        # temp_data["time"] = df.index.tolist()
+    for i, link in enumerate(links):
+        # 1.基础数据 2.拓扑属性
+        temp_data = dict(link)
+        # 3.拼接计算数据 变量在variables中
+        for variable in variables:
+            temp_data[variable] = link_values[variable][:, i].tolist()
 
-        # 2.拓扑属性
+        result_data.append(temp_data)
+    data["calculate_result"] = result_data
+    return Result.success_result(
+        data=data,
+        message="计算结果列表",
+        version=version,
+    )
+
+
+def build_conduit_topology(INP, conduit_names) -> list:
+    """
+    构建管道的拓扑信息(名称、类型、起终点节点及其经纬度),JSON 与二进制格式共用
+    """
+    inp_junctions = INP.check_for_section(Junction)
+    inp_coordinates = INP.check_for_section(Coordinate)
+    inp_conduits = INP.check_for_section(Conduit)
+    inp_outfalls = INP.check_for_section(Outfall)
+    # 一次性批量转换所有节点坐标,避免逐个管道的起终点重复转换
+    node_lon_lats = coordinates_project_to_wgs84(inp_coordinates, get_project_crs(INP))
+    links = []
+    for name in conduit_names:
         from_node = get_from_node_info(
             name,
             "from_node",
             inp_conduits,
-            inp_coordinates,
+            node_lon_lats,
             inp_junctions,
             inp_outfalls,
         )
@@ -58,28 +166,103 @@ async def show_calculate_result():
             name,
             "to_node",
             inp_conduits,
-            inp_coordinates,
+            node_lon_lats,
             inp_junctions,
             inp_outfalls,
         )
-        temp_data["from_node"] = from_node
-        temp_data["to_node"] = to_node
+        links.append(
+            {
+                "name": name,
+                "type": "conduit",
+                "from_node": from_node,
+                "to_node": to_node,
+            }
+        )
+    return links
 
-        # 3.拼接计算数据 变量在variables中
-        columns = df.columns[
-            (df.columns.get_level_values(0) == "link")
-            & (df.columns.get_level_values(1) == name)
-            & (df.columns.get_level_values(2).isin(variables))
-        ]
-        for i, variable in enumerate(variables):
-            temp_data[variable] = df[columns[i]].tolist()
 
-        result_data.append(temp_data)
-    data["calculate_result"] = result_data
-    return Result.success_result(
-        data=data,
-        message="计算结果列表",
+# 单帧结果最多返回的时间步数
+FRAME_MAX_COUNT = 100
+
+
+@showRouter.get(
+    "/show/frame",
+    summary="获取单个时间步的结果",
+    description="""
+获取某个(或连续若干个)时间步全部链接或节点的计算结果,用于地图动画逐帧展示。
+每次只读取结果文件中对应时间步的记录,耗时只与对象数量有关,与模拟时长无关。
+
+参数说明:
+- `step`:时间步序号(从 0 开始);也可以传 `time`,取不晚于该时间的最后一个时间步,都不传时为 0
+- `count`:从该时间步开始返回的时间步数(默认 1,最多 100)
+- `kind`:`link`(链接,默认)或 `node`(节点)
+- `variables`:变量列表,链接默认 flow / depth / velocity,节点默认 depth / flooding
+- `include_names`:是否返回对象名称列表(顺序与 `/show` 中一致,前端已缓存时可传 false)
+
+JSON 格式中 `values[变量][i][j]` 为第 i 个时间步第 j 个对象的值;
+通过 `format=binary` 或请求头 `Accept: application/octet-stream` 获取二进制格式(格式同 `/show`),
+数据形状为 (时间步数, 变量数, 对象数)。
+""",
+)
+@with_exception_handler(default_message="获取失败,没有计算结果,请先计算")
+async def show_calculate_frame(
+    step: Annotated[Optional[int], Query(ge=0)] = None,
+    time: Optional[datetime] = None,
+    count: Annotated[int, Query(ge=1, le=FRAME_MAX_COUNT)] = 1,
+    kind: Literal["link", "node"] = "link",
+    variables: Annotated[Optional[List[str]], Query()] = None,
+    include_names: bool = True,
+    format: Annotated[
+        Optional[Literal["json", "binary"]],
+        Query(description="返回格式,不传时根据 Accept 请求头判断,默认 json"),
+    ] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+):
+    reader = OutStore.get().reader
+    if variables is None:
+        variables = (
+            ["flow", "depth", "velocity"] if kind == "link" else ["depth", "flooding"]
+        )
+    available = reader.variables[kind]
+    invalid = [variable for variable in variables if variable not in available]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"变量 [ {', '.join(invalid)} ] 不存在,可选值: {', '.join(available)}",
+        )
+    if step is None:
+        step = reader.step_at(time) if time is not None else 0
+    if step >= reader.n_periods:
+        raise HTTPException(
+            status_code=400,
+            detail=f"时间步 [ {step} ] 超出范围,共有 {reader.n_periods} 个时间步",
+        )
+    stop = min(step + count, reader.n_periods)
+
+    # (时间步数, 变量数, 对象数),只读取 [step, stop) 的记录
+    values = np.stack(
+        [reader.kind_values(kind, variable)[step:stop] for variable in variables],
+        axis=1,
     )
+    times = reader.index[step:stop].strftime("%Y-%m-%d %H:%M").tolist()
+    header = {
+        "kind": kind,
+        "variables": variables,
+        "steps": list(range(step, stop)),
+        "times": times,
+    }
+    if include_names:
+        header["names"] = reader.labels[kind]
+
+    if wants_binary(format, accept):
+        return Response(
+            content=pack_float32_payload(header, values),
+            media_type=BINARY_MEDIA_TYPE,
+        )
+    header["values"] = {
+        variable: values[:, i].tolist() for i, variable in enumerate(variables)
+    }
+    return Result.success_result(data=header, message="成功获取时间步结果")
 
 
 @showRouter.get("/show/powerstation/data", summary="获取电站水情信息")
@@ -134,7 +317,7 @@ async def get_powerstation_data():
 
 
 def get_from_node_info(
-    conduit_name, dict_name, inp_conduits, inp_coordinates, inp_junctions, inp_outfalls
+    conduit_name, dict_name, inp_conduits, node_lon_lats, inp_junctions, inp_outfalls
 ):
     """
     获取指定 conduit 的起点节点信息,包括类型、名称、经纬度坐标。
@@ -143,7 +326,7 @@ def get_from_node_info(
         conduit_name: 管道名称
         dict_name: "from_node" / "to_node"
         inp_conduits: 管道信息字典
-        inp_coordinates: 坐标信息字典
+        node_lon_lats: 节点名称 -> (lon, lat) 经纬度字典
         inp_junctions: 交叉口信息字典
 
     返回:
@@ -157,14 +340,10 @@ def get_from_node_info(
     if not from_node_name:
         return None
 
-    from_node_coords = inp_coordinates.get(from_node_name)
-    if not from_node_coords:
-        return None
-
-    try:
-        lon, lat = utm_to_wgs84(from_node_coords.x, from_node_coords.y)
-    except Exception:
+    lon_lat = node_lon_lats.get(from_node_name)
+    if not lon_lat:
         return None
+    lon, lat = lon_lat
 
     if inp_junctions.get(from_node_name):
         node_type = "junction"
@@ -176,9 +355,12 @@ def get_from_node_info(
     return {"type": node_type, "name": from_node_name, "lon": lon, "lat": lat}
 
 
-def get_link_variable_extremes(df, variables=["flow", "depth", "velocity"]):
+def get_link_variable_extremes(link_values):
     """
-    获取 df 中 link 类型的 flow / depth / velocity 三个变量的最大值和最小值
+    获取 link 类型的 flow / depth / velocity 等变量在所有链接、所有时间步上的最大值和最小值
+
+    参数:
+        link_values: 变量名 -> (时间步, 链接) 结果数组
 
     返回结构:
     {
@@ -189,18 +371,11 @@ def get_link_variable_extremes(df, variables=["flow", "depth", "velocity"]):
     """
     result = {}
 
-    for var in variables:
-        # 获取所有满足 (link, *, var) 的列
-        cols = df.columns[
-            (df.columns.get_level_values(0) == "link")
-            & (df.columns.get_level_values(2) == var)
-        ]
-
-        if not cols.empty:
-            data = df[cols]
+    for var, values in link_values.items():
+        if values.size:
             result[var] = {
-                "max": data.max().max(),  # 所有列的最大值,再取最大
-                "min": data.min().min(),  # 所有列的最小值,再取最小
+                "max": float(np.nanmax(values)),
+                "min": float(np.nanmin(values)),
             }
         else:
             result[var] = {"max": None, "min": None}
@@ -10,36 +10,72 @@ from swmm_api.input_file.sections import (
     OptionSection,
 )
 from swmm_api.input_file.sections import Junction, Outfall
-from utils.swmm_constant import (
-    SWMM_FILE_INP_PATH,
-    ENCODING,
-)
 from schemas.result import Result
-from utils.coordinate_converter import polygon_wgs84_to_utm, polygon_utm_to_wgs84
+from utils.coordinate_converter import (
+    get_project_crs,
+    polygon_project_to_wgs84,
+    polygon_wgs84_to_project,
+    polygons_project_to_wgs84,
+)
 from schemas.subcatchment import (
     SubCatchmentModel,
     SubAreaModel,
     InfiltrationModel,
     PolygonModel,
 )
-from utils.utils import with_exception_handler
+from utils.model_store import ModelStore
+from utils.utils import IfMatchHeader, with_exception_handler
 
 subcatchment = APIRouter()
 
 
 def check_infiltration_section_mode(INP: SwmmInput):
-    """确保下渗模型为 Horton 并返回最新 INP"""
+    """确保下渗模型为 Horton 并返回最新 INP,会修改模型,须在 ModelStore.mutate() 中调用"""
     try:
         INP.check_for_section(Infiltration)
     except Exception:
         # 没有 Infiltration 节,尝试获取 Horton 模型
         inp_options = INP.check_for_section(OptionSection)
         inp_options.set_infiltration("HORTON")  # 固定为Horton入渗模型
-        INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-        INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+        # 直接在内存中切换下渗模型,无需写盘后重新解析,修改随 mutate() 一起写入
+        INP.set_default_infiltration_from_options()
     return INP
 
 
+def infiltration_section_ready(INP: SwmmInput) -> bool:
+    """下渗节已存在且可以读取,即 check_infiltration_section_mode 无需修改模型"""
+    if Infiltration._section_label not in INP:
+        return False
+    try:
+        INP.check_for_section(Infiltration)
+    except Exception:
+        return False
+    return True
+
+
+async def ensure_infiltration_section() -> None:
+    """
+    接口使用模型前(读取接口进入 read()、修改接口进入 mutate() 之前)确保下渗模型为 Horton
+
+    需要切换时在 mutate() 中进行(持有写锁,版本号递增),
+    不在读锁中修改共享的模型;已满足时只做一次只读检查
+    """
+    async with ModelStore.read() as INP:
+        if infiltration_section_ready(INP):
+            return
+    async with ModelStore.mutate() as INP:
+        check_infiltration_section_mode(INP)
+
+
+def batch_polygons_to_wgs84(inp_polygons, names, crs: str) -> dict:
+    """批量将指定子汇水区的边界转换为经纬度,返回 名称 -> 边界顶点列表"""
+    names = [name for name in names if inp_polygons.get(name)]
+    polygons = polygons_project_to_wgs84(
+        [inp_polygons[name].polygon for name in names], crs
+    )
+    return dict(zip(names, polygons))
+
+
 # 获取子汇水区(产流)模型参数 和 子汇水区边界
 @subcatchment.get(
     "/subcatchments",
@@ -48,31 +84,33 @@ def check_infiltration_section_mode(INP: SwmmInput):
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_subcatchments():
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_subcatchments = INP.check_for_section(SubCatchment)
-    inp_polygons = INP.check_for_section(Polygon)
-    data = []
-    for subcatchment in inp_subcatchments.values():
-        temp_dict = {}
-        # 获取子汇水区边界
-        name = subcatchment.name
-        polygon = inp_polygons.get(name, [])
-        if polygon:
-            polygon = polygon_utm_to_wgs84(polygon.polygon)
-        temp_dict["name"] = name
-        temp_dict["rain_gage"] = subcatchment.rain_gage
-        temp_dict["outlet"] = subcatchment.outlet
-        temp_dict["area"] = subcatchment.area
-        temp_dict["imperviousness"] = subcatchment.imperviousness
-        temp_dict["width"] = subcatchment.width
-        temp_dict["slope"] = subcatchment.slope
-        temp_dict["polygon"] = polygon
-        data.append(temp_dict)
-    return Result.success_result(
-        message=f"成功获取子汇水区(产流)模型参数和边界数据,共({len(data)}个)",
-        data=data,
-    )
+    await ensure_infiltration_section()
+    async with ModelStore.read() as INP:
+        inp_subcatchments = INP.check_for_section(SubCatchment)
+        inp_polygons = INP.check_for_section(Polygon)
+        # 一次性批量转换所有子汇水区边界
+        polygons = batch_polygons_to_wgs84(
+            inp_polygons, inp_subcatchments.keys(), get_project_crs(INP)
+        )
+        data = []
+        for subcatchment in inp_subcatchments.values():
+            temp_dict = {}
+            # 获取子汇水区边界
+            name = subcatchment.name
+            polygon = polygons.get(name, [])
+            temp_dict["name"] = name
+            temp_dict["rain_gage"] = subcatchment.rain_gage
+            temp_dict["outlet"] = subcatchment.outlet
+            temp_dict["area"] = subcatchment.area
+            temp_dict["imperviousness"] = subcatchment.imperviousness
+            temp_dict["width"] = subcatchment.width
+            temp_dict["slope"] = subcatchment.slope
+            temp_dict["polygon"] = polygon
+            data.append(temp_dict)
+        return Result.success_result(
+            message=f"成功获取子汇水区(产流)模型参数和边界数据,共({len(data)}个)",
+            data=data,
+        )
 
 
 # 批量获取指定子汇水区的信息
@@ -84,34 +122,35 @@ async def get_subcatchments():
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def batch_get_subcatchments_by_names(names: list[str]):
     """通过子汇水区名称列表批量获取子汇水区信息"""
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_subcatchments = INP.check_for_section(SubCatchment)
-    inp_polygons = INP.check_for_section(Polygon)
+    await ensure_infiltration_section()
+    async with ModelStore.read() as INP:
+        inp_subcatchments = INP.check_for_section(SubCatchment)
+        inp_polygons = INP.check_for_section(Polygon)
 
-    data = []
-    found_names = []
-    for name in names:
-        subcatchment = inp_subcatchments.get(name)
-        if not subcatchment:
-            continue
-        temp_dict = {}
-        polygon = inp_polygons.get(name, [])
-        if polygon:
-            polygon = polygon_utm_to_wgs84(polygon.polygon)
-        temp_dict["name"] = name
-        temp_dict["rain_gage"] = subcatchment.rain_gage
-        temp_dict["outlet"] = subcatchment.outlet
-        temp_dict["area"] = subcatchment.area
-        temp_dict["imperviousness"] = subcatchment.imperviousness
-        temp_dict["width"] = subcatchment.width
-        temp_dict["slope"] = subcatchment.slope
-        temp_dict["polygon"] = polygon
-        data.append(temp_dict)
-        found_names.append(name)
-    return Result.success_result(
-        data=data, message=f"成功获取 {found_names} 子汇水区数据"
-    )
+        # 一次性批量转换所有请求子汇水区的边界
+        polygons = batch_polygons_to_wgs84(inp_polygons, names, get_project_crs(INP))
+
+        data = []
+        found_names = []
+        for name in names:
+            subcatchment = inp_subcatchments.get(name)
+            if not subcatchment:
+                continue
+            temp_dict = {}
+            polygon = polygons.get(name, [])
+            temp_dict["name"] = name
+            temp_dict["rain_gage"] = subcatchment.rain_gage
+            temp_dict["outlet"] = subcatchment.outlet
+            temp_dict["area"] = subcatchment.area
+            temp_dict["imperviousness"] = subcatchment.imperviousness
+            temp_dict["width"] = subcatchment.width
+            temp_dict["slope"] = subcatchment.slope
+            temp_dict["polygon"] = polygon
+            data.append(temp_dict)
+            found_names.append(name)
+        return Result.success_result(
+            data=data, message=f"成功获取 {found_names} 子汇水区数据"
+        )
 
 
 # 更新子汇水区(产流)模型参数
@@ -122,10 +161,28 @@ async def batch_get_subcatchments_by_names(names: list[str]):
 )
 @with_exception_handler(default_message="更新失败,文件有误,发生未知错误")
 async def update_subcatchment(
-    subcatchment_id: str, subcatchment_update: SubCatchmentModel
+    subcatchment_id: str,
+    subcatchment_update: SubCatchmentModel,
+    if_match: IfMatchHeader = None,
 ):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
+    await ensure_infiltration_section()
+    async with ModelStore.mutate(if_match) as INP:
+        edit_subcatchment(INP, subcatchment_id, subcatchment_update)
+
+    return Result.success_result(
+        message=f"成功更新子汇水区 [{subcatchment_update.name}] 的产流模型参数",
+        data={"id": subcatchment_update.name, "type": "subcatchment"},
+    )
+
+
+def edit_subcatchment(
+    INP: SwmmInput, subcatchment_id: str, subcatchment_update: SubCatchmentModel
+) -> None:
+    """
+    校验并修改子汇水区(产流)参数,须在 ModelStore.mutate() 中调用
+
+    子汇水区改名时同步修改汇流、下渗、多边形的名称
+    """
     inp_subcatchments = INP.check_for_section(SubCatchment)
     inp_junctions = INP.check_for_section(Junction)
     inp_outfalls = INP.check_for_section(Outfall)
@@ -167,7 +224,8 @@ async def update_subcatchment(
                 status_code=404,
                 detail=f"保存失败,雨量计名称 [ {subcatchment_update.rain_gage} ] 不存在,请检查雨量计名称是否正确",
             )
-    # 5.更新子汇水区参数
+    # 5.更新子汇水区参数(校验通过后再确保下渗模型为 Horton,校验失败时不修改模型)
+    INP = check_infiltration_section_mode(INP)
     del inp_subcatchments[subcatchment_id]
     inp_subcatchments[subcatchment_update.name] = SubCatchment(
         name=subcatchment_update.name,
@@ -197,14 +255,6 @@ async def update_subcatchment(
         temp_polygon.subcatchment = subcatchment_update.name
         inp_polygons[subcatchment_update.name] = temp_polygon
 
-    # 保存更新后的输入文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-
-    return Result.success_result(
-        message=f"成功更新子汇水区 [{subcatchment_update.name}] 的产流模型参数",
-        data={"id": subcatchment_update.name, "type": "subcatchment"},
-    )
-
 
 # 新建一个子汇水区,并设置默认的产流、汇流、下渗模型参数
 @subcatchment.post(
@@ -213,13 +263,27 @@ async def update_subcatchment(
     description="新建一个子汇水区,并设置默认的产流、汇流、下渗模型参数",
 )
 @with_exception_handler(default_message="新建失败,文件有误,发生未知错误")
-async def create_subcatchment(polygon_data: PolygonModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
+async def create_subcatchment(
+    polygon_data: PolygonModel,
+    if_match: IfMatchHeader = None,
+):
+    await ensure_infiltration_section()
+    async with ModelStore.mutate(if_match) as INP:
+        subcatchmentModel = add_subcatchment(INP, polygon_data)
+
+    return Result.success_result(
+        message=f"成功新建子汇水区 [{polygon_data.subcatchment}]",
+        data=subcatchmentModel,
+    )
+
+
+def add_subcatchment(INP: SwmmInput, polygon_data: PolygonModel) -> SubCatchmentModel:
+    """
+    新建子汇水区及默认的产流、汇流、下渗参数和边界,须在 ModelStore.mutate() 中调用
+
+    返回新建子汇水区的参数
+    """
     inp_subcatchments = INP.check_for_section(SubCatchment)
-    inp_subareas = INP.check_for_section(SubArea)
-    inp_infiltrations = INP.check_for_section(Infiltration)
-    inp_polygons = INP.check_for_section(Polygon)
 
     # 检查子汇水区名称是否已存在
     if polygon_data.subcatchment in inp_subcatchments:
@@ -228,6 +292,12 @@ async def create_subcatchment(polygon_data: PolygonModel):
             detail=f"新建失败,子汇水区名称 [ {polygon_data.subcatchment} ] 已存在,请使用其他名称",
         )
 
+    # 校验通过后再确保下渗模型为 Horton,校验失败时不修改模型
+    INP = check_infiltration_section_mode(INP)
+    inp_subareas = INP.check_for_section(SubArea)
+    inp_infiltrations = INP.check_for_section(Infiltration)
+    inp_polygons = INP.check_for_section(Polygon)
+
     # 1.创建新的子汇水区
     subcatchmentModel = SubCatchmentModel(name=polygon_data.subcatchment)
     inp_subcatchments[polygon_data.subcatchment] = SubCatchment(
@@ -245,18 +315,14 @@ async def create_subcatchment(polygon_data: PolygonModel):
     )
 
     # 4.创建默认的子汇水区边界
-    polygon_utm = polygon_wgs84_to_utm(polygon_data.polygon)
+    polygon_xy = polygon_wgs84_to_project(
+        polygon_data.polygon, get_project_crs(INP)
+    )
     inp_polygons[polygon_data.subcatchment] = Polygon(
-        subcatchment=polygon_data.subcatchment, polygon=polygon_utm
+        subcatchment=polygon_data.subcatchment, polygon=polygon_xy
     )
 
-    # 保存更新后的输入文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-
-    return Result.success_result(
-        message=f"成功新建子汇水区 [{polygon_data.subcatchment}]",
-        data=subcatchmentModel,
-    )
+    return subcatchmentModel
 
 
 # 删除子汇水区及其相关模型参数
@@ -266,13 +332,21 @@ async def create_subcatchment(polygon_data: PolygonModel):
     description="通过指定子汇水区ID,删除子汇水区及其相关模型参数",
 )
 @with_exception_handler(default_message="删除失败,文件有误,发生未知错误")
-async def delete_subcatchment(subcatchment_id: str):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
+async def delete_subcatchment(subcatchment_id: str, if_match: IfMatchHeader = None):
+    await ensure_infiltration_section()
+    async with ModelStore.mutate(if_match) as INP:
+        remove_subcatchment(INP, subcatchment_id)
+
+    return Result.success_result(
+        message=f"成功删除子汇水区 [{subcatchment_id}] 的相关模型参数"
+    )
+
+
+def remove_subcatchment(INP: SwmmInput, subcatchment_id: str) -> None:
+    """
+    删除子汇水区及其汇流、下渗、多边形,须在 ModelStore.mutate() 中调用
+    """
     inp_subcatchments = INP.check_for_section(SubCatchment)
-    inp_subareas = INP.check_for_section(SubArea)
-    inp_infiltrations = INP.check_for_section(Infiltration)
-    inp_polygons = INP.check_for_section(Polygon)
 
     # 检查子汇水区是否存在
     if subcatchment_id not in inp_subcatchments:
@@ -281,19 +355,18 @@ async def delete_subcatchment(subcatchment_id: str):
             detail=f"删除失败,子汇水区名称 [ {subcatchment_id} ] 不存在",
         )
 
+    # 校验通过后再确保下渗模型为 Horton,校验失败时不修改模型
+    INP = check_infiltration_section_mode(INP)
+    inp_subareas = INP.check_for_section(SubArea)
+    inp_infiltrations = INP.check_for_section(Infiltration)
+    inp_polygons = INP.check_for_section(Polygon)
+
     # 删除子汇水区及其相关模型参数
     del inp_subcatchments[subcatchment_id]
     del inp_subareas[subcatchment_id]
     del inp_infiltrations[subcatchment_id]
     del inp_polygons[subcatchment_id]
 
-    # 保存更新后的输入文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-
-    return Result.success_result(
-        message=f"成功删除子汇水区 [{subcatchment_id}] 的相关模型参数"
-    )
-
 
 # 通过子汇水区名称获取边界信息
 @subcatchment.get(
@@ -303,22 +376,22 @@ async def delete_subcatchment(subcatchment_id: str):
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_polygon(name: str = Query(..., description="子汇水区名称")):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_polygons = INP.check_for_section(Polygon)
+    await ensure_infiltration_section()
+    async with ModelStore.read() as INP:
+        inp_polygons = INP.check_for_section(Polygon)
 
-    if name not in inp_polygons:
-        raise HTTPException(
-            status_code=404,
-            detail=f"子汇水区 {name} 的边界数据未找到",
-        )
+        if name not in inp_polygons:
+            raise HTTPException(
+                status_code=404,
+                detail=f"子汇水区 {name} 的边界数据未找到",
+            )
 
-    polygon = inp_polygons[name].polygon
-    polygon = polygon_utm_to_wgs84(polygon)
-    return Result.success_result(
-        message=f"成功获取子汇水区 {name} 的边界数据",
-        data=polygon,
-    )
+        polygon = inp_polygons[name].polygon
+        polygon = polygon_project_to_wgs84(polygon, get_project_crs(INP))
+        return Result.success_result(
+            message=f"成功获取子汇水区 {name} 的边界数据",
+            data=polygon,
+        )
 
 
 @subcatchment.post(
@@ -327,25 +400,22 @@ async def get_polygon(name: str = Query(..., description="子汇水区名称")):
     description="保存子汇水区的边界数据",
 )
 @with_exception_handler(default_message="保存失败,文件有误,发生未知错误")
-async def save_polygon(data: PolygonModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_polygons = INP.check_for_section(Polygon)
-
-    if data.subcatchment not in inp_polygons:
-        raise HTTPException(
-            status_code=404,
-            detail=f"子汇水区 {data.subcatchment} 不存在,无法保存边界",
-        )
+async def save_polygon(data: PolygonModel, if_match: IfMatchHeader = None):
+    await ensure_infiltration_section()
+    async with ModelStore.mutate(if_match) as INP:
+        inp_polygons = INP.check_for_section(Polygon)
 
-    # WGS84转UTM投影
-    polygon_utm = polygon_wgs84_to_utm(data.polygon)
+        if data.subcatchment not in inp_polygons:
+            raise HTTPException(
+                status_code=404,
+                detail=f"子汇水区 {data.subcatchment} 不存在,无法保存边界",
+            )
 
-    # 更新内存中的边界数据
-    inp_polygons[data.subcatchment].polygon = polygon_utm
+        # WGS84转项目坐标系
+        polygon_xy = polygon_wgs84_to_project(data.polygon, get_project_crs(INP))
 
-    # 保存回文件(假设SwmmInput支持写文件)
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+        # 更新内存中的边界数据
+        inp_polygons[data.subcatchment].polygon = polygon_xy
 
     return Result.success_result(
         message=f"成功编辑并且保存子汇水区 [{data.subcatchment}] 的边界数据",
@@ -359,30 +429,30 @@ async def save_polygon(data: PolygonModel):
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_infiltration(subcatchment_name=Query(..., description="子汇水区名称")):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_infiltration = INP.check_for_section(Infiltration)
+    await ensure_infiltration_section()
+    async with ModelStore.read() as INP:
+        inp_infiltration = INP.check_for_section(Infiltration)
 
-    # 查找对应子汇水区名称的参数
-    infiltration = inp_infiltration.get(subcatchment_name)
-    if infiltration is None:
-        raise HTTPException(
-            status_code=404, detail=f"未找到子汇水区'{subcatchment_name}'的下渗参数"
-        )
+        # 查找对应子汇水区名称的参数
+        infiltration = inp_infiltration.get(subcatchment_name)
+        if infiltration is None:
+            raise HTTPException(
+                status_code=404, detail=f"未找到子汇水区'{subcatchment_name}'的下渗参数"
+            )
 
-    # 假设返回值结构和 InfiltrationModel 字段对应
-    data = InfiltrationModel(
-        subcatchment=subcatchment_name,
-        rate_max=infiltration.rate_max,
-        rate_min=infiltration.rate_min,
-        decay=infiltration.decay,
-        time_dry=infiltration.time_dry,
-        volume_max=infiltration.volume_max,
-    )
-    return Result.success_result(
-        message=f"成功获取子汇水区 [{subcatchment_name}] 的下渗模型参数",
-        data=data,
-    )
+        # 假设返回值结构和 InfiltrationModel 字段对应
+        data = InfiltrationModel(
+            subcatchment=subcatchment_name,
+            rate_max=infiltration.rate_max,
+            rate_min=infiltration.rate_min,
+            decay=infiltration.decay,
+            time_dry=infiltration.time_dry,
+            volume_max=infiltration.volume_max,
+        )
+        return Result.success_result(
+            message=f"成功获取子汇水区 [{subcatchment_name}] 的下渗模型参数",
+            data=data,
+        )
 
 
 @subcatchment.put(
@@ -393,29 +463,27 @@ async def get_infiltration(subcatchment_name=Query(..., description="子汇水
 @with_exception_handler(default_message="更新失败,文件有误,发生未知错误")
 async def update_infiltration(
     infiltration_update: InfiltrationModel,
+    if_match: IfMatchHeader = None,
 ):
     # 读取已有配置
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_infiltration = INP.check_for_section(Infiltration)
+    await ensure_infiltration_section()
+    async with ModelStore.mutate(if_match) as INP:
+        inp_infiltration = INP.check_for_section(Infiltration)
 
-    # 查找是否存在此子汇水区
-    if infiltration_update.subcatchment not in inp_infiltration:
-        raise HTTPException(
-            status_code=404,
-            detail=f"更新失败,未能找到子汇水区'{infiltration_update.subcatchment}'的下渗参数",
-        )
-
-    # 修改参数
-    infiltration = inp_infiltration[infiltration_update.subcatchment]
-    infiltration.rate_max = infiltration_update.rate_max
-    infiltration.rate_min = infiltration_update.rate_min
-    infiltration.decay = infiltration_update.decay
-    infiltration.time_dry = infiltration_update.time_dry
-    infiltration.volume_max = infiltration_update.volume_max
+        # 查找是否存在此子汇水区
+        if infiltration_update.subcatchment not in inp_infiltration:
+            raise HTTPException(
+                status_code=404,
+                detail=f"更新失败,未能找到子汇水区'{infiltration_update.subcatchment}'的下渗参数",
+            )
 
-    # 保存回文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+        # 修改参数
+        infiltration = inp_infiltration[infiltration_update.subcatchment]
+        infiltration.rate_max = infiltration_update.rate_max
+        infiltration.rate_min = infiltration_update.rate_min
+        infiltration.decay = infiltration_update.decay
+        infiltration.time_dry = infiltration_update.time_dry
+        infiltration.volume_max = infiltration_update.volume_max
 
     return Result.success_result(
         message=f"成功修改子汇水区 [{infiltration_update.subcatchment}] 的下渗模型参数"
@@ -429,33 +497,33 @@ async def update_infiltration(
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_subarea(subcatchment_name=Query(..., description="子汇水区名称")):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_subareas = INP.check_for_section(SubArea)
+    await ensure_infiltration_section()
+    async with ModelStore.read() as INP:
+        inp_subareas = INP.check_for_section(SubArea)
 
-    # 查找对应子汇水区名称的参数
-    subarea = inp_subareas.get(subcatchment_name)
-    if subarea is None:
-        raise HTTPException(
-            status_code=404, detail=f"未找到子汇水区'{subcatchment_name}'的汇流参数"
-        )
+        # 查找对应子汇水区名称的参数
+        subarea = inp_subareas.get(subcatchment_name)
+        if subarea is None:
+            raise HTTPException(
+                status_code=404, detail=f"未找到子汇水区'{subcatchment_name}'的汇流参数"
+            )
 
-    # 转换为 Pydantic 模型
-    data = SubAreaModel(
-        subcatchment=subcatchment_name,
-        n_imperv=subarea.n_imperv,
-        n_perv=subarea.n_perv,
-        storage_imperv=subarea.storage_imperv,
-        storage_perv=subarea.storage_perv,
-        pct_zero=subarea.pct_zero,
-        route_to=subarea.route_to,
-        pct_routed=subarea.pct_routed,
-    )
+        # 转换为 Pydantic 模型
+        data = SubAreaModel(
+            subcatchment=subcatchment_name,
+            n_imperv=subarea.n_imperv,
+            n_perv=subarea.n_perv,
+            storage_imperv=subarea.storage_imperv,
+            storage_perv=subarea.storage_perv,
+            pct_zero=subarea.pct_zero,
+            route_to=subarea.route_to,
+            pct_routed=subarea.pct_routed,
+        )
 
-    return Result.success_result(
-        message=f"成功获取子汇水区 [{subcatchment_name}] 的汇流模型参数",
-        data=data,
-    )
+        return Result.success_result(
+            message=f"成功获取子汇水区 [{subcatchment_name}] 的汇流模型参数",
+            data=data,
+        )
 
 
 @subcatchment.put(
@@ -466,31 +534,29 @@ async def get_subarea(subcatchment_name=Query(..., description="子汇水区名
 @with_exception_handler(default_message="更新失败,文件有误,发生未知错误")
 async def update_subarea(
     subarea_update: SubAreaModel,
+    if_match: IfMatchHeader = None,
 ):
     # 读取已有配置
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    INP = check_infiltration_section_mode(INP)
-    inp_subareas = INP.check_for_section(SubArea)
+    await ensure_infiltration_section()
+    async with ModelStore.mutate(if_match) as INP:
+        inp_subareas = INP.check_for_section(SubArea)
 
-    # 检查子汇水区是否存在
-    if subarea_update.subcatchment not in inp_subareas:
-        raise HTTPException(
-            status_code=404,
-            detail=f"更新失败,未能找到子汇水区'{subarea_update.subcatchment}'的汇流参数",
-        )
+        # 检查子汇水区是否存在
+        if subarea_update.subcatchment not in inp_subareas:
+            raise HTTPException(
+                status_code=404,
+                detail=f"更新失败,未能找到子汇水区'{subarea_update.subcatchment}'的汇流参数",
+            )
 
-    # 修改参数
-    subarea = inp_subareas[subarea_update.subcatchment]
-    subarea.n_imperv = subarea_update.n_imperv
-    subarea.n_perv = subarea_update.n_perv
-    subarea.storage_imperv = subarea_update.storage_imperv
-    subarea.storage_perv = subarea_update.storage_perv
-    subarea.pct_zero = subarea_update.pct_zero
-    subarea.route_to = subarea_update.route_to
-    subarea.pct_routed = subarea_update.pct_routed
-
-    # 保存回文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+        # 修改参数
+        subarea = inp_subareas[subarea_update.subcatchment]
+        subarea.n_imperv = subarea_update.n_imperv
+        subarea.n_perv = subarea_update.n_perv
+        subarea.storage_imperv = subarea_update.storage_imperv
+        subarea.storage_perv = subarea_update.storage_perv
+        subarea.pct_zero = subarea_update.pct_zero
+        subarea.route_to = subarea_update.route_to
+        subarea.pct_routed = subarea_update.pct_routed
 
     return Result.success_result(
         message=f"成功修改子汇水区 [{subarea_update.subcatchment}] 的汇流模型参数"
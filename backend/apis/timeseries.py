@@ -1,5 +1,4 @@
 from fastapi import APIRouter, HTTPException, Query
-from swmm_api import SwmmInput
 from swmm_api.input_file.sections.others import TimeseriesData
 from swmm_api.input_file.sections.node_component import Inflow
 from schemas.timeseries import (
@@ -9,9 +8,9 @@ from schemas.timeseries import (
 )
 from schemas.result import Result
 from datetime import datetime
-from utils.swmm_constant import SWMM_FILE_INP_PATH, ENCODING
-from utils.utils import with_exception_handler, remove_timeseries_prefix
-from typing import Annotated
+from utils.model_store import ModelStore
+from utils.utils import IfMatchHeader, with_exception_handler, remove_timeseries_prefix
+from typing import Annotated, List
 from apis.raingage import create_raingage, delete_raingage, update_raingage
 from utils.logger import get_logger
 
@@ -34,20 +33,20 @@ async def get_timeseries_names(
         Query(description="时间序列类型,必须是 INFLOW 或 RAINGAGE"),
     ] = TimeSeriesTypeModel.INFLOW,
 ):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_timeseries = INP.check_for_section(TimeseriesData)
-    timeseries_names = list(inp_timeseries.keys())
-    # 筛选出符合前缀的,并移除前缀
-    filtered_names = [
-        remove_timeseries_prefix(name, custom_prefix=TIMESERIES_PREFIXES_MAP[type])
-        for name in timeseries_names
-        if name.startswith(TIMESERIES_PREFIXES_MAP[type])
-    ]
-
-    return Result.success_result(
-        message=f"成功获取所有时间序列名称,共({len(filtered_names)}个)",
-        data=filtered_names,
-    )
+    async with ModelStore.read() as INP:
+        inp_timeseries = INP.check_for_section(TimeseriesData)
+        timeseries_names = list(inp_timeseries.keys())
+        # 筛选出符合前缀的,并移除前缀
+        filtered_names = [
+            remove_timeseries_prefix(name, custom_prefix=TIMESERIES_PREFIXES_MAP[type])
+            for name in timeseries_names
+            if name.startswith(TIMESERIES_PREFIXES_MAP[type])
+        ]
+
+        return Result.success_result(
+            message=f"成功获取所有时间序列名称,共({len(filtered_names)}个)",
+            data=filtered_names,
+        )
 
 
 def parse_datetime_safe(t):
@@ -86,29 +85,29 @@ async def get_timeseries_by_id(
     # 加上时间序列类型前缀
     timeseries_id = TIMESERIES_PREFIXES_MAP[type] + timeseries_id
 
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_timeseries = INP.check_for_section(TimeseriesData)
-    timeseries = inp_timeseries.get(timeseries_id)
-    if not timeseries:
-        raise HTTPException(
-            status_code=404, detail=f"时间序列 [ {timeseries_id} ] 不存在"
+    async with ModelStore.read() as INP:
+        inp_timeseries = INP.check_for_section(TimeseriesData)
+        timeseries = inp_timeseries.get(timeseries_id)
+        if not timeseries:
+            raise HTTPException(
+                status_code=404, detail=f"时间序列 [ {timeseries_id} ] 不存在"
+            )
+        # 解析时间字符串为 datetime 对象,处理不同操作系统的时间格式
+        data = []
+        for t, v in timeseries.data:
+            t = parse_datetime_safe(t)
+            data.append((t, v))
+
+        # 移除时间序列类型前缀
+        name = remove_timeseries_prefix(
+            timeseries.name, custom_prefix=TIMESERIES_PREFIXES_MAP[type]
         )
-    # 解析时间字符串为 datetime 对象,处理不同操作系统的时间格式
-    data = []
-    for t, v in timeseries.data:
-        t = parse_datetime_safe(t)
-        data.append((t, v))
-
-    # 移除时间序列类型前缀
-    name = remove_timeseries_prefix(
-        timeseries.name, custom_prefix=TIMESERIES_PREFIXES_MAP[type]
-    )
 
-    time_series_model = TimeSeriesModel(
-        name=name,
-        data=data,
-    )
-    return Result.success_result(message="成功获取时间序列信息", data=time_series_model)
+        time_series_model = TimeSeriesModel(
+            name=name,
+            data=data,
+        )
+        return Result.success_result(message="成功获取时间序列信息", data=time_series_model)
 
 
 # 通过时间序列id更新时间序列信息
@@ -125,8 +124,37 @@ async def update_timeseries_by_id(
         TimeSeriesTypeModel,
         Query(description="时间序列类型,必须是 INFLOW 或 RAINGAGE"),
     ] = TimeSeriesTypeModel.INFLOW,
+    if_match: IfMatchHeader = None,
 ):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+    async with ModelStore.mutate(if_match) as INP:
+        related_entity_ids = edit_timeseries(INP, timeseries_id, timeseries, type)
+
+    # 3.message的构建
+    if type == TimeSeriesTypeModel.INFLOW:
+        message = f"流量序列更新成功"
+    elif type == TimeSeriesTypeModel.RAINGAGE:
+        message = f"雨量序列更新成功"
+    else:
+        message = f"时间序列更新成功"
+    # 构建响应信息
+    if len(related_entity_ids) > 0:
+        message += f",同时更新了 {len(related_entity_ids)} 条引用"
+
+    return Result.success_result(
+        message=message,
+        data={"id": timeseries.name, "related_entity_ids": related_entity_ids},
+    )
+
+
+def edit_timeseries(
+    INP, timeseries_id: str, timeseries: TimeSeriesModel, type: TimeSeriesTypeModel
+) -> List[str]:
+    """
+    校验并修改时间序列(可改名),须在 ModelStore.mutate() 中调用
+
+    timeseries_id 与 timeseries.name 为不带类型前缀的名称,改名时同步修改引用它的
+    入流或雨量计,返回这些节点/雨量计的名称
+    """
     inp_timeseries = INP.check_for_section(TimeseriesData)
     inp_inflows = INP.check_for_section(Inflow)
 
@@ -152,7 +180,8 @@ async def update_timeseries_by_id(
         name=timeseries.name,
         data=timeseries.data,
     )
-    inp_timeseries[timeseries_id] = new_timeseries
+    # 以新名称为键保存,改名后按新名称才能查到(键与 name 须保持一致)
+    inp_timeseries[new_timeseries.name] = new_timeseries
     # 2.更新时间序列相关的数据
     related_entity_ids = []
     # 2.1 如果是 INFLOW 类型,则更新对应的 Inflow
@@ -172,22 +201,7 @@ async def update_timeseries_by_id(
             interval=timeseries.get_interval(),
         )
 
-    # 3.message的构建
-    if type == TimeSeriesTypeModel.INFLOW:
-        message = f"流量序列更新成功"
-    elif type == TimeSeriesTypeModel.RAINGAGE:
-        message = f"雨量序列更新成功"
-    else:
-        message = f"时间序列更新成功"
-    # 构建响应信息
-    if len(related_entity_ids) > 0:
-        message += f",同时更新了 {len(related_entity_ids)} 条引用"
-
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(
-        message=message,
-        data={"id": timeseries.name, "related_entity_ids": related_entity_ids},
-    )
+    return related_entity_ids
 
 
 # 新建时间序列
@@ -203,11 +217,31 @@ async def create_timeseries(
         TimeSeriesTypeModel,
         Query(description="时间序列类型,必须是 INFLOW 或 RAINGAGE"),
     ] = TimeSeriesTypeModel.INFLOW,
+    if_match: IfMatchHeader = None,
 ):
     """
     创建时间序列信息
     """
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+    async with ModelStore.mutate(if_match) as INP:
+        add_timeseries(INP, timeseries_data, type)
+
+    # 3.message的构建
+    if type == TimeSeriesTypeModel.INFLOW:
+        message = f"流量序列创建成功"
+    elif type == TimeSeriesTypeModel.RAINGAGE:
+        message = f"雨量序列创建成功"
+    else:
+        message = f"时间序列创建成功"
+
+    return Result.success_result(message=message, data={"name": timeseries_data.name})
+
+
+def add_timeseries(
+    INP, timeseries_data: TimeSeriesModel, type: TimeSeriesTypeModel
+) -> None:
+    """
+    校验并向模型中添加时间序列,雨量序列同时创建对应的雨量计,须在 ModelStore.mutate() 中调用
+    """
     inp_timeseries = INP.check_for_section(TimeseriesData)
 
     # 补充时间序列名称前缀
@@ -230,17 +264,6 @@ async def create_timeseries(
     if type == TimeSeriesTypeModel.RAINGAGE:
         create_raingage(INP, timeseries_name=name)
 
-    # 3.message的构建
-    if type == TimeSeriesTypeModel.INFLOW:
-        message = f"流量序列创建成功"
-    elif type == TimeSeriesTypeModel.RAINGAGE:
-        message = f"雨量序列创建成功"
-    else:
-        message = f"时间序列创建成功"
-
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(message=message, data={"name": timeseries_data.name})
-
 
 # 通过 timeseries_id 删除时间序列
 @timeseriesRouter.delete(
@@ -254,8 +277,26 @@ async def delete_timeseries(
         TimeSeriesTypeModel,
         Query(description="时间序列类型,必须是 INFLOW 或 RAINGAGE"),
     ] = TimeSeriesTypeModel.INFLOW,
+    if_match: IfMatchHeader = None,
 ):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+    async with ModelStore.mutate(if_match) as INP:
+        remove_timeseries(INP, timeseries_id, type)
+
+    # 4.message的构建
+    if type == TimeSeriesTypeModel.INFLOW:
+        message = f"流量序列删除成功"
+    elif type == TimeSeriesTypeModel.RAINGAGE:
+        message = f"雨量序列删除成功"
+    else:
+        message = f"时间序列删除成功"
+
+    return Result.success_result(message=message, data={"id": timeseries_id})
+
+
+def remove_timeseries(INP, timeseries_id: str, type: TimeSeriesTypeModel) -> None:
+    """
+    删除时间序列,被节点入流引用时抛出 HTTPException,须在 ModelStore.mutate() 中调用
+    """
     inp_timeseries = INP.check_for_section(TimeseriesData)
     inp_inflows = INP.check_for_section(Inflow)
 
@@ -284,14 +325,3 @@ async def delete_timeseries(
     # 3.如果是 RAINGAGE 类型,则删除对应的 RainGage
     if type == TimeSeriesTypeModel.RAINGAGE:
         delete_raingage(INP, timeseries_name=remove_timeseries_prefix(id))
-
-    # 4.message的构建
-    if type == TimeSeriesTypeModel.INFLOW:
-        message = f"流量序列删除成功"
-    elif type == TimeSeriesTypeModel.RAINGAGE:
-        message = f"雨量序列删除成功"
-    else:
-        message = f"时间序列删除成功"
-    # 保存修改
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(message=message, data={"id": timeseries_id})
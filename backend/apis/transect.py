@@ -1,14 +1,11 @@
 from fastapi import APIRouter, HTTPException
-from swmm_api import SwmmInput
 from swmm_api.input_file.sections.others import Transect
 from swmm_api.input_file.sections.link_component import CrossSection
+from typing import List
 from schemas.transect import TransectModel
 from schemas.result import Result
-from utils.swmm_constant import (
-    SWMM_FILE_INP_PATH,
-    ENCODING,
-)
-from utils.utils import with_exception_handler
+from utils.model_store import ModelStore
+from utils.utils import IfMatchHeader, with_exception_handler
 
 
 transectsRouter = APIRouter()
@@ -22,13 +19,13 @@ transectsRouter = APIRouter()
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_transect_names():
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_transects = INP.check_for_section(Transect)
-    transect_names = list(inp_transects.keys())
-    return Result.success_result(
-        message=f"成功获取所有断面名称,共({len(transect_names)}个)",
-        data=transect_names,
-    )
+    async with ModelStore.read() as INP:
+        inp_transects = INP.check_for_section(Transect)
+        transect_names = list(inp_transects.keys())
+        return Result.success_result(
+            message=f"成功获取所有断面名称,共({len(transect_names)}个)",
+            data=transect_names,
+        )
 
 
 # 通过断面名称获取不规则断面信息
@@ -53,21 +50,21 @@ async def get_transect_names():
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_transect(transect_id: str):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_transects = INP.check_for_section(Transect)
-    transect = inp_transects.get(transect_id)
-    if not transect:
-        raise HTTPException(status_code=404, detail=f"断面 [ {transect_id} ] 不存在")
-    transect_model = TransectModel(
-        name=transect.name,
-        roughness_left=transect.roughness_left,
-        roughness_right=transect.roughness_right,
-        roughness_channel=transect.roughness_channel,
-        bank_station_left=transect.bank_station_left,
-        bank_station_right=transect.bank_station_right,
-        station_elevations=transect.station_elevations,
-    )
-    return Result.success_result(message="成功获取断面信息", data=transect_model)
+    async with ModelStore.read() as INP:
+        inp_transects = INP.check_for_section(Transect)
+        transect = inp_transects.get(transect_id)
+        if not transect:
+            raise HTTPException(status_code=404, detail=f"断面 [ {transect_id} ] 不存在")
+        transect_model = TransectModel(
+            name=transect.name,
+            roughness_left=transect.roughness_left,
+            roughness_right=transect.roughness_right,
+            roughness_channel=transect.roughness_channel,
+            bank_station_left=transect.bank_station_left,
+            bank_station_right=transect.bank_station_right,
+            station_elevations=transect.station_elevations,
+        )
+        return Result.success_result(message="成功获取断面信息", data=transect_model)
 
 
 @transectsRouter.get(
@@ -78,21 +75,21 @@ async def get_transect(transect_id: str):
 )
 @with_exception_handler(default_message="获取失败,文件有误,发生未知错误")
 async def get_transects():
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    inp_transects = INP.check_for_section(Transect)
-    transects = {}
-    for transect in inp_transects.values():
-        transect_model = TransectModel(
-            name=transect.name,
-            roughness_left=transect.roughness_left,
-            roughness_right=transect.roughness_right,
-            roughness_channel=transect.roughness_channel,
-            bank_station_left=transect.bank_station_left,
-            bank_station_right=transect.bank_station_right,
-            station_elevations=transect.station_elevations,
-        )
-        transects[transect.name] = transect_model
-    return transects
+    async with ModelStore.read() as INP:
+        inp_transects = INP.check_for_section(Transect)
+        transects = {}
+        for transect in inp_transects.values():
+            transect_model = TransectModel(
+                name=transect.name,
+                roughness_left=transect.roughness_left,
+                roughness_right=transect.roughness_right,
+                roughness_channel=transect.roughness_channel,
+                bank_station_left=transect.bank_station_left,
+                bank_station_right=transect.bank_station_right,
+                station_elevations=transect.station_elevations,
+            )
+            transects[transect.name] = transect_model
+        return transects
 
 
 @transectsRouter.put(
@@ -101,8 +98,31 @@ async def get_transects():
     description="通过指定断面ID,更新断面的相关信息",
 )
 @with_exception_handler(default_message="更新失败,文件有误,发生未知错误")
-async def update_transect(transect_id: str, transect: TransectModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def update_transect(
+    transect_id: str,
+    transect: TransectModel,
+    if_match: IfMatchHeader = None,
+):
+    async with ModelStore.mutate(if_match) as INP:
+        related_xsections = edit_transect(INP, transect_id, transect)
+
+    # 构建响应信息
+    message = f"断面更新成功"
+    if len(related_xsections) > 0:
+        message += f",同时更新了 {len(related_xsections)} 条引用"
+
+    return Result.success_result(
+        message=message,
+        data={"id": transect.name, "related_xsections": related_xsections},
+    )
+
+
+def edit_transect(INP, transect_id: str, transect: TransectModel) -> List[str]:
+    """
+    校验并修改不规则断面(可改名),须在 ModelStore.mutate() 中调用
+
+    断面改名时同步修改引用该断面的渠道断面,返回这些渠道的名称
+    """
     inp_transects = INP.check_for_section(Transect)
     inp_xsections = INP.check_for_section(CrossSection)
     if transect_id not in inp_transects:
@@ -131,17 +151,8 @@ async def update_transect(transect_id: str, transect: TransectModel):
             if xsection.transect == transect_id:
                 xsection.transect = transect.name
                 related_xsections.append(xsection.link)
-    # 构建响应信息
-    message = f"断面更新成功"
-    if len(related_xsections) > 0:
-        message += f",同时更新了 {len(related_xsections)} 条引用"
 
-    # 保存更新后的文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(
-        message=message,
-        data={"id": transect.name, "related_xsections": related_xsections},
-    )
+    return related_xsections
 
 
 @transectsRouter.post(
@@ -150,8 +161,17 @@ async def update_transect(transect_id: str, transect: TransectModel):
     description="创建新的不规则断面",
 )
 @with_exception_handler(default_message="创建失败,文件有误,发生未知错误")
-async def create_transect(transect: TransectModel):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def create_transect(transect: TransectModel, if_match: IfMatchHeader = None):
+    async with ModelStore.mutate(if_match) as INP:
+        add_transect(INP, transect)
+
+    return Result.success_result(message="创建成功", data=transect)
+
+
+def add_transect(INP, transect: TransectModel) -> None:
+    """
+    校验并向模型中添加不规则断面,须在 ModelStore.mutate() 中调用
+    """
     inp_transects = INP.check_for_section(Transect)
 
     # 检查断面名称是否已存在
@@ -173,10 +193,6 @@ async def create_transect(transect: TransectModel):
     )
     inp_transects[transect.name] = transect_model
 
-    # 保存更新后的文件
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(message="创建成功", data=transect)
-
 
 @transectsRouter.delete(
     "/transect/{transect_id:path}",
@@ -184,8 +200,17 @@ async def create_transect(transect: TransectModel):
     description="通过断面ID删除断面",
 )
 @with_exception_handler(default_message="删除失败,文件有误,发生未知错误")
-async def delete_transect(transect_id: str):
-    INP = SwmmInput.read_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
+async def delete_transect(transect_id: str, if_match: IfMatchHeader = None):
+    async with ModelStore.mutate(if_match) as INP:
+        remove_transect(INP, transect_id)
+
+    return Result.success_result(message="删除成功", data={"id": transect_id})
+
+
+def remove_transect(INP, transect_id: str) -> None:
+    """
+    删除不规则断面,断面被渠道引用时抛出 HTTPException,须在 ModelStore.mutate() 中调用
+    """
     inp_transects = INP.check_for_section(Transect)
     inp_xsections = INP.check_for_section(CrossSection)
     # 检查断面是否存在
@@ -203,5 +228,3 @@ async def delete_transect(transect_id: str):
             detail=f"删除失败,断面 [ {transect_id} ] 被 {len(related_xsections)} 条渠道引用,请先取消引用再删除,渠道名称为:{related_xsections}",
         )
     del inp_transects[transect_id]
-    INP.write_file(SWMM_FILE_INP_PATH, encoding=ENCODING)
-    return Result.success_result(message="删除成功", data={"id": transect_id})
@@ -20,6 +20,12 @@ from apis.subcatchment import subcatchment
 from apis.agent.chat import chatRouter
 from apis.show import showRouter
 from apis.river import riverRouter
+from apis.model import modelRouter
+from apis.batch import batchRouter
+from utils.model_store import ModelStore
+from utils.river_jobs import RiverJobManager
+from utils.river_layer import RiverLayer
+from utils.swmm_runner import SimulationJobManager
 
 
 @asynccontextmanager
@@ -32,8 +38,16 @@ async def lifespan(app: FastAPI):
     LLMRegistry.register("llm", llm)  # (不要Agent功能，想要不报错，可以注释掉)
     # 初始Graph实例
     GraphInstance.init()  # (不要Agent功能，想要不报错，可以注释掉)
+    # 预先读取水系图层并构建空间索引
+    RiverLayer.load()
     yield
     app_logger.info("正在关闭后端API服务...")
+    # 写入合并窗口内尚未写盘的模型修改
+    await ModelStore.flush()
+    # 关闭计算进程池
+    SimulationJobManager.shutdown()
+    # 关闭水系任务进程池
+    RiverJobManager.shutdown()
     # 关闭异步全局StoreManager
     await AsyncStoreManager.close()  # (不要Agent功能，想要不报错，可以注释掉)
 
@@ -80,6 +94,8 @@ application.include_router(transectsRouter, prefix="/swmm", tags=["不规则断
 application.include_router(timeseriesRouter, prefix="/swmm", tags=["时间序列"])
 application.include_router(calculateRouter, prefix="/swmm", tags=["计算"])
 application.include_router(subcatchment, prefix="/swmm", tags=["子汇水区域"])
+application.include_router(modelRouter, prefix="/swmm", tags=["模型"])
+application.include_router(batchRouter, prefix="/swmm", tags=["批量修改"])
 
 application.include_router(showRouter, prefix="/swmm", tags=["首页滚动展示数据"])
 # 水系相关路由
@@ -0,0 +1,89 @@
+"""
+河网节点合并性能对比: 逐对比较 vs 网格哈希(apis.river.merge_close_nodes)
+
+在 backend 目录下运行:
+    python -m benchmarks.river_merge [节点数 ...] [--merge-dist 800]
+
+默认对 1000 / 2000 / 5000 / 20000 个随机节点分别计时,并校验两种实现得到的簇完全相同;
+逐对比较为 O(n²),节点数超过 --pairwise-limit 时只运行网格哈希
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+from shapely.geometry import Point
+
+from apis.river import merge_close_nodes
+
+
+def merge_nodes_pairwise(points: List[Point], merge_dist: float) -> List[List[int]]:
+    """原 build_river_network 中的合并实现(逐对调用 shapely 距离)"""
+    used_idx = set()
+    clusters = []
+    for i, geom_i in enumerate(points):
+        if i in used_idx:
+            continue
+        cluster_idx = [i]
+        used_idx.add(i)
+        for j in range(i + 1, len(points)):
+            if j in used_idx:
+                continue
+            if geom_i.distance(points[j]) < merge_dist:
+                used_idx.add(j)
+                cluster_idx.append(j)
+        clusters.append(cluster_idx)
+    return clusters
+
+
+def make_nodes(n: int, merge_dist: float, seed: int = 0) -> np.ndarray:
+    """
+    生成 n 个 Web Mercator 坐标下的随机节点
+
+    平均间距约为 merge_dist,其中一成节点紧挨已有节点(模拟交汇点附近的重复打点)
+    """
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(n) * merge_dist
+    xy = rng.uniform(0, side, size=(n, 2)) + (1.3e7, 3.5e6)
+    near = rng.random(n) < 0.1
+    xy[near] = xy[rng.integers(0, n, near.sum())] + rng.normal(
+        0, merge_dist / 4, size=(near.sum(), 2)
+    )
+    return xy
+
+
+def run(sizes: List[int], merge_dist: float, pairwise_limit: int) -> None:
+    print(f"merge_dist = {merge_dist}")
+    print(f"{'节点数':>8} {'簇数':>8} {'逐对比较(s)':>12} {'网格哈希(s)':>12} {'加速比':>8}")
+    for n in sizes:
+        xy = make_nodes(n, merge_dist)
+
+        start = time.perf_counter()
+        clusters = merge_close_nodes(xy, merge_dist)
+        grid_time = time.perf_counter() - start
+
+        if n > pairwise_limit:
+            print(f"{n:>8} {len(clusters):>8} {'-':>12} {grid_time:>12.4f} {'-':>8}")
+            continue
+
+        points = [Point(x, y) for x, y in xy]
+        start = time.perf_counter()
+        expected = merge_nodes_pairwise(points, merge_dist)
+        pairwise_time = time.perf_counter() - start
+
+        if clusters != expected:
+            raise AssertionError(f"{n} 个节点时两种实现的合并结果不一致")
+        print(
+            f"{n:>8} {len(clusters):>8} {pairwise_time:>12.4f} {grid_time:>12.4f}"
+            f" {pairwise_time / grid_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="河网节点合并性能对比")
+    parser.add_argument("sizes", nargs="*", type=int, default=[1000, 2000, 5000, 20000])
+    parser.add_argument("--merge-dist", type=float, default=800.0)
+    parser.add_argument("--pairwise-limit", type=int, default=5000)
+    args = parser.parse_args()
+    run(args.sizes, args.merge_dist, args.pairwise_limit)
@@ -117,6 +117,70 @@ class LoggerConfig:
         print("=" * 50)
 
 
+class SwmmConfig:
+    """SWMM 模型文件配置"""
+
+    # ==================== INP 写入配置 ====================
+    # 修改后延迟写盘的合并窗口(毫秒),窗口内的多次修改只写一次文件;0 表示每次修改立即写盘
+    INP_WRITE_DELAY_MS: int = int(os.getenv("INP_WRITE_DELAY_MS", "500"))
+
+    # ==================== 坐标系配置 ====================
+    # INP 模型坐标所用的投影坐标系,INP 文件 [TITLE] 中声明了 "CRS: EPSG:xxxx" 时以文件为准
+    PROJECT_CRS: str = os.getenv("PROJECT_CRS", "EPSG:32648")
+
+    # ==================== 计算任务配置 ====================
+    # 同时进行 SWMM 计算的最大进程数
+    SIMULATION_MAX_WORKERS: int = int(os.getenv("SIMULATION_MAX_WORKERS", "2"))
+    # 保留的历史计算任务数,超出后最早结束的任务及其工作目录会被清理
+    SIMULATION_JOB_HISTORY: int = int(os.getenv("SIMULATION_JOB_HISTORY", "50"))
+    # 逐步计算时推送进度的最小间隔(毫秒),避免频繁推送拖慢计算
+    SIMULATION_PROGRESS_INTERVAL_MS: int = int(
+        os.getenv("SIMULATION_PROGRESS_INTERVAL_MS", "500")
+    )
+
+    # ==================== 水系数据配置 ====================
+    # 是否把水系 shapefile 转换为 GeoParquet 缓存文件加快读取(需要安装 pyarrow),
+    # 源文件变化时自动重新转换;未安装 pyarrow 时直接读取 shapefile
+    RIVER_PARQUET_CACHE: bool = (
+        os.getenv("RIVER_PARQUET_CACHE", "true").lower() == "true"
+    )
+    # 同时进行水系裁剪/打断的最大进程数
+    RIVER_MAX_WORKERS: int = int(os.getenv("RIVER_MAX_WORKERS", "2"))
+    # 水系裁剪/打断任务的超时时间(秒),从提交时开始计算,超时后任务被取消
+    RIVER_JOB_TIMEOUT: float = float(os.getenv("RIVER_JOB_TIMEOUT", "300"))
+    # 水系打断输入的顶点数超过该值时自动转为后台任务,立即返回任务ID
+    RIVER_BACKGROUND_VERTICES: int = int(
+        os.getenv("RIVER_BACKGROUND_VERTICES", "200000")
+    )
+    # 保留的已结束水系任务数(含结果),超出后最早结束的任务会被清理
+    RIVER_JOB_HISTORY: int = int(os.getenv("RIVER_JOB_HISTORY", "20"))
+    # 内存中缓存的水系裁剪/打断结果数,相同参数的请求直接返回缓存结果;0 表示不缓存
+    RIVER_RESULT_CACHE_SIZE: int = int(os.getenv("RIVER_RESULT_CACHE_SIZE", "16"))
+    # 磁盘上缓存的水系裁剪/打断结果数,服务重启后仍可命中;0 表示只缓存在内存中
+    RIVER_RESULT_CACHE_DISK: int = int(os.getenv("RIVER_RESULT_CACHE_DISK", "100"))
+
+    @classmethod
+    def print_config(cls) -> None:
+        """打印 SWMM 模型文件配置"""
+        print("💧 SWMM 模型文件配置:")
+        print("=" * 50)
+        print(f"⏱️ INP 写入合并窗口: {cls.INP_WRITE_DELAY_MS}ms")
+        print(f"🌐 默认项目坐标系: {cls.PROJECT_CRS}")
+        print(f"⚙️ 最大并行计算数: {cls.SIMULATION_MAX_WORKERS}")
+        print(f"🗂️ 保留历史计算任务数: {cls.SIMULATION_JOB_HISTORY}")
+        print(f"📶 计算进度推送间隔: {cls.SIMULATION_PROGRESS_INTERVAL_MS}ms")
+        print(f"🏞️ 水系 GeoParquet 缓存: {cls.RIVER_PARQUET_CACHE}")
+        print(f"🌊 最大并行水系处理数: {cls.RIVER_MAX_WORKERS}")
+        print(f"⏳ 水系任务超时时间: {cls.RIVER_JOB_TIMEOUT}s")
+        print(f"📦 水系打断转为后台任务的顶点数: {cls.RIVER_BACKGROUND_VERTICES}")
+        print(f"🗃️ 保留历史水系任务数: {cls.RIVER_JOB_HISTORY}")
+        print(
+            f"💾 水系结果缓存数: 内存 {cls.RIVER_RESULT_CACHE_SIZE}, "
+            f"磁盘 {cls.RIVER_RESULT_CACHE_DISK}"
+        )
+        print("=" * 50)
+
+
 class DatabaseConfig:
     """数据库配置"""
 
@@ -174,4 +238,5 @@ if __name__ == "__main__":
     print("=" * 60)
     SystemConfig.print_config()
     LoggerConfig.print_config()
+    SwmmConfig.print_config()
     DatabaseConfig.print_config()
@@ -0,0 +1,48 @@
+from pydantic import BaseModel, Field, model_validator
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from schemas.timeseries import TimeSeriesTypeModel
+
+
+class BatchEntityType(str, Enum):
+    JUNCTION = "junction"  # 节点
+    OUTFALL = "outfall"  # 出口
+    CONDUIT = "conduit"  # 渠道
+    SUBCATCHMENT = "subcatchment"  # 子汇水区
+    TRANSECT = "transect"  # 不规则断面
+    TIMESERIES = "timeseries"  # 时间序列
+
+
+class BatchAction(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class BatchOperationModel(BaseModel):
+    entity: BatchEntityType  # 实体类型
+    action: BatchAction  # 操作类型
+    id: Optional[str] = Field(
+        default=None, description="update / delete 的目标名称,与单个接口路径中的名称相同"
+    )
+    data: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="create / update 的数据,与单个接口的请求体相同(子汇水区新建为边界数据)",
+    )
+    type: TimeSeriesTypeModel = Field(
+        default=TimeSeriesTypeModel.INFLOW,
+        description="时间序列类型,仅 entity 为 timeseries 时使用",
+    )
+
+    @model_validator(mode="after")
+    def check_required_fields(self):
+        if self.action != BatchAction.CREATE and not self.id:
+            raise ValueError(f"{self.action.value} 操作必须指定 id")
+        if self.action != BatchAction.DELETE and self.data is None:
+            raise ValueError(f"{self.action.value} 操作必须提供 data")
+        return self
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperationModel] = Field(min_length=1)  # 按顺序执行的操作列表
@@ -1,6 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, time
-from typing import Literal
+from enum import Enum
+from typing import Dict, List, Literal, Optional
+
+from schemas.timeseries import TimeSeriesModel, TimeSeriesTypeModel
 
 
 class CalculateModel(BaseModel):
@@ -12,3 +15,63 @@ class CalculateModel(BaseModel):
     report_step: time  # 时间步长 (格式:hr:min:sec)默认是 00:15:00
     flow_routing: Literal["STEADY", "KINWAVE", "DYNWAVE"] = "KINWAVE"  # 流量计算方法
     start_report_datetime: datetime  # 报告开始时间
+
+
+class CalculateJobStatus(str, Enum):
+    PENDING = "pending"  # 排队中
+    RUNNING = "running"  # 计算中
+    SUCCESS = "success"  # 计算成功
+    FAILED = "failed"  # 计算失败
+
+
+class CalculateJobModel(BaseModel):
+    id: str  # 计算任务ID
+    status: CalculateJobStatus = CalculateJobStatus.PENDING  # 任务状态
+    created_at: datetime  # 提交时间
+    started_at: Optional[datetime] = None  # 开始计算时间
+    finished_at: Optional[datetime] = None  # 结束时间
+    duration: Optional[float] = None  # 计算耗时(秒)
+    error: Optional[str] = None  # 计算失败时的错误信息
+    out_path: Optional[str] = None  # 计算成功后生成的结果文件路径
+    stepping: bool = False  # 是否为逐步计算(推送实时进度)
+    progress: Optional[float] = None  # 计算进度(0-100)
+    sim_time: Optional[datetime] = None  # 当前模拟时间
+
+
+class CalculateJobRequest(BaseModel):
+    # 是否使用 pyswmm 逐步计算,并通过 /calculate/jobs/{job_id}/events 推送实时进度
+    stepping: bool = False
+    nodes: List[str] = []  # 推送进度时附带水深(depth)的节点名称
+    links: List[str] = []  # 推送进度时附带流量(flow)的链接名称
+
+
+class ScenarioTimeseriesModel(TimeSeriesModel):
+    # 被替换数据的时间序列类型,name 为不带前缀的时间序列名称
+    type: TimeSeriesTypeModel = TimeSeriesTypeModel.RAINGAGE
+
+
+class ScenarioModel(BaseModel):
+    name: str  # 情景名称
+    options: Optional[CalculateModel] = None  # 替换计算选项,不传则使用模型当前选项
+    timeseries: List[ScenarioTimeseriesModel] = []  # 替换已有时间序列的数据
+    conduit_roughness: Dict[str, float] = {}  # 指定管道的糙率 {管道名称: 糙率}
+    roughness_factor: Optional[float] = Field(
+        default=None, gt=0
+    )  # 全部管道糙率的倍数(在 conduit_roughness 之前应用)
+
+
+class ScenarioBatchRequest(BaseModel):
+    scenarios: List[ScenarioModel] = Field(min_length=1)  # 情景列表
+    links: List[str] = []  # 汇总表中需要单独列出洪峰流量的链接名称
+
+
+class ScenarioSummaryModel(BaseModel):
+    name: str  # 情景名称
+    status: CalculateJobStatus  # 计算状态(success/failed)
+    duration: Optional[float] = None  # 计算耗时(秒)
+    error: Optional[str] = None  # 计算失败时的错误信息
+    max_flow: Optional[float] = None  # 全部链接中的最大流量
+    max_flow_link: Optional[str] = None  # 出现最大流量的链接
+    peak_flows: Dict[str, float] = {}  # 指定链接的洪峰流量
+    flooding_volume: Optional[float] = None  # 节点总溢流量(流量单位 x 秒,如 CMS 时为 m³)
+    flooded_nodes: Optional[int] = None  # 发生溢流的节点数
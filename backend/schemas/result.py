@@ -1,14 +1,24 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Generic, TypeVar, Optional
 
 T = TypeVar("T")
 
 
+def _current_model_version() -> Optional[int]:
+    # 延迟导入,避免 schemas 在导入阶段依赖模型缓存
+    from utils.model_store import ModelStore
+
+    # 使用本次请求在 read() / mutate() 中持有锁时记录的版本号,而不是构造结果时的最新版本
+    return ModelStore.seen_version()
+
+
 class Result(BaseModel, Generic[T]):
     code: int
     message: str
     data: Optional[T] = None
     success: bool = True
+    # 当前 INP 模型版本号,修改接口可通过 If-Match 请求头携带该值进行乐观并发控制
+    version: Optional[int] = Field(default_factory=_current_model_version)
 
     # 增加类似于字典的get方法
     def get(self, key: str, default=None):
@@ -16,8 +26,14 @@ class Result(BaseModel, Generic[T]):
         return getattr(self, key, default)
 
     @staticmethod
-    def success_result(data: Optional[T] = None, message: str = "成功") -> "Result[T]":
-        return Result(success=True, code=200, message=message, data=data)
+    def success_result(
+        data: Optional[T] = None, message: str = "成功", version: Optional[int] = None
+    ) -> "Result[T]":
+        if version is None:
+            return Result(success=True, code=200, message=message, data=data)
+        return Result(
+            success=True, code=200, message=message, data=data, version=version
+        )
 
     @staticmethod
     def error(
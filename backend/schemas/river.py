@@ -1,12 +1,16 @@
 from pydantic import BaseModel, field_validator
 from fastapi import HTTPException
-from typing import List, Tuple
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional, Tuple
 
 
 class RiverClipRequest(BaseModel):
     """水系切割请求模型"""
 
     polygon: List[List[float]] = []
+    # 是否作为后台任务执行并立即返回任务信息,默认等待结果
+    background: Optional[bool] = None
 
     @field_validator("polygon", mode="before")
     def validate_polygon(cls, value):
@@ -102,6 +106,8 @@ class RiverNetworkRequest(BaseModel):
 
     geojson: dict
     break_distance: float = 3000.0
+    # 是否作为后台任务执行并立即返回任务信息,不传时顶点数超过 RIVER_BACKGROUND_VERTICES 自动转为后台任务
+    background: Optional[bool] = None
 
     @field_validator("geojson", mode="before")
     def validate_geojson(cls, value):
@@ -139,3 +145,26 @@ class RiverNetworkRequest(BaseModel):
             )
 
         return float(value)
+
+
+class RiverJobStatus(str, Enum):
+    PENDING = "pending"  # 排队中
+    RUNNING = "running"  # 处理中
+    SUCCESS = "success"  # 处理成功
+    FAILED = "failed"  # 处理失败
+    CANCELLED = "cancelled"  # 已取消(含超时)
+
+
+class RiverJobModel(BaseModel):
+    id: str  # 任务ID
+    kind: str  # 任务类型(clip / break)
+    status: RiverJobStatus = RiverJobStatus.PENDING  # 任务状态
+    created_at: datetime  # 提交时间
+    started_at: Optional[datetime] = None  # 开始处理时间
+    finished_at: Optional[datetime] = None  # 结束时间
+    duration: Optional[float] = None  # 处理耗时(秒)
+    timeout: float  # 超时时间(秒),从提交时开始计算
+    error: Optional[str] = None  # 失败或取消的原因
+    status_code: Optional[int] = None  # 失败或取消时对应的 HTTP 状态码
+    result: Optional[dict] = None  # 处理成功时的结果(与同步接口返回的 data 相同)
+    cached: bool = False  # 结果是否来自缓存(相同参数的请求已处理过)
@@ -1,6 +1,10 @@
 from langchain_core.tools import tool
 from pydantic import Field
-from apis.calculate import query_entity_kind_select, query_calculate_result
+from apis.calculate import (
+    query_entity_kind_select,
+    query_calculate_result,
+    query_calculate_summary,
+)
 from utils.utils import with_result_exception_handler
 from langgraph.types import interrupt
 from langgraph.errors import GraphInterrupt
@@ -9,7 +13,7 @@ from fastapi import HTTPException
 from utils.agent.websocket_manager import ChatMessageSendHandler
 from langgraph.prebuilt import InjectedState
 from typing_extensions import Annotated
-from typing import Any
+from typing import Any, Literal, Optional
 
 
 # @tool
@@ -147,3 +151,53 @@ async def query_calculate_result_tool(
         return Result.error(message=str(e.detail)).model_dump()
     except Exception as e:
         return Result.error(message=str(e)).model_dump()
+
+
+@tool
+@with_result_exception_handler
+async def query_calculate_summary_tool(
+    kind: Literal["node", "link", "subcatchment"] = Field(
+        default="link",
+        description="对象类型: node(节点/出口)、link(渠道)、subcatchment(子汇水区)",
+    ),
+    sort_by: Optional[str] = Field(default=None, description="排序字段,不传则不排序"),
+    order: Literal["desc", "asc"] = Field(default="desc", description="排序方向"),
+    top: Optional[int] = Field(default=None, description="只返回前 N 个,不传则返回全部"),
+):
+    """
+    **计算结果统计查询工具**
+    查询计算完成后预先统计好的各对象指标(最大值、最大值出现时间、平均值、总量、溢流/满管时长),
+    支持排序和取前 N 个,适合回答"哪条渠道洪峰流量最大""溢流最严重的前 5 个节点"这类问题。
+
+    **使用场景**：
+        - 查询最大值、平均值、总量、溢流时长等统计结果
+        - 按某个指标排名,取前 N 个对象
+        - 需要完整时序曲线时请使用 query_calculate_result_tool
+
+    **参数**：
+        - kind (str): 对象类型 node / link / subcatchment
+        - sort_by (str): 排序字段
+            - node:peak_depth(最大水深)、peak_depth_time(最大水深出现时间)、mean_depth(平均水深)、
+              peak_inflow(最大总进流量)、inflow_volume(总进流量体积)、peak_flooding(最大溢流流量)、
+              flooding_volume(溢流体积)、flooding_hours(溢流时长)
+            - link:peak_flow(洪峰流量)、peak_flow_time(洪峰出现时间)、mean_flow(平均流量)、
+              flow_volume(过流体积)、peak_velocity(最大流速)、peak_depth(最大水深)、
+              peak_capacity(最大充满度)、surcharge_hours(满管时长)
+            - subcatchment:peak_runoff(最大径流量)、peak_runoff_time(最大径流出现时间)、
+              mean_runoff(平均径流量)、runoff_volume(径流体积)、total_rainfall(累计降雨量)
+        - order (str): desc(从大到小,默认) / asc(从小到大)
+        - top (int): 只返回前 N 个
+
+    **返回值**：
+        Result.success_result(
+            data={"kind": ..., "fields": {字段: 中文含义}, "rows": [{"name": 对象名称, 字段: 数值, ...}, ...]}
+        )
+
+    **示例**：
+        输入: kind="link", sort_by="peak_flow", top=5
+        返回: 洪峰流量最大的 5 条渠道及其各项统计
+    """
+    result = await query_calculate_summary(
+        kind=kind, sort_by=sort_by, order=order, top=top
+    )
+    return result.model_dump()
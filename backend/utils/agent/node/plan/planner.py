@@ -63,6 +63,7 @@ async def planner_node(state: PlanModeState) -> dict:
              · 出口查询：get_outfalls_tool, batch_get_outfalls_by_ids_tool
              · 子汇水区查询：get_subcatchments_tool, batch_get_subcatchments_by_names_tool
              · 计算结果查询：query_calculate_result_tool
+             · 计算结果统计（最大值、总量、溢流时长及排名）：query_calculate_summary_tool
          - 创建：create_junction_tool, create_conduit_tool, create_outfall_tool, create_subcatchment_tool
          - 更新：update_junction_tool, update_conduit_tool, update_outfall_tool, update_subcatchment_tool
          - 删除：delete_junction_tool, delete_conduit_tool, delete_outfall_tool, delete_subcatchment_tool
@@ -135,6 +136,7 @@ async def planner_node(state: PlanModeState) -> dict:
              · 出口查询：get_outfalls_tool, batch_get_outfalls_by_ids_tool
              · 子汇水区查询：get_subcatchments_tool, batch_get_subcatchments_by_names_tool
              · 计算结果查询：query_calculate_result_tool
+             · 计算结果统计（最大值、总量、溢流时长及排名）：query_calculate_summary_tool
          - 创建：create_junction_tool, create_conduit_tool, create_outfall_tool, create_subcatchment_tool
          - 更新：update_junction_tool, update_conduit_tool, update_outfall_tool, update_subcatchment_tool
          - 删除：delete_junction_tool, delete_conduit_tool, delete_outfall_tool, delete_subcatchment_tool
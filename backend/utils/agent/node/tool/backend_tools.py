@@ -32,7 +32,7 @@ from tools.subcatchment import (
     create_subcatchment_tool,
     delete_subcatchment_tool,
 )
-from tools.calculate import query_calculate_result_tool
+from tools.calculate import query_calculate_result_tool, query_calculate_summary_tool
 from tools.webui import human_info_completion_tool
 
 # 定义工具
@@ -56,6 +56,7 @@ normal_backend_tools = [
     update_subcatchment_tool,
     create_subcatchment_tool,
     batch_get_subcatchments_by_names_tool,
+    query_calculate_summary_tool,
 ]
 # 1.2 Human in the loop后端工具(人类反馈工具)
 HIL_backend_tools = [
@@ -0,0 +1,44 @@
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+
+# 紧凑二进制响应的媒体类型与格式版本
+BINARY_MEDIA_TYPE = "application/octet-stream"
+BINARY_FORMAT = "swmm-f32-v1"
+
+# 数据区对齐字节数,保证前端可以直接以 Float32Array 读取
+_ALIGNMENT = 4
+
+
+def wants_binary(format: Optional[str], accept: Optional[str]) -> bool:
+    """
+    判断客户端是否请求二进制格式
+
+    优先使用查询参数 format(json / binary),未指定时根据 Accept 请求头判断
+    """
+    if format is not None:
+        return format == "binary"
+    return BINARY_MEDIA_TYPE in (accept or "")
+
+
+def pack_float32_payload(header: dict, values: np.ndarray) -> bytes:
+    """
+    打包为 [4 字节小端 uint32 头长度 n][n 字节 UTF-8 JSON 头][小端 float32 数据]
+
+    JSON 头末尾以空格补齐,使数据区从 4 + n 字节开始且 4 字节对齐(空格不影响 JSON 解析),
+    头中会补充 format、dtype 和 shape,数据按 values 的 C 顺序(最后一维连续)排列
+    """
+    values = np.ascontiguousarray(values, dtype="<f4")
+    header = {
+        **header,
+        "format": BINARY_FORMAT,
+        "dtype": "float32",
+        "shape": list(values.shape),
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * (-(4 + len(header_bytes)) % _ALIGNMENT)
+    return b"".join(
+        (struct.pack("<I", len(header_bytes)), header_bytes, values.tobytes())
+    )
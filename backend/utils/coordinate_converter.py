@@ -1,29 +1,128 @@
-from pyproj import Transformer
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+from pyproj import CRS, Transformer
+
+from config import SwmmConfig
 
-# 设置 UTM 48N(EPSG:32648)
 WGS84_CRS = "EPSG:4326"  # WGS84 经纬度
-UTM48N_CRS = "EPSG:32648"  # UTM 48N 投影
 
+# INP 文件 [TITLE] 中声明项目坐标系的行,如 "CRS: EPSG:32649"
+_TITLE_CRS_PATTERN = re.compile(
+    r"^\s*CRS\s*[:=]\s*(\S+)\s*$", re.IGNORECASE | re.MULTILINE
+)
+
+
+@lru_cache(maxsize=None)
+def get_transformer(from_crs: str, to_crs: str) -> Transformer:
+    """按坐标系对缓存 Transformer,构造 Transformer 开销较大,每个坐标系对只构造一次"""
+    return Transformer.from_crs(from_crs, to_crs, always_xy=True)
+
+
+@lru_cache(maxsize=None)
+def _normalize_crs(crs: str) -> str:
+    """校验并规范化坐标系字符串,能识别 EPSG 编号时统一为 EPSG:xxxx 形式"""
+    parsed = CRS.from_user_input(crs)
+    epsg = parsed.to_epsg()
+    return f"EPSG:{epsg}" if epsg is not None else parsed.to_string()
 
-# 1. WGS84 经纬度 -> UTM 48N
-def wgs84_to_utm(lon, lat):
-    transformer = Transformer.from_crs(WGS84_CRS, UTM48N_CRS, always_xy=True)
-    utm_x, utm_y = transformer.transform(lon, lat)
-    return utm_x, utm_y
 
+def get_project_crs(inp=None) -> str:
+    """
+    获取项目(INP 模型坐标)所用的投影坐标系
 
-# 2. UTM 48N -> WGS84 经纬度
-def utm_to_wgs84(utm_x, utm_y):
-    transformer = Transformer.from_crs(UTM48N_CRS, WGS84_CRS, always_xy=True)
-    lon, lat = transformer.transform(utm_x, utm_y)
+    优先读取 INP 文件 [TITLE] 中的 "CRS: EPSG:xxxx" 声明,
+    未声明时使用配置项 PROJECT_CRS(默认 UTM 48N, EPSG:32648)
+    """
+    if inp is not None and "TITLE" in inp:
+        match = _TITLE_CRS_PATTERN.search(str(inp["TITLE"]))
+        if match:
+            return _normalize_crs(match.group(1))
+    return _normalize_crs(SwmmConfig.PROJECT_CRS)
+
+
+# 1. WGS84 经纬度 -> 项目坐标系
+def wgs84_to_project(lon, lat, crs: str):
+    transformer = get_transformer(WGS84_CRS, crs)
+    x, y = transformer.transform(lon, lat)
+    return x, y
+
+
+# 2. 项目坐标系 -> WGS84 经纬度
+def project_to_wgs84(x, y, crs: str):
+    transformer = get_transformer(crs, WGS84_CRS)
+    lon, lat = transformer.transform(x, y)
     return lon, lat
 
 
-def polygon_wgs84_to_utm(polygon):
-    """将多边形顶点坐标从 WGS84 转换为 UTM 48N"""
-    return [wgs84_to_utm(lon, lat) for lon, lat in polygon]
+def _transform_points(points, from_crs: str, to_crs: str) -> np.ndarray:
+    """批量转换 (N, 2) 坐标数组,一次调用完成全部点的转换"""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) == 0:
+        return points
+    x, y = get_transformer(from_crs, to_crs).transform(points[:, 0], points[:, 1])
+    return np.column_stack((x, y))
+
+
+def points_wgs84_to_project(points, crs: str) -> np.ndarray:
+    """批量将 (N, 2) 经纬度数组转换为项目坐标系坐标数组"""
+    return _transform_points(points, WGS84_CRS, crs)
+
+
+def points_project_to_wgs84(points, crs: str) -> np.ndarray:
+    """批量将 (N, 2) 项目坐标系坐标数组转换为经纬度数组"""
+    return _transform_points(points, crs, WGS84_CRS)
+
+
+def polygon_wgs84_to_project(polygon, crs: str):
+    """将多边形顶点坐标从 WGS84 转换为项目坐标系"""
+    return [tuple(point) for point in points_wgs84_to_project(polygon, crs).tolist()]
+
+
+def polygon_project_to_wgs84(polygon, crs: str):
+    """将多边形顶点坐标从项目坐标系转换为 WGS84"""
+    return [tuple(point) for point in points_project_to_wgs84(polygon, crs).tolist()]
+
+
+def polygons_project_to_wgs84(polygons: List[list], crs: str) -> List[list]:
+    """
+    批量将多个多边形从项目坐标系转换为 WGS84
+
+    所有多边形的顶点拼接后只做一次转换,再按原顶点数拆分回各个多边形
+    """
+    if not polygons:
+        return []
+    sizes = [len(polygon) for polygon in polygons]
+    vertices = [point for polygon in polygons for point in polygon]
+    converted = points_project_to_wgs84(vertices, crs).tolist()
+    result = []
+    start = 0
+    for size in sizes:
+        result.append([tuple(point) for point in converted[start : start + size]])
+        start += size
+    return result
+
+
+def coordinates_project_to_wgs84(
+    coordinates: Mapping, crs: str, names: Optional[Iterable[str]] = None
+) -> Dict[str, tuple]:
+    """
+    批量将 INP 中 [COORDINATES] 的节点坐标转换为经纬度
 
+    参数:
+    - coordinates: 节点名称 -> 坐标对象(具有 x/y 属性)的映射
+    - crs: 节点坐标所在的项目坐标系
+    - names: 需要转换的节点名称,为 None 时转换全部;不存在坐标的节点会被跳过
 
-def polygon_utm_to_wgs84(polygon):
-    """将多边形顶点坐标从 UTM 48N 转换为 WGS84"""
-    return [utm_to_wgs84(utm_x, utm_y) for utm_x, utm_y in polygon]
+    返回:
+    - 节点名称 -> (lon, lat) 的字典
+    """
+    if names is None:
+        names = list(coordinates.keys())
+    else:
+        names = [name for name in names if name in coordinates]
+    points = [(coordinates[name].x, coordinates[name].y) for name in names]
+    lon_lat = points_project_to_wgs84(points, crs).tolist()
+    return {name: tuple(point) for name, point in zip(names, lon_lat)}
@@ -0,0 +1,151 @@
+from datetime import datetime
+from typing import Annotated, Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import Query
+
+# 降采样方法:
+# - lttb:   Largest-Triangle-Three-Buckets,保留曲线形状的代表点
+# - minmax: 每个区间保留最小值和最大值两个点(包络)
+# - mean:   每个区间取平均值
+DecimationMethod = Literal["lttb", "minmax", "mean"]
+
+# 结果查询接口共用的时间范围与降采样查询参数
+StartQuery = Annotated[
+    Optional[datetime], Query(description="开始时间(含),不传则从模拟开始")
+]
+EndQuery = Annotated[
+    Optional[datetime], Query(description="结束时间(含),不传则到模拟结束")
+]
+MaxPointsQuery = Annotated[
+    Optional[int],
+    Query(ge=2, description="最多返回的时间点数,超过时按 method 降采样,不传则不降采样"),
+]
+MethodQuery = Annotated[
+    DecimationMethod,
+    Query(description="降采样方法: lttb(保留形状) / minmax(最小最大值包络) / mean(区间平均)"),
+]
+
+
+def window_slice(
+    index: pd.DatetimeIndex,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> slice:
+    """返回时间索引中 [start, end] 范围对应的切片,时间索引须为升序"""
+    begin = 0 if start is None else int(index.searchsorted(start, side="left"))
+    stop = len(index) if end is None else int(index.searchsorted(end, side="right"))
+    return slice(begin, max(begin, stop))
+
+
+def _bucket_edges(n: int, buckets: int) -> np.ndarray:
+    """把 n 个点尽量均匀地分成 buckets 个区间,返回 buckets + 1 个边界"""
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def _lttb(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 选点,返回选中的行号
+
+    values 为 (时间步, 序列) 的二维数组,多个序列共用时间轴时,
+    每列先按自身的极差归一化,再以各列三角形面积之和选点,保证所有序列返回相同的时间点
+    """
+    n = len(values)
+    y = np.nan_to_num(values.astype("float64"))
+    span = y.max(axis=0) - y.min(axis=0)
+    y = y / np.where(span > 0, span, 1.0)
+    x = np.arange(n, dtype="float64")
+
+    # 首尾两点固定保留,中间的点分到 max_points - 2 个区间
+    edges = 1 + _bucket_edges(n - 2, max_points - 2)
+    rows = np.empty(max_points, dtype=np.int64)
+    rows[0], rows[-1] = 0, n - 1
+    selected = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一个区间的平均点(最后一个区间使用终点)
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+        else:
+            next_lo, next_hi = n - 1, n
+        x_next = x[next_lo:next_hi].mean()
+        y_next = y[next_lo:next_hi].mean(axis=0)
+        x_a, y_a = x[selected], y[selected]
+        area = np.abs(
+            (x_a - x_next) * (y[lo:hi] - y_a)
+            - (x_a - x[lo:hi, None]) * (y_next - y_a)
+        ).sum(axis=1)
+        selected = lo + int(np.argmax(area))
+        rows[i + 1] = selected
+    return rows
+
+
+def _minmax(values: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每个区间取最小值和最大值,返回 (行号, 值)"""
+    n = len(values)
+    edges = _bucket_edges(n, buckets)
+    starts = edges[:-1]
+    if values.shape[1] == 1:
+        # 单个序列:使用最小值、最大值实际出现的时间,并按时间先后排列
+        column = values[:, 0]
+        rows = []
+        for lo, hi in zip(starts, edges[1:]):
+            segment = column[lo:hi]
+            if np.isnan(segment).all():
+                # 区间内全为 NaN 时没有最小、最大值,只保留区间起点(值为 NaN)
+                rows.append(lo)
+                continue
+            extremes = {int(np.nanargmin(segment)), int(np.nanargmax(segment))}
+            rows.extend(lo + row for row in sorted(extremes))
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows, values[rows]
+    # 多个序列共用时间轴:最小值、最大值分别放在区间的起止时间
+    minimum = np.fmin.reduceat(values, starts, axis=0)
+    maximum = np.fmax.reduceat(values, starts, axis=0)
+    rows = np.column_stack((starts, edges[1:] - 1)).ravel()
+    out = np.empty((2 * buckets, values.shape[1]), dtype=values.dtype)
+    out[0::2], out[1::2] = minimum, maximum
+    return rows, out
+
+
+def _mean(values: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每个区间取平均值,时间取区间的起始时间,返回 (行号, 值)"""
+    edges = _bucket_edges(len(values), buckets)
+    starts = edges[:-1]
+    sums = np.add.reduceat(values.astype("float64"), starts, axis=0)
+    counts = np.diff(edges)[:, None]
+    return starts, (sums / counts).astype(values.dtype)
+
+
+def decimate(
+    values: np.ndarray,
+    max_points: Optional[int] = None,
+    method: DecimationMethod = "lttb",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    对 (时间步,) 或 (时间步, 序列) 的结果数组降采样,所有序列共用返回的时间点
+
+    返回 (行号, 值),行号为原时间轴上的位置,用于取对应的时间;
+    max_points 为空或点数不超过 max_points 时不降采样
+    """
+    one_dimensional = values.ndim == 1
+    values_2d = values[:, None] if one_dimensional else values
+    n = len(values_2d)
+    if max_points is None or n <= max_points or n == 0:
+        return np.arange(n), values
+
+    if method == "lttb":
+        if max_points < 3:
+            # 点数不足以分出中间区间时只保留首尾两点
+            rows = np.array([0, n - 1][:max_points], dtype=np.int64)
+        else:
+            rows = _lttb(values_2d, max_points)
+        out = values_2d[rows]
+    elif method == "minmax":
+        rows, out = _minmax(values_2d, max(max_points // 2, 1))
+    elif method == "mean":
+        rows, out = _mean(values_2d, max_points)
+    else:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    return rows, out[:, 0] if one_dimensional else out
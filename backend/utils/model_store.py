@@ -0,0 +1,451 @@
+import asyncio
+import copy
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from swmm_api import SwmmInput
+from swmm_api.input_file.sections.link import Conduit
+
+from config import SwmmConfig
+from utils.logger import swmm_logger
+from utils.swmm_constant import SWMM_FILE_INP_PATH, ENCODING
+from utils.topology import TopologyIndex
+
+
+@dataclass
+class _ModelEntry:
+    """单个 INP 文件的缓存条目"""
+
+    model: SwmmInput
+    stat_key: Tuple[int, int]  # (mtime_ns, size)
+    digest: str  # 文件内容 sha1
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0  # 实际写盘次数
+    version: int = 1  # 模型版本号,每次修改或从磁盘重新解析后递增
+    dirty: bool = False  # 内存中的模型是否有尚未写盘的修改
+    flush_task: Optional[asyncio.Task] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    topology: Optional[TopologyIndex] = None  # 渠道拓扑索引,按需构建
+    topology_used: bool = False  # 本次 mutate() 中是否取用(并维护)了拓扑索引
+
+
+def _decode(raw: bytes) -> str:
+    """按项目编码解码 INP 内容,失败时回退到 utf-8(与 swmm_api 的读取行为一致)"""
+    for encoding in (ENCODING, "utf-8"):
+        try:
+            return raw.decode(encoding).replace("\r", "")
+        except UnicodeDecodeError:
+            continue
+    return raw.decode(ENCODING, errors="replace").replace("\r", "")
+
+
+def _stat_key(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    解析 If-Match 请求头中的模型版本号
+
+    支持 `12`、`"12"`、`W/"12"` 三种写法,`*` 或未传时表示不校验版本
+    """
+    if if_match is None:
+        return None
+    value = if_match.strip()
+    if value in ("", "*"):
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"请求头 If-Match 格式错误 [ {if_match} ],应为模型版本号",
+        )
+
+
+# 当前请求(任务)在 read() / mutate() 中看到的模型版本号,在持有锁时记录,
+# 返回结果时使用该版本号,避免锁释放后其他修改已递增版本号
+_seen_version: ContextVar[Optional[int]] = ContextVar("seen_version", default=None)
+
+
+class _AsyncRWLock:
+    """
+    asyncio 读写锁(写优先)
+
+    - 多个读操作可以同时持有锁
+    - 写操作独占,有写操作在等待时新的读操作需排队,避免写操作被饿死
+    """
+
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._cond:
+            await self._cond.wait_for(
+                lambda: not self._writer and self._waiting_writers == 0
+            )
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._cond:
+            self._waiting_writers += 1
+            try:
+                await self._cond.wait_for(
+                    lambda: not self._writer and self._readers == 0
+                )
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class ModelStore:
+    """
+    进程内共享的 SwmmInput 模型缓存
+
+    - 每个 INP 文件只解析一次,之后直接把解析好的模型交给调用方
+    - 每次获取时先比较文件的 mtime/size,变化时再比较内容 hash,
+      只有内容真正变化才重新解析
+    - 返回的是共享对象,接口中读取通过 read(),修改必须通过 mutate(),
+      二者由每个模型独立的读写锁协调,读操作可并发,写操作独占
+    - mutate() 直接修改缓存中的模型,写盘在合并窗口结束后统一进行
+      (先写临时文件再原子替换),计算前需调用 flush() 保证文件是最新的
+    - 每次修改后模型版本号递增,客户端可通过 If-Match 请求头携带版本号
+      进行乐观并发控制,版本不一致时返回 412,由客户端刷新后重试
+    - topology() 提供按模型缓存的渠道拓扑索引,在 mutate() 中取用索引的接口负责增量维护;
+      没有取用索引的修改无法确定是否改动了渠道,退出时丢弃索引,下次使用时重建
+    """
+
+    _entries: Dict[str, _ModelEntry] = {}
+    _rw_locks: Dict[str, _AsyncRWLock] = {}
+    # 缓存失效时记录最后的版本号,重新解析后继续递增,保证版本号不会回退
+    _retired_versions: Dict[str, int] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path: str = SWMM_FILE_INP_PATH) -> SwmmInput:
+        """获取(必要时重新解析)指定 INP 文件的模型"""
+        key = os.path.abspath(path)
+        with cls._lock:
+            entry = cls._entries.get(key)
+        if entry is None:
+            return cls._load(key)
+
+        with entry.lock:
+            # 有未写盘的修改时,内存中的模型才是最新的,不再比较磁盘文件
+            if entry.dirty:
+                entry.hits += 1
+                return entry.model
+
+            stat_key = _stat_key(key)
+            if stat_key == entry.stat_key:
+                entry.hits += 1
+                return entry.model
+
+            # mtime/size 变化,再比较内容 hash,避免仅 touch 文件就重新解析
+            with open(key, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha1(raw).hexdigest()
+            if digest == entry.digest:
+                entry.stat_key = stat_key
+                entry.hits += 1
+                return entry.model
+
+        return cls._load(key, raw=raw, stat_key=stat_key, digest=digest)
+
+    @classmethod
+    def _load(
+        cls,
+        key: str,
+        raw: Optional[bytes] = None,
+        stat_key: Optional[Tuple[int, int]] = None,
+        digest: Optional[str] = None,
+    ) -> SwmmInput:
+        if raw is None:
+            stat_key = _stat_key(key)
+            with open(key, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha1(raw).hexdigest()
+
+        # 直接解析已读取的内容,保证 hash 与解析结果对应同一份文件内容
+        model = SwmmInput.read_text(_decode(raw))
+        model._default_encoding = ENCODING
+
+        with cls._lock:
+            old = cls._entries.get(key)
+            entry = _ModelEntry(model=model, stat_key=stat_key, digest=digest)
+            if old is not None:
+                entry.hits = old.hits
+                entry.misses = old.misses
+                entry.writes = old.writes
+                # 文件被外部修改后重新解析,视为新版本
+                entry.version = old.version + 1
+            else:
+                entry.version = cls._retired_versions.pop(key, 0) + 1
+            entry.misses += 1
+            cls._entries[key] = entry
+
+        swmm_logger.info(f"INP 模型已(重新)解析: {key} (sha1={digest[:8]})")
+        return model
+
+    @classmethod
+    def _rw_lock(cls, key: str) -> _AsyncRWLock:
+        # 读写锁独立于缓存条目保存,模型重新解析或缓存失效后仍是同一把锁
+        with cls._lock:
+            lock = cls._rw_locks.get(key)
+            if lock is None:
+                lock = cls._rw_locks[key] = _AsyncRWLock()
+            return lock
+
+    @classmethod
+    @asynccontextmanager
+    async def read(cls, path: str = SWMM_FILE_INP_PATH):
+        """只读访问模型的上下文,持有读锁期间模型不会被修改"""
+        async with cls._rw_lock(os.path.abspath(path)).read():
+            model = cls.get(path)
+            _seen_version.set(cls.version(path))
+            yield model
+
+    @classmethod
+    @asynccontextmanager
+    async def mutate(
+        cls,
+        if_match: Optional[str] = None,
+        path: str = SWMM_FILE_INP_PATH,
+        atomic: bool = False,
+    ):
+        """
+        修改模型的上下文,持有写锁,退出时版本号递增并把修改登记为待写盘
+
+        - if_match 为客户端传入的 If-Match 请求头,与当前版本不一致时返回 412
+        - 接口里的 HTTPException 约定在修改前抛出(参数校验),模型保持不变
+        - atomic 为 True 时先保存模型快照,一组修改中途抛出任何异常时
+          恢复快照,已完成的修改全部撤销(用于批量修改)
+        - 非 atomic 时不保存快照(完整复制模型的开销大于一次写盘);出现非 HTTPException
+          的异常时,若模型没有尚未写盘的修改,磁盘文件即为修改前的状态,直接丢弃缓存,
+          下次从磁盘重新解析;否则保留内存中的模型并递增版本号,合并窗口内已确认的修改不会丢失
+        """
+        expected_version = _parse_if_match(if_match)
+        key = os.path.abspath(path)
+        async with cls._rw_lock(key).write():
+            model = cls.get(path)
+            with cls._lock:
+                entry = cls._entries[key]
+            if expected_version is not None and expected_version != entry.version:
+                raise HTTPException(
+                    status_code=412,
+                    detail=f"保存失败,模型已被其他操作修改(当前版本 {entry.version},请求版本 {expected_version}),请刷新后重试",
+                )
+            entry.topology_used = False
+            snapshot = copy.deepcopy(model) if atomic else None
+            unsaved, writes = entry.dirty, entry.writes
+            try:
+                yield model
+            except Exception as e:
+                if snapshot is not None:
+                    if not isinstance(e, HTTPException):
+                        swmm_logger.error(f"修改 INP 模型失败,恢复修改前的模型: {e}")
+                    with entry.lock:
+                        entry.model = snapshot
+                    entry.topology = None
+                    if entry.writes != writes:
+                        # 修改过程中延迟写盘已写入了改到一半的模型,需要重新写入快照
+                        cls.mark_dirty(path)
+                elif isinstance(e, HTTPException):
+                    pass
+                elif unsaved or entry.writes != writes:
+                    # 磁盘上不是修改前的状态,丢弃缓存会丢失已确认的修改,保留内存中的模型
+                    swmm_logger.error(f"修改 INP 模型失败,保留内存中尚未写盘的模型: {e}")
+                    entry.topology = None
+                    entry.version += 1
+                    cls.mark_dirty(path)
+                else:
+                    swmm_logger.error(f"修改 INP 模型失败,丢弃内存中的模型: {e}")
+                    cls.invalidate(path)
+                raise
+            if not entry.topology_used:
+                entry.topology = None
+            entry.version += 1
+            _seen_version.set(entry.version)
+            cls.mark_dirty(path)
+
+    @classmethod
+    def topology(cls, path: str = SWMM_FILE_INP_PATH) -> TopologyIndex:
+        """
+        获取模型的渠道拓扑索引,须在 read() / mutate() 上下文中调用
+
+        在 mutate() 中取用索引后,修改渠道或节点名称时必须同步调用索引的
+        add / remove / rename_node 维护索引
+        """
+        with cls._lock:
+            entry = cls._entries[os.path.abspath(path)]
+        if entry.topology is None:
+            entry.topology = TopologyIndex.from_conduits(
+                entry.model.check_for_section(Conduit)
+            )
+        entry.topology_used = True
+        return entry.topology
+
+    @classmethod
+    def version(cls, path: str = SWMM_FILE_INP_PATH) -> Optional[int]:
+        """返回当前缓存模型的版本号,模型尚未加载时返回 None"""
+        with cls._lock:
+            entry = cls._entries.get(os.path.abspath(path))
+        return entry.version if entry is not None else None
+
+    @classmethod
+    def seen_version(cls) -> Optional[int]:
+        """
+        当前请求最近一次 read() / mutate() 时模型的版本号(持有锁时记录)
+
+        mutate() 退出后为本次修改产生的版本号;当前请求没有访问模型时返回最新版本号
+        """
+        version = _seen_version.get()
+        return version if version is not None else cls.version()
+
+    @classmethod
+    def mark_dirty(cls, path: str = SWMM_FILE_INP_PATH) -> None:
+        """登记模型有未写盘的修改,按配置立即写盘或在合并窗口结束后写盘"""
+        key = os.path.abspath(path)
+        with cls._lock:
+            entry = cls._entries.get(key)
+        if entry is None:
+            return
+        entry.dirty = True
+
+        delay = SwmmConfig.INP_WRITE_DELAY_MS / 1000
+        if delay <= 0:
+            cls._write(key, entry)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中(如脚本直接调用),无法延迟,直接写盘
+            cls._write(key, entry)
+            return
+        # 窗口内已有待执行的写盘任务,本次修改随其一起写入
+        if entry.flush_task is None or entry.flush_task.done():
+            entry.flush_task = loop.create_task(cls._delayed_flush(key, delay))
+
+    @classmethod
+    async def _delayed_flush(cls, key: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        with cls._lock:
+            entry = cls._entries.get(key)
+        if entry is None or not entry.dirty:
+            return
+        try:
+            cls._write(key, entry)
+        except Exception as e:
+            # 保留 dirty 标记,下次修改或 flush() 时重试
+            swmm_logger.error(f"INP 文件延迟写入失败: {key}: {e}")
+
+    @classmethod
+    async def flush(cls, path: Optional[str] = None) -> None:
+        """立即写入尚未写盘的修改,path 为 None 时写入全部模型"""
+        with cls._lock:
+            if path is None:
+                items = list(cls._entries.items())
+            else:
+                key = os.path.abspath(path)
+                items = [(key, cls._entries[key])] if key in cls._entries else []
+
+        current = asyncio.current_task()
+        for key, entry in items:
+            if entry.flush_task is not None and entry.flush_task is not current:
+                entry.flush_task.cancel()
+                entry.flush_task = None
+            if entry.dirty:
+                cls._write(key, entry)
+
+    @classmethod
+    def _write(cls, key: str, entry: _ModelEntry) -> None:
+        """先写到同目录下的临时文件,再原子替换正式文件"""
+        with entry.lock:
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=".", suffix=".inp.tmp", dir=os.path.dirname(key)
+            )
+            os.close(fd)
+            try:
+                entry.model.write_file(tmp_path, encoding=ENCODING)
+                with open(tmp_path, "rb") as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+                os.replace(tmp_path, key)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            # 记录刚写入文件的指纹,避免下一次读取时把自己的写入当作外部修改重新解析
+            entry.stat_key = _stat_key(key)
+            entry.digest = digest
+            entry.dirty = False
+            entry.writes += 1
+        swmm_logger.debug(f"INP 文件已写入: {key} (sha1={digest[:8]})")
+
+    @classmethod
+    def invalidate(cls, path: Optional[str] = None) -> None:
+        """丢弃缓存,path 为 None 时清空全部"""
+        with cls._lock:
+            if path is None:
+                entries = list(cls._entries.items())
+                cls._entries.clear()
+            else:
+                key = os.path.abspath(path)
+                entry = cls._entries.pop(key, None)
+                entries = [(key, entry)] if entry is not None else []
+            for key, entry in entries:
+                cls._retired_versions[key] = entry.version
+        for _, entry in entries:
+            if entry.flush_task is not None:
+                entry.flush_task.cancel()
+
+    @classmethod
+    def stats(cls) -> Dict[str, dict]:
+        """返回各 INP 文件的缓存命中统计"""
+        with cls._lock:
+            return {
+                key: {
+                    "hits": entry.hits,
+                    "misses": entry.misses,
+                    "writes": entry.writes,
+                    "dirty": entry.dirty,
+                    "version": entry.version,
+                    "topology_links": (
+                        len(entry.topology) if entry.topology is not None else None
+                    ),
+                    "sha1": entry.digest,
+                    "mtime_ns": entry.stat_key[0],
+                    "size": entry.stat_key[1],
+                }
+                for key, entry in cls._entries.items()
+            }
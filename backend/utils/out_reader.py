@@ -0,0 +1,133 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from swmm_api.output_file.definitions import OBJECTS
+from swmm_api.output_file.extract import SwmmOutExtract
+
+from utils.swmm_constant import ENCODING
+
+
+class OutMemmapReader:
+    """
+    基于内存映射的 SWMM 结果文件(.out)读取器
+
+    .out 文件的结果区由 n_periods 条定长记录组成,每条记录为
+    1 个 float64 的时间 + 全部 (对象类型, 对象, 变量) 的 float32 结果值,
+    列顺序依次为 子汇水区/节点/链接/污染物/系统,同一对象类型内按 对象 -> 变量 排列。
+
+    读取器只借助 swmm_api 解析文件头,由文件头计算各列的偏移量,
+    结果区通过 np.memmap 映射,按需返回单个序列或单个时间步的零拷贝视图,
+    不会把整个文件读入内存。
+    """
+
+    def __init__(self, path: str, encoding: str = ENCODING):
+        header = SwmmOutExtract(path, encoding=encoding)
+        try:
+            self.labels: Dict[str, List[str]] = header.labels
+            self.variables: Dict[str, List[str]] = header.variables
+            self.start_date = header.start_date
+            self.report_interval = header.report_interval
+            pos_start_output = header._pos_start_output
+            n_periods = header.n_periods
+        finally:
+            header.fp.close()
+
+        # 每种对象类型在一条记录中的起始列
+        self._kind_offsets: Dict[str, int] = {}
+        offset = 0
+        for kind in OBJECTS.LIST_:
+            self._kind_offsets[kind] = offset
+            offset += len(self.labels[kind]) * len(self.variables[kind])
+        self.number_columns = offset
+
+        self._record_dtype = np.dtype(
+            [("datetime", "<f8"), ("values", "<f4", (self.number_columns,))]
+        )
+        # 计算未正常结束时文件头中的时段数可能偏大,以实际文件长度为准
+        record_size = self._record_dtype.itemsize
+        available = (os.path.getsize(path) - pos_start_output) // record_size
+        self.n_periods = int(max(min(n_periods, available), 0))
+
+        self.names: Dict[str, Dict[str, int]] = {
+            kind: {label: i for i, label in enumerate(labels)}
+            for kind, labels in self.labels.items()
+        }
+        self._variable_index: Dict[str, Dict[str, int]] = {
+            kind: {variable: i for i, variable in enumerate(variables)}
+            for kind, variables in self.variables.items()
+        }
+
+        if self.n_periods > 0:
+            records = np.memmap(
+                path,
+                dtype=self._record_dtype,
+                mode="r",
+                offset=pos_start_output,
+                shape=(self.n_periods,),
+            )
+            self._mmap = records
+            # (n_periods, number_columns) 的 float32 视图,不复制数据
+            self.values = records["values"]
+        else:
+            self._mmap = None
+            self.values = np.empty((0, self.number_columns), dtype=np.float32)
+
+        self.index = pd.date_range(
+            self.start_date, periods=self.n_periods, freq=self.report_interval
+        )
+
+    def has(self, kind: str, name: str, variable: str) -> bool:
+        """判断 (对象类型, 对象, 变量) 是否存在"""
+        if name not in self.names.get(kind, {}):
+            return False
+        return variable in self._variable_index.get(kind, {})
+
+    def column(self, kind: str, name: str, variable: str) -> int:
+        """计算 (对象类型, 对象, 变量) 在记录中的列号"""
+        n_variables = len(self.variables[kind])
+        return (
+            self._kind_offsets[kind]
+            + self.names[kind][name] * n_variables
+            + self._variable_index[kind][variable]
+        )
+
+    def series_values(self, kind: str, name: str, variable: str) -> np.ndarray:
+        """单个对象单个变量在全部时间步的结果,返回零拷贝的一维视图"""
+        return self.values[:, self.column(kind, name, variable)]
+
+    def series(self, kind: str, name: str, variable: str) -> pd.Series:
+        """单个对象单个变量的时间序列,索引为时间"""
+        return pd.Series(
+            self.series_values(kind, name, variable),
+            index=self.index,
+            name=f"{kind}/{name}/{variable}",
+            copy=False,
+        )
+
+    def kind_values(self, kind: str, variable: str) -> np.ndarray:
+        """某类对象的某个变量在全部时间步的结果,返回 (时间步, 对象) 的零拷贝二维视图"""
+        n_variables = len(self.variables[kind])
+        start = self._kind_offsets[kind] + self._variable_index[kind][variable]
+        stop = self._kind_offsets[kind] + len(self.labels[kind]) * n_variables
+        return self.values[:, start:stop:n_variables]
+
+    def step_values(self, kind: str, variable: str, step: int) -> np.ndarray:
+        """某个时间步某类对象全部对象的某个变量,返回零拷贝的一维视图"""
+        return self.kind_values(kind, variable)[step]
+
+    def step_at(self, time) -> int:
+        """不晚于 time 的最后一个时间步,超出模拟时间范围时取首/末时间步"""
+        step = int(self.index.searchsorted(time, side="right")) - 1
+        return min(max(step, 0), max(self.n_periods - 1, 0))
+
+    def close(self) -> None:
+        """
+        释放对内存映射的引用
+
+        已返回给调用方的视图仍引用同一映射,若直接关闭映射再访问这些视图会导致进程崩溃,
+        因此这里只丢弃引用,映射在最后一个视图被回收后由 numpy 自动释放
+        """
+        self._mmap = None
+        self.values = np.empty((0, self.number_columns), dtype=np.float32)
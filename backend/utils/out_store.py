@@ -0,0 +1,129 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from utils.logger import swmm_logger
+from utils.out_reader import OutMemmapReader
+from utils.out_summary import read_summary, write_summary
+from utils.swmm_constant import SWMM_FILE_OUT_PATH
+
+# 查询实体类型时的匹配顺序,与原先先查节点再查链接的行为保持一致
+ENTITY_KINDS = ("node", "link", "subcatchment")
+
+
+@dataclass
+class _OutEntry:
+    """单个 .out 文件的缓存条目"""
+
+    reader: OutMemmapReader
+    stat_key: Tuple[int, int]  # (mtime_ns, size)
+    path: str
+    hits: int = 0
+    misses: int = 0
+    _summary: Optional[dict] = field(default=None, repr=False)
+    _summary_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def names(self) -> Dict[str, Dict[str, int]]:
+        """实体类型 -> {实体名称: 在该类型中的序号}"""
+        return self.reader.names
+
+    def kind_of(self, name: str) -> Optional[str]:
+        """返回实体名称所属的类型,都不属于时返回 None"""
+        for kind in ENTITY_KINDS:
+            if name in self.names.get(kind, {}):
+                return kind
+        return None
+
+    def series(self, kind: str, name: str, variable: str) -> pd.Series:
+        """获取单个实体单个变量的时间序列,实体或变量不存在时返回空序列"""
+        if not self.reader.has(kind, name, variable):
+            return pd.Series(dtype=float)
+        return self.reader.series(kind, name, variable)
+
+    def summary(self) -> dict:
+        """
+        结果统计(见 out_summary.SUMMARY_FIELDS)
+
+        优先读取计算完成时保存在 .out 旁边的统计文件,不存在或已过期时重新计算并保存,
+        同一个结果文件只计算一次。统计量较大时可能耗时,异步接口中应放到线程中调用
+        """
+        with self._summary_lock:
+            if self._summary is None:
+                self._summary = read_summary(self.path) or write_summary(
+                    self.path, self.reader
+                )
+            return self._summary
+
+
+def _stat_key(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class OutStore:
+    """
+    进程内共享的 SWMM 计算结果(.out)缓存
+
+    - 每次计算后的 .out 文件只打开、解析一次文件头,按文件 mtime/size 判断是否需要重新打开
+    - 预先建立 实体类型 -> {名称: 序号} 的索引,判断实体类型时无需构造完整的 DataFrame
+    - 结果区通过内存映射读取(见 OutMemmapReader),单个序列或单个时间步直接取零拷贝视图
+    """
+
+    _entries: Dict[str, _OutEntry] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path: str = SWMM_FILE_OUT_PATH) -> _OutEntry:
+        """获取(必要时重新打开)指定 .out 文件的结果,文件不存在时抛出 FileNotFoundError"""
+        key = os.path.abspath(path)
+        stat_key = _stat_key(key)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and entry.stat_key == stat_key:
+                entry.hits += 1
+                return entry
+
+            new_entry = _OutEntry(
+                reader=OutMemmapReader(key), stat_key=stat_key, path=key
+            )
+            if entry is not None:
+                new_entry.hits = entry.hits
+                new_entry.misses = entry.misses
+                entry.reader.close()
+            new_entry.misses += 1
+            cls._entries[key] = new_entry
+
+        swmm_logger.info(f"计算结果文件已(重新)打开: {key}")
+        return new_entry
+
+    @classmethod
+    def invalidate(cls, path: Optional[str] = None) -> None:
+        """丢弃缓存并释放内存映射,path 为 None 时清空全部"""
+        with cls._lock:
+            if path is None:
+                entries = list(cls._entries.values())
+                cls._entries.clear()
+            else:
+                entry = cls._entries.pop(os.path.abspath(path), None)
+                entries = [entry] if entry is not None else []
+        for entry in entries:
+            entry.reader.close()
+
+    @classmethod
+    def stats(cls) -> Dict[str, dict]:
+        """返回各 .out 文件的缓存命中统计"""
+        with cls._lock:
+            return {
+                key: {
+                    "hits": entry.hits,
+                    "misses": entry.misses,
+                    "mtime_ns": entry.stat_key[0],
+                    "size": entry.stat_key[1],
+                    "counts": {kind: len(names) for kind, names in entry.names.items()},
+                }
+                for key, entry in cls._entries.items()
+            }
@@ -0,0 +1,203 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.out_reader import OutMemmapReader
+
+SUMMARY_FORMAT_VERSION = 1
+
+# 各类对象的统计字段及含义(流量类变量的总量 = 流量 x 秒,时长单位为小时)
+SUMMARY_FIELDS: Dict[str, Dict[str, str]] = {
+    "node": {
+        "peak_depth": "最大水深",
+        "peak_depth_time": "最大水深出现时间",
+        "mean_depth": "平均水深",
+        "peak_inflow": "最大总进流量",
+        "inflow_volume": "总进流量体积",
+        "peak_flooding": "最大溢流流量",
+        "flooding_volume": "溢流体积",
+        "flooding_hours": "溢流时长",
+    },
+    "link": {
+        "peak_flow": "洪峰流量(绝对值最大的流量)",
+        "peak_flow_time": "洪峰出现时间",
+        "mean_flow": "平均流量",
+        "flow_volume": "过流体积",
+        "peak_velocity": "最大流速",
+        "peak_depth": "最大水深",
+        "peak_capacity": "最大充满度",
+        "surcharge_hours": "满管(充满度 >= 1)时长",
+    },
+    "subcatchment": {
+        "peak_runoff": "最大径流量",
+        "peak_runoff_time": "最大径流出现时间",
+        "mean_runoff": "平均径流量",
+        "runoff_volume": "径流体积",
+        "total_rainfall": "累计降雨量",
+    },
+}
+
+
+def summary_path(out_path: str) -> str:
+    """结果统计文件与 .out 文件放在一起,如 swmm.out -> swmm.summary.json"""
+    return os.path.splitext(out_path)[0] + ".summary.json"
+
+
+def _stat_key(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _round(values: np.ndarray) -> List[float]:
+    return np.round(values.astype("float64"), 3).tolist()
+
+
+def _peak(
+    values: np.ndarray, times: np.ndarray, signed: bool = False
+) -> Tuple[List[float], List[Optional[str]]]:
+    """每列的最大值及出现时间,signed 为 True 时取绝对值最大的值(保留正负号)"""
+    if len(values) == 0:
+        return [None] * values.shape[1], [None] * values.shape[1]
+    data = np.nan_to_num(values.astype("float64"))
+    rows = np.argmax(np.abs(data) if signed else data, axis=0)
+    peaks = data[rows, np.arange(data.shape[1])]
+    return _round(peaks), times[rows].tolist()
+
+
+def _rows(names: List[str], columns: Dict[str, list]) -> List[dict]:
+    return [
+        {"name": name, **{field: column[i] for field, column in columns.items()}}
+        for i, name in enumerate(names)
+    ]
+
+
+def compute_summary(reader: OutMemmapReader) -> dict:
+    """
+    按对象类型一次性计算全部节点、链接、子汇水区的统计指标(见 SUMMARY_FIELDS)
+
+    每个变量直接对 (时间步, 对象) 的内存映射视图做列方向的向量化统计
+    """
+    step = reader.report_interval.total_seconds()
+    hours = step / 3600
+    times = np.asarray(reader.index.strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+    has_steps = reader.n_periods > 0
+
+    def values(kind: str, variable: str) -> np.ndarray:
+        return reader.kind_values(kind, variable)
+
+    def mean(data: np.ndarray) -> List[float]:
+        if not has_steps:
+            return [None] * data.shape[1]
+        return _round(data.mean(axis=0, dtype="float64"))
+
+    def total(data: np.ndarray, scale: float) -> List[float]:
+        return _round(data.sum(axis=0, dtype="float64") * scale)
+
+    def duration(mask: np.ndarray) -> List[float]:
+        return _round(np.count_nonzero(mask, axis=0) * hours)
+
+    summary = {}
+
+    depth = values("node", "depth")
+    inflow = values("node", "total_inflow")
+    flooding = values("node", "flooding")
+    peak_depth, peak_depth_time = _peak(depth, times)
+    summary["node"] = _rows(
+        reader.labels["node"],
+        {
+            "peak_depth": peak_depth,
+            "peak_depth_time": peak_depth_time,
+            "mean_depth": mean(depth),
+            "peak_inflow": _peak(inflow, times)[0],
+            "inflow_volume": total(inflow, step),
+            "peak_flooding": _peak(flooding, times)[0],
+            "flooding_volume": total(flooding, step),
+            "flooding_hours": duration(flooding > 0),
+        },
+    )
+
+    flow = values("link", "flow")
+    capacity = values("link", "capacity")
+    peak_flow, peak_flow_time = _peak(flow, times, signed=True)
+    summary["link"] = _rows(
+        reader.labels["link"],
+        {
+            "peak_flow": peak_flow,
+            "peak_flow_time": peak_flow_time,
+            "mean_flow": mean(flow),
+            "flow_volume": total(flow, step),
+            "peak_velocity": _peak(values("link", "velocity"), times, signed=True)[0],
+            "peak_depth": _peak(values("link", "depth"), times)[0],
+            "peak_capacity": _peak(capacity, times)[0],
+            "surcharge_hours": duration(capacity >= 1),
+        },
+    )
+
+    runoff = values("subcatchment", "runoff")
+    peak_runoff, peak_runoff_time = _peak(runoff, times)
+    summary["subcatchment"] = _rows(
+        reader.labels["subcatchment"],
+        {
+            "peak_runoff": peak_runoff,
+            "peak_runoff_time": peak_runoff_time,
+            "mean_runoff": mean(runoff),
+            "runoff_volume": total(runoff, step),
+            # 降雨量为强度(每小时),乘以小时数得到累计降雨深度
+            "total_rainfall": total(values("subcatchment", "rainfall"), hours),
+        },
+    )
+
+    # 链接 flow / depth / velocity 在全部时间步上的极值,供结果展示的色带使用
+    summary["link_extremes"] = {
+        variable: (
+            {
+                "max": float(np.nanmax(values("link", variable))),
+                "min": float(np.nanmin(values("link", variable))),
+            }
+            if has_steps and reader.labels["link"]
+            else {"max": None, "min": None}
+        )
+        for variable in ("flow", "depth", "velocity")
+    }
+    return summary
+
+
+def write_summary(out_path: str, reader: Optional[OutMemmapReader] = None) -> dict:
+    """计算 .out 文件的统计结果并写入 summary_path(out_path),返回统计结果"""
+    own_reader = reader is None
+    reader = reader or OutMemmapReader(out_path)
+    try:
+        summary = compute_summary(reader)
+    finally:
+        if own_reader:
+            reader.close()
+    document = {
+        "version": SUMMARY_FORMAT_VERSION,
+        "out_stat": list(_stat_key(out_path)),
+        "summary": summary,
+    }
+    path = summary_path(out_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return summary
+
+
+def read_summary(out_path: str) -> Optional[dict]:
+    """读取已保存的统计结果,文件不存在或与当前 .out 文件不匹配时返回 None"""
+    path = summary_path(out_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if document.get("version") != SUMMARY_FORMAT_VERSION:
+        return None
+    if tuple(document.get("out_stat", ())) != _stat_key(out_path):
+        return None
+    return document["summary"]
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import SwmmConfig
+from utils.logger import swmm_logger
+
+# 磁盘缓存目录,每个结果一个 JSON 文件
+RIVER_RESULT_CACHE_DIR = Path("static/river_network/results")
+# 结果缓存版本,处理逻辑或结果结构变化时递增,旧的缓存键不再命中
+RIVER_RESULT_CACHE_VERSION = 1
+
+
+def result_cache_key(kind: str, params: dict, source: Optional[str] = None) -> str:
+    """
+    按处理类型、请求参数和数据源指纹计算缓存键(内容寻址)
+
+    参数以排序键的 JSON 序列化后取 SHA-256,键形如 clip-<数据源指纹>-<摘要>;
+    数据源指纹为空(结果只取决于请求参数)时为 break-<摘要>
+    """
+    raw = json.dumps(
+        {"version": RIVER_RESULT_CACHE_VERSION, "kind": kind, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    return f"{kind}-{source}-{digest}" if source else f"{kind}-{digest}"
+
+
+class RiverResultCache:
+    """
+    水系裁剪/打断结果缓存
+
+    - 内存中保留最近使用的 RIVER_RESULT_CACHE_SIZE 个结果(LRU),
+      磁盘上保留最近使用的 RIVER_RESULT_CACHE_DISK 个结果(按文件修改时间淘汰),
+      内存未命中时读取磁盘,服务重启后仍可命中
+    - 缓存键中带有水系图层指纹,图层文件变化时旧结果不再命中,
+      并在首次见到新指纹时清理该类结果的旧条目(见 drop_stale)
+    - 磁盘读写在线程中进行,不阻塞事件循环
+    """
+
+    _memory: "OrderedDict[str, dict]" = OrderedDict()
+    _sources: Dict[str, str] = {}  # 处理类型 -> 最近一次使用的数据源指纹
+    _hits: int = 0
+    _misses: int = 0
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return SwmmConfig.RIVER_RESULT_CACHE_SIZE > 0
+
+    @classmethod
+    async def get(cls, key: str) -> Optional[dict]:
+        """获取缓存结果,未命中时返回 None"""
+        if not cls.enabled():
+            return None
+        result = cls._memory.get(key)
+        if result is None and SwmmConfig.RIVER_RESULT_CACHE_DISK > 0:
+            result = await asyncio.to_thread(cls._read_disk, key)
+            if result is not None:
+                cls._remember(key, result)
+        if result is None:
+            cls._misses += 1
+            return None
+        cls._memory.move_to_end(key)
+        cls._hits += 1
+        swmm_logger.info(f"水系结果缓存命中: {key[:40]}")
+        return result
+
+    @classmethod
+    async def put(cls, key: str, result: dict) -> None:
+        """写入缓存结果,磁盘写入失败时只记录日志"""
+        if not cls.enabled():
+            return
+        cls._remember(key, result)
+        if SwmmConfig.RIVER_RESULT_CACHE_DISK <= 0:
+            return
+        try:
+            await asyncio.to_thread(cls._write_disk, key, result)
+        except Exception as e:
+            swmm_logger.error(f"水系结果缓存写入失败: {key[:40]}: {e}")
+
+    @classmethod
+    def _remember(cls, key: str, result: dict) -> None:
+        cls._memory[key] = result
+        cls._memory.move_to_end(key)
+        while len(cls._memory) > SwmmConfig.RIVER_RESULT_CACHE_SIZE:
+            cls._memory.popitem(last=False)
+
+    @classmethod
+    async def drop_stale(cls, kind: str, source: str) -> None:
+        """数据源指纹变化时(水系文件被替换),丢弃该类处理基于旧数据源的缓存结果"""
+        previous = cls._sources.get(kind)
+        if previous == source:
+            return
+        cls._sources[kind] = source
+        # 服务启动后首次使用时也清理一次磁盘,去掉上次运行时遗留的旧数据源结果
+        current = f"{kind}-{source}-"
+        for key in [
+            key
+            for key in cls._memory
+            if key.startswith(f"{kind}-") and not key.startswith(current)
+        ]:
+            del cls._memory[key]
+        if SwmmConfig.RIVER_RESULT_CACHE_DISK > 0:
+            await asyncio.to_thread(cls._drop_disk, kind, source)
+        if previous is not None:
+            swmm_logger.info(f"水系数据已变化,清理旧的 {kind} 结果缓存")
+
+    @staticmethod
+    def _path(key: str) -> Path:
+        return RIVER_RESULT_CACHE_DIR / f"{key}.json"
+
+    @classmethod
+    def _read_disk(cls, key: str) -> Optional[dict]:
+        path = cls._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+            # 更新修改时间,磁盘缓存按最近使用时间淘汰
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            swmm_logger.warning(f"水系结果缓存读取失败,忽略: {path}: {e}")
+            return None
+        return result
+
+    @classmethod
+    def _write_disk(cls, key: str, result: dict) -> None:
+        RIVER_RESULT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = cls._path(key)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+        # 超出数量时删除最久未使用的结果
+        files = sorted(
+            RIVER_RESULT_CACHE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime_ns
+        )
+        for stale in files[: max(len(files) - SwmmConfig.RIVER_RESULT_CACHE_DISK, 0)]:
+            stale.unlink(missing_ok=True)
+
+    @staticmethod
+    def _drop_disk(kind: str, source: str) -> None:
+        if not RIVER_RESULT_CACHE_DIR.exists():
+            return
+        current = f"{kind}-{source}-"
+        for path in RIVER_RESULT_CACHE_DIR.glob(f"{kind}-*.json"):
+            if not path.name.startswith(current):
+                path.unlink(missing_ok=True)
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "hits": cls._hits,
+            "misses": cls._misses,
+            "memory_entries": len(cls._memory),
+        }
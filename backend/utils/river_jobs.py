@@ -0,0 +1,356 @@
+import asyncio
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from config import SwmmConfig
+from schemas.river import RiverJobModel, RiverJobStatus
+from utils.logger import swmm_logger
+from utils.river_layer import RiverLayer
+
+# 子进程以 spawn 启动,不从多线程的服务进程 fork(避免继承其他线程持有的锁),
+# 水系图层由 _init_worker 在子进程中读取
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class RiverJobCancelled(Exception):
+    """任务在检查点发现已被取消或已超时"""
+
+
+class RiverJobError(Exception):
+    """
+    任务失败,由子进程中的 HTTPException 转换而来
+
+    HTTPException 以关键字参数构造,无法在进程间传递(反序列化失败会导致进程池不可用)
+    """
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class CancelToken:
+    """
+    传给进程池中任务的取消标记
+
+    任务在各处理阶段之间调用 check(),任务被取消或超过截止时间时抛出 RiverJobCancelled。
+    截止时间在子进程中直接判断;取消标记为 multiprocessing.Manager 的 Event,
+    查询需要进程间通信,每 _POLL_INTERVAL 秒最多查询一次,循环中也可以频繁调用 check()
+    """
+
+    _POLL_INTERVAL = 0.2
+
+    def __init__(self, event, deadline: float):
+        self.event = event
+        self.deadline = deadline  # time.time() 时间戳
+        self._next_poll = 0.0
+
+    def check(self) -> None:
+        now = time.time()
+        if now > self.deadline:
+            raise RiverJobCancelled("任务超时")
+        if now >= self._next_poll:
+            self._next_poll = now + self._POLL_INTERVAL
+            if self.event.is_set():
+                raise RiverJobCancelled("任务已取消")
+
+
+def _init_worker() -> None:
+    # 子进程预先读取水系图层(有 GeoParquet 缓存时读取很快),任务中直接使用
+    RiverLayer.load()
+
+
+def _execute(fn: Callable, args: tuple, token: CancelToken):
+    """在子进程中执行任务,fn 的最后一个参数为取消检查函数"""
+    token.check()
+    try:
+        return fn(*args, token.check)
+    except HTTPException as e:
+        raise RiverJobError(e.status_code, e.detail) from None
+
+
+class RiverJobManager:
+    """
+    水系裁剪/打断任务管理
+
+    - 任务在进程池中执行,不阻塞事件循环,同时执行的任务数由 RIVER_MAX_WORKERS 控制
+    - 每个任务从提交起有 RIVER_JOB_TIMEOUT 秒的期限,超时或被取消时立即标记为 cancelled,
+      等待结果的请求随即返回;子进程在下一个检查点退出,退出前仍占用并发名额
+    - 同步请求的客户端断开连接时取消对应任务;后台任务通过任务ID轮询结果
+    """
+
+    _jobs: Dict[str, RiverJobModel] = {}
+    _tasks: Dict[str, asyncio.Task] = {}
+    _done: Dict[str, asyncio.Event] = {}  # 任务ID -> 任务已结束(成功/失败/取消)
+    _cancel_events: Dict[str, object] = {}  # 任务ID -> 传给子进程的取消标记
+    _executor: Optional[ProcessPoolExecutor] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _mp_manager = None  # 跨进程传递取消标记用的 multiprocessing.Manager,按需启动
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=SwmmConfig.RIVER_MAX_WORKERS,
+                mp_context=MP_CONTEXT,
+                initializer=_init_worker,
+            )
+        return cls._executor
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        # 由信号量控制并发,任务真正开始处理时才标记为 running,而不是在进程池中排队
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(SwmmConfig.RIVER_MAX_WORKERS)
+        return cls._semaphore
+
+    @classmethod
+    def _get_mp_manager(cls):
+        if cls._mp_manager is None:
+            cls._mp_manager = MP_CONTEXT.Manager()
+        return cls._mp_manager
+
+    @classmethod
+    def submit(
+        cls,
+        kind: str,
+        fn: Callable,
+        *args,
+        on_success: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ) -> RiverJobModel:
+        """
+        提交任务,立即返回任务信息
+
+        fn 必须是模块级函数(需要传给子进程),调用方式为 fn(*args, check),
+        处理过程中应在各阶段之间调用 check() 以便及时响应取消和超时;
+        on_success 在任务成功后以结果调用(如写入结果缓存)
+        """
+        job_id = uuid.uuid4().hex[:12]
+        timeout = SwmmConfig.RIVER_JOB_TIMEOUT
+        cancel_event = cls._get_mp_manager().Event()
+        token = CancelToken(cancel_event, time.time() + timeout)
+
+        job = RiverJobModel(
+            id=job_id, kind=kind, created_at=datetime.now(), timeout=timeout
+        )
+        cls._jobs[job_id] = job
+        cls._done[job_id] = asyncio.Event()
+        cls._cancel_events[job_id] = cancel_event
+        cls._tasks[job_id] = asyncio.create_task(
+            cls._run(job, fn, args, token, on_success)
+        )
+        cls._prune()
+        swmm_logger.info(f"水系任务已提交: {job_id} ({kind})")
+        return job
+
+    @classmethod
+    def completed(cls, kind: str, result: dict) -> RiverJobModel:
+        """登记一个已成功的任务(结果来自缓存,无需执行),供后台请求按任务ID获取结果"""
+        now = datetime.now()
+        job = RiverJobModel(
+            id=uuid.uuid4().hex[:12],
+            kind=kind,
+            status=RiverJobStatus.SUCCESS,
+            created_at=now,
+            started_at=now,
+            finished_at=now,
+            duration=0.0,
+            timeout=SwmmConfig.RIVER_JOB_TIMEOUT,
+            result=result,
+            cached=True,
+        )
+        done = asyncio.Event()
+        done.set()
+        cls._jobs[job.id] = job
+        cls._done[job.id] = done
+        cls._prune()
+        return job
+
+    @classmethod
+    async def _run(
+        cls,
+        job: RiverJobModel,
+        fn: Callable,
+        args: tuple,
+        token: CancelToken,
+        on_success: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ) -> None:
+        semaphore = cls._get_semaphore()
+        try:
+            # 排队等待也计入期限
+            remaining = max(token.deadline - time.time(), 0)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), remaining)
+            except asyncio.TimeoutError:
+                cls.cancel(job.id, timed_out=True)
+                return
+            try:
+                if job.status != RiverJobStatus.PENDING:
+                    return  # 排队时已被取消
+                job.status = RiverJobStatus.RUNNING
+                job.started_at = datetime.now()
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(
+                    cls._get_executor(), _execute, fn, args, token
+                )
+                # 到达期限时先结束任务,但等子进程真正退出后才释放并发名额
+                remaining = max(token.deadline - time.time(), 0)
+                done, _ = await asyncio.wait({future}, timeout=remaining)
+                if not done:
+                    cls.cancel(job.id, timed_out=True)
+                result = await future
+            finally:
+                semaphore.release()
+            cls._finish(job, RiverJobStatus.SUCCESS, result=result)
+            if on_success is not None and job.status == RiverJobStatus.SUCCESS:
+                try:
+                    await on_success(result)
+                except Exception as e:
+                    swmm_logger.error(f"水系任务结果处理失败: {job.id}: {e}")
+        except RiverJobCancelled:
+            cls.cancel(job.id, timed_out=time.time() > token.deadline)
+        except RiverJobError as e:
+            cls._finish(
+                job,
+                RiverJobStatus.FAILED,
+                error=str(e.detail),
+                status_code=e.status_code,
+            )
+        except Exception as e:
+            # 进程池本身出错(如子进程异常退出)
+            cls._finish(
+                job, RiverJobStatus.FAILED, error=f"处理失败: {e}", status_code=500
+            )
+        finally:
+            cls._cancel_events.pop(job.id, None)
+
+    @classmethod
+    def _finish(
+        cls,
+        job: RiverJobModel,
+        status: RiverJobStatus,
+        error: Optional[str] = None,
+        status_code: Optional[int] = None,
+        result: Optional[dict] = None,
+    ) -> None:
+        """结束任务,任务已经结束(如超时后才返回结果)时忽略"""
+        if job.status not in (RiverJobStatus.PENDING, RiverJobStatus.RUNNING):
+            return
+        job.status = status
+        job.error = error
+        job.status_code = status_code
+        job.result = result
+        job.finished_at = datetime.now()
+        if job.started_at is not None:
+            job.duration = round((job.finished_at - job.started_at).total_seconds(), 3)
+        done = cls._done.get(job.id)
+        if done is not None:
+            done.set()
+        if status == RiverJobStatus.SUCCESS:
+            swmm_logger.info(f"水系任务完成: {job.id} ({job.duration}s)")
+        else:
+            swmm_logger.warning(f"水系任务{status.value}: {job.id}: {error}")
+
+    @classmethod
+    def cancel(cls, job_id: str, timed_out: bool = False) -> Optional[RiverJobModel]:
+        """取消任务,返回任务信息;任务不存在时返回 None,已结束的任务不受影响"""
+        job = cls._jobs.get(job_id)
+        if job is None:
+            return None
+        cancel_event = cls._cancel_events.get(job_id)
+        if cancel_event is not None:
+            cancel_event.set()
+        if timed_out:
+            error, status_code = f"处理超时(超过 {job.timeout:g} 秒),任务已取消", 504
+        else:
+            error, status_code = "任务已取消", 409
+        cls._finish(
+            job, RiverJobStatus.CANCELLED, error=error, status_code=status_code
+        )
+        return job
+
+    @classmethod
+    async def wait(
+        cls,
+        job_id: str,
+        timeout: Optional[float] = None,
+        disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> RiverJobModel:
+        """
+        等待任务结束并返回任务信息
+
+        - timeout: 最多等待的秒数,到时任务仍未结束也直接返回(轮询接口使用)
+        - disconnected: 请求的 is_disconnected,同步请求的客户端断开连接时取消任务
+        """
+        job = cls._jobs[job_id]
+        done = cls._done[job_id]
+        end = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not done.is_set():
+                step = 1.0 if end is None else min(1.0, end - time.monotonic())
+                if step <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(done.wait(), step)
+                except asyncio.TimeoutError:
+                    pass
+                if disconnected is not None and await disconnected():
+                    cls.cancel(job_id)
+                    break
+        except asyncio.CancelledError:
+            # 同步请求本身被取消(如服务关闭),任务随之取消
+            if disconnected is not None:
+                cls.cancel(job_id)
+            raise
+        return job
+
+    @staticmethod
+    def raise_for_status(job: RiverJobModel) -> None:
+        """任务失败或被取消时抛出对应的 HTTPException"""
+        if job.status == RiverJobStatus.SUCCESS:
+            return
+        raise HTTPException(status_code=job.status_code or 500, detail=job.error)
+
+    @classmethod
+    def _prune(cls) -> None:
+        """超出保留数量时,清理最早结束的任务"""
+        finished = sorted(
+            (
+                job
+                for job in cls._jobs.values()
+                if job.status not in (RiverJobStatus.PENDING, RiverJobStatus.RUNNING)
+            ),
+            key=lambda job: job.finished_at,
+        )
+        excess = len(finished) - SwmmConfig.RIVER_JOB_HISTORY
+        for job in finished[: max(excess, 0)]:
+            cls._jobs.pop(job.id, None)
+            cls._tasks.pop(job.id, None)
+            cls._done.pop(job.id, None)
+
+    @classmethod
+    def get(cls, job_id: str) -> Optional[RiverJobModel]:
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def list(cls) -> List[RiverJobModel]:
+        """按提交时间倒序返回全部任务"""
+        return list(reversed(cls._jobs.values()))
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭进程池,未开始的任务将被取消"""
+        for job_id in list(cls._cancel_events):
+            cls.cancel(job_id)
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+        if cls._mp_manager is not None:
+            cls._mp_manager.shutdown()
+            cls._mp_manager = None
@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from config import SwmmConfig
+from utils.logger import swmm_logger
+
+try:
+    import pyarrow  # noqa: F401  GeoParquet 读写依赖 pyarrow
+except ImportError:
+    pyarrow = None
+
+# 水系 shapefile 路径
+RIVER_SHAPEFILE_PATH = Path("static/river_network/研究区域水系.shp")
+# 配置 GDAL 环境变量，允许自动恢复或创建缺失的 .shx 文件
+os.environ["SHAPE_RESTORE_SHX"] = "YES"
+
+# 水系数据未声明坐标系时按 WGS84 处理
+DEFAULT_RIVER_CRS = "EPSG:4326"
+
+# GeoParquet 缓存格式版本,缓存内容或元数据结构变化时递增,旧缓存会被重新生成
+RIVER_CACHE_VERSION = 1
+# 精确裁剪时每批处理的要素数,批次之间检查任务是否已取消
+CLIP_CHUNK_SIZE = 2000
+# shapefile 中决定图层内容的组成文件,任一文件变化都需要重新转换
+# (.shx 只是索引,GDAL 读取时可能会重写它,不作为判断依据)
+_SHAPEFILE_PARTS = (".shp", ".dbf", ".prj", ".cpg")
+
+
+@dataclass
+class _RiverEntry:
+    """单个水系文件的缓存条目"""
+
+    gdf: gpd.GeoDataFrame
+    stat_key: Tuple[int, int]  # (mtime_ns, size)
+    hits: int = 0
+    misses: int = 0
+
+
+def _stat_key(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def cache_path(path: Path) -> Path:
+    """水系 GeoParquet 缓存与 shapefile 放在一起,如 水系.shp -> 水系.parquet"""
+    return Path(path).with_suffix(".parquet")
+
+
+def _meta_path(path: Path) -> Path:
+    return Path(path).with_suffix(".parquet.json")
+
+
+def _source_signature(path: Path) -> List[list]:
+    """shapefile 各组成文件的 (后缀, mtime_ns, size)"""
+    signature = []
+    for suffix in _SHAPEFILE_PARTS:
+        part = Path(path).with_suffix(suffix)
+        if part.exists():
+            signature.append([suffix, *_stat_key(str(part))])
+    return signature
+
+
+def layer_fingerprint(path: Path = RIVER_SHAPEFILE_PATH) -> str:
+    """水系图层的指纹(各组成文件 mtime/size 的摘要),任一组成文件变化时随之变化"""
+    raw = json.dumps(_source_signature(path)).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def _read_cache(path: Path) -> Optional[gpd.GeoDataFrame]:
+    """读取与 shapefile 匹配的 GeoParquet 缓存,缓存不存在或已过期时返回 None"""
+    parquet_path, meta_path = cache_path(path), _meta_path(path)
+    if not parquet_path.exists() or not meta_path.exists():
+        return None
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != RIVER_CACHE_VERSION:
+        return None
+    if meta.get("source") != _source_signature(path):
+        return None
+    return gpd.read_parquet(parquet_path)
+
+
+def _read_source(path: Path) -> gpd.GeoDataFrame:
+    gdf = gpd.read_file(path)
+    if gdf.crs is None:
+        gdf = gdf.set_crs(DEFAULT_RIVER_CRS)
+    return gdf
+
+
+def convert_river_layer(
+    path: Path = RIVER_SHAPEFILE_PATH, force: bool = False
+) -> Optional[Path]:
+    """
+    把水系 shapefile 转换为 GeoParquet 缓存,返回缓存文件路径
+
+    - 缓存中带有每个要素的外包框列(GeoParquet bbox covering),元数据文件记录
+      源文件指纹和图层总外包框;源文件未变化且 force 为 False 时不重复转换
+    - 未安装 pyarrow 时返回 None
+    """
+    if pyarrow is None:
+        return None
+    parquet_path = cache_path(path)
+    if not force and _read_cache(path) is not None:
+        return parquet_path
+
+    signature = _source_signature(path)
+    return _write_cache(path, _read_source(path), signature)
+
+
+def _write_cache(path: Path, gdf: gpd.GeoDataFrame, signature: List[list]) -> Path:
+    parquet_path = cache_path(path)
+    tmp_path = parquet_path.with_name(f".{parquet_path.name}.tmp")
+    gdf.to_parquet(tmp_path, write_covering_bbox=True)
+    os.replace(tmp_path, parquet_path)
+
+    meta = {
+        "version": RIVER_CACHE_VERSION,
+        "source": signature,
+        "features": len(gdf),
+        "crs": gdf.crs.to_string() if gdf.crs is not None else None,
+        "bounds": gdf.total_bounds.tolist() if len(gdf) else None,
+    }
+    meta_path = _meta_path(path)
+    tmp_meta_path = meta_path.with_name(f".{meta_path.name}.tmp")
+    with open(tmp_meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_meta_path, meta_path)
+
+    swmm_logger.info(f"水系图层已转换为 GeoParquet: {parquet_path} ({len(gdf)} 个要素)")
+    return parquet_path
+
+
+def read_river_layer(path: Path = RIVER_SHAPEFILE_PATH) -> gpd.GeoDataFrame:
+    """
+    读取水系图层
+
+    启用 RIVER_PARQUET_CACHE 且安装了 pyarrow 时优先读取 GeoParquet 缓存,
+    缓存不存在或源文件已变化时先重新转换;转换失败或未安装 pyarrow 时直接读取 shapefile
+    """
+    if not SwmmConfig.RIVER_PARQUET_CACHE or pyarrow is None:
+        return _read_source(path)
+    try:
+        gdf = _read_cache(path)
+        if gdf is not None:
+            return gdf
+    except Exception as e:
+        swmm_logger.error(f"水系 GeoParquet 缓存读取失败,重新转换: {e}")
+
+    signature = _source_signature(path)
+    gdf = _read_source(path)
+    try:
+        _write_cache(path, gdf, signature)
+    except Exception as e:
+        swmm_logger.error(f"水系 GeoParquet 缓存写入失败,直接使用 shapefile: {e}")
+    return gdf
+
+
+class RiverLayer:
+    """
+    进程内共享的水系图层缓存
+
+    - 服务启动时通过 load() 读取一次水系文件,之后按文件 mtime/size 判断是否需要重新读取,
+      读取时优先使用 GeoParquet 缓存(见 read_river_layer)
+    - 读取后立即构建 STRtree 空间索引(GeoDataFrame.sindex),查询时无需再构建
+    - clip() 先用索引筛选与边界相交的要素,只对这些要素做精确裁剪,
+      耗时取决于结果的大小而不是整个流域水系的大小
+    """
+
+    _entries: Dict[str, _RiverEntry] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, path: Path = RIVER_SHAPEFILE_PATH) -> gpd.GeoDataFrame:
+        """获取(必要时重新读取)水系图层,文件不存在时抛出 FileNotFoundError"""
+        key = os.path.abspath(path)
+        stat_key = _stat_key(key)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and entry.stat_key == stat_key:
+                entry.hits += 1
+                return entry.gdf
+
+            gdf = read_river_layer(Path(key))
+            # 读取时构建空间索引,避免首个查询请求承担建索引的耗时
+            gdf.sindex
+            new_entry = _RiverEntry(gdf=gdf, stat_key=stat_key)
+            if entry is not None:
+                new_entry.hits = entry.hits
+                new_entry.misses = entry.misses
+            new_entry.misses += 1
+            cls._entries[key] = new_entry
+
+        swmm_logger.info(f"水系图层已(重新)读取: {key} ({len(gdf)} 个要素)")
+        return gdf
+
+    @classmethod
+    def load(cls, path: Path = RIVER_SHAPEFILE_PATH) -> bool:
+        """服务启动时预先读取水系图层,文件不存在或读取失败时只记录日志"""
+        if not os.path.exists(path):
+            swmm_logger.warning(f"水系文件不存在,跳过预加载: {path}")
+            return False
+        try:
+            cls.get(path)
+        except Exception as e:
+            swmm_logger.error(f"水系图层预加载失败: {path}: {e}")
+            return False
+        return True
+
+    @classmethod
+    def clip(
+        cls,
+        boundary: BaseGeometry,
+        boundary_crs: str = DEFAULT_RIVER_CRS,
+        path: Path = RIVER_SHAPEFILE_PATH,
+        check: Optional[Callable[[], None]] = None,
+    ) -> gpd.GeoDataFrame:
+        """
+        按边界裁剪水系,返回水系坐标系下的裁剪结果(与 gpd.clip 的结果相同)
+
+        先在图层的 STRtree 索引中查询与边界相交的要素,只对这些候选要素执行精确裁剪;
+        缓存的图层已建好索引,每次裁剪无需重新构建。
+        check 为取消检查函数,在索引查询前后及每批精确裁剪之间调用
+        """
+        checkpoint = check or (lambda: None)
+        river_gdf = cls.get(path)
+        if river_gdf.crs != boundary_crs:
+            boundary = gpd.GeoSeries([boundary], crs=boundary_crs)
+            boundary = boundary.to_crs(river_gdf.crs).iloc[0]
+        checkpoint()
+
+        candidates = river_gdf.iloc[
+            river_gdf.sindex.query(boundary, predicate="intersects")
+        ]
+        checkpoint()
+
+        # 点要素不需要裁剪,其余要素分批与边界求交
+        geoms = np.asarray(candidates.geometry.values)
+        clipped_geoms = geoms.copy()
+        to_clip = np.flatnonzero(
+            shapely.get_type_id(geoms) != shapely.GeometryType.POINT
+        )
+        for start in range(0, len(to_clip), CLIP_CHUNK_SIZE):
+            chunk = to_clip[start : start + CLIP_CHUNK_SIZE]
+            clipped_geoms[chunk] = shapely.intersection(geoms[chunk], boundary)
+            checkpoint()
+
+        clipped = candidates.copy()
+        clipped[candidates.geometry.name] = gpd.GeoSeries(
+            clipped_geoms, index=candidates.index, crs=candidates.crs
+        )
+        return clipped
+
+    @classmethod
+    def invalidate(cls, path: Optional[Path] = None) -> None:
+        """丢弃缓存,path 为 None 时清空全部"""
+        with cls._lock:
+            if path is None:
+                cls._entries.clear()
+            else:
+                cls._entries.pop(os.path.abspath(path), None)
+
+    @classmethod
+    def stats(cls) -> Dict[str, dict]:
+        """返回各水系文件的缓存命中统计"""
+        with cls._lock:
+            return {
+                key: {
+                    "hits": entry.hits,
+                    "misses": entry.misses,
+                    "features": len(entry.gdf),
+                    "mtime_ns": entry.stat_key[0],
+                    "size": entry.stat_key[1],
+                }
+                for key, entry in cls._entries.items()
+            }
+
+
+if __name__ == "__main__":
+    # 手动转换: python -m utils.river_layer [shapefile 路径] [--force]
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    source = Path(args[0]) if args else RIVER_SHAPEFILE_PATH
+    result = convert_river_layer(source, force="--force" in sys.argv)
+    if result is None:
+        print("未安装 pyarrow,无法转换为 GeoParquet")
+        sys.exit(1)
+    print(f"已生成 GeoParquet 缓存: {result}")
@@ -1,5 +1,8 @@
 SWMM_FILE_INP_PATH = "./swmm/swmm.inp"
 SWMM_FILE_OUT_PATH = "./swmm/swmm.out"
+SWMM_FILE_RPT_PATH = "./swmm/swmm.rpt"
+# 后台计算任务的工作目录,每个任务一个子目录
+SWMM_JOBS_DIR = "./swmm/jobs"
 
 
 ENCODING = "GB2312"
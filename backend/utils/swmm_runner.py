@@ -0,0 +1,498 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from swmm_api import swmm5_run
+
+from config import SwmmConfig
+from schemas.calculate import (
+    CalculateJobModel,
+    CalculateJobRequest,
+    CalculateJobStatus,
+)
+from utils.logger import swmm_logger
+from utils.model_store import ModelStore
+from utils.out_reader import OutMemmapReader
+from utils.out_store import OutStore
+from utils.out_summary import summary_path, write_summary
+from utils.swmm_constant import (
+    SWMM_FILE_INP_PATH,
+    SWMM_FILE_OUT_PATH,
+    SWMM_FILE_RPT_PATH,
+    SWMM_JOBS_DIR,
+    ENCODING,
+)
+
+# 进程池与 multiprocessing.Manager 使用 spawn 启动子进程:
+# 服务进程中已有多个线程(to_thread、数据库连接池、延迟写盘等),fork 会复制其持有的锁;
+# 子进程中执行的函数只接收路径与队列,不依赖从主进程继承的状态
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def extract_errors(log_text):
+    # 把错误解读的字符串转成 utf-8 字节,再用 GB2312 解码回来
+    log_text = fix_garbled_text(log_text)
+    # 将日志文本按行拆分
+    lines = log_text.splitlines()
+    # 用于存储提取的错误信息
+    errors = []
+    # 设一个标志位,标记是否已遇到 .inp 行
+    found_inp = False
+    # 遍历每一行
+    for line in lines:
+        # 如果找到 .inp 后缀的行,开始记录所有后续的行
+        if ".inp" in line:
+            found_inp = True
+        # 如果找到 ERROR 相关的行,且已经找到 .inp 行,保留这行及之后的所有行
+        if found_inp and line.startswith("ERROR"):
+            # 使用正则表达式提取单引号之间的内容
+            matches = re.findall(r"'(.*?)'", line)
+            errors.extend(matches)  # 将找到的错误信息添加到列表中
+
+    error_msg = "计算时发生错误:\n"
+    for index, error in enumerate(errors):  # 确保 index 在前面
+        error_msg += f"{index+1}、{error}\n"  # 添加换行符以便每个错误独占一行
+    return error_msg.strip()  # 去除首尾空白字符
+
+
+def fix_garbled_text(text: str) -> str:
+    """
+    修复可能因编码错误导致的乱码字符串
+    原始中文 → 用 gb2312 编码 → 被错误地当成 utf-8 解码 → 出现乱码
+    然后我们想办法通过 latin1 编码 → gb2312 解码 来"复原"。
+    """
+    try:
+        return text.encode("latin1").decode("gb2312")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return text  # 如果失败就原样返回 (一般是utf-8编码,解析也是utf-8)
+
+
+def format_run_error(raw: str) -> str:
+    """整理计算错误信息,无法按 swmm5_run 的日志格式提取时,列出原始信息中的 ERROR 行"""
+    error_msg = extract_errors(raw)
+    if "\n" in error_msg:
+        return error_msg
+    lines = [
+        line.strip()
+        for line in fix_garbled_text(raw).splitlines()
+        if "ERROR" in line and line.strip()
+    ] or [raw.strip()]
+    for index, line in enumerate(lines):
+        error_msg += f"\n{index+1}、{line}"
+    return error_msg
+
+
+def run_swmm_process(
+    inp_path: str, rpt_path: str, out_path: str, working_dir: str
+) -> Optional[str]:
+    """
+    在子进程中运行 SWMM
+
+    成功返回 None,失败返回原始错误信息(SWMM 的异常对象不一定能跨进程传递,这里只传字符串)
+    """
+    try:
+        swmm5_run(inp_path, rpt_path, out_path, working_dir=working_dir)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def run_swmm_stepping_process(
+    inp_path: str,
+    rpt_path: str,
+    out_path: str,
+    working_dir: str,
+    progress_queue,
+    nodes: List[str],
+    links: List[str],
+    interval: float,
+) -> Optional[str]:
+    """
+    在子进程中使用 pyswmm 逐步运行 SWMM,并按最小间隔 interval(秒)向 progress_queue 推送进度
+
+    每条进度为 dict: progress(0-100)、sim_time、nodes(节点水深)、links(链接流量),
+    计算结束时总会推送一条最终进度,之后推送 None。返回值与 run_swmm_process 相同
+    """
+    from pyswmm import Links, Nodes, Simulation
+
+    # 进程池中的子进程会被复用,切换工作目录(保证 INP 中的相对路径可以找到)后须恢复
+    previous_dir = os.getcwd()
+    os.chdir(working_dir)
+    try:
+        with Simulation(inp_path, rpt_path, out_path) as sim:
+            sim_nodes, sim_links = Nodes(sim), Links(sim)
+            selected_nodes = [sim_nodes[name] for name in nodes if name in sim_nodes]
+            selected_links = [sim_links[name] for name in links if name in sim_links]
+
+            def push_progress() -> None:
+                progress_queue.put(
+                    {
+                        "progress": round(sim.percent_complete * 100, 2),
+                        "sim_time": sim.current_time,
+                        "nodes": {node.nodeid: node.depth for node in selected_nodes},
+                        "links": {link.linkid: link.flow for link in selected_links},
+                    }
+                )
+
+            last = 0.0
+            for _ in sim:
+                now = time.monotonic()
+                if now - last < interval:
+                    continue
+                last = now
+                push_progress()
+            # 按间隔推送时最后几步可能被跳过,结束时补发最终进度
+            push_progress()
+    except Exception as e:
+        # pyswmm 的异常信息只有错误编号,具体错误在报告文件中
+        error = str(e)
+        if os.path.exists(rpt_path):
+            with open(rpt_path, encoding=ENCODING, errors="replace") as f:
+                error += "\n" + "\n".join(line for line in f if "ERROR" in line)
+        return error
+    finally:
+        os.chdir(previous_dir)
+        progress_queue.put(None)
+    return None
+
+
+def summarize_out(out_path: str, links: List[str]) -> dict:
+    """
+    汇总计算结果的洪峰流量与溢流量
+
+    - max_flow / max_flow_link: 全部链接中绝对值最大的流量及所在链接
+    - peak_flows: links 中各链接的洪峰流量(绝对值最大的流量,保留正负号)
+    - flooding_volume: 全部节点溢流流量按报告步长累加的总溢流量
+    - flooded_nodes: 发生过溢流的节点数
+    """
+    reader = OutMemmapReader(out_path)
+    try:
+        summary = {"peak_flows": {}}
+        link_names = reader.labels["link"]
+        if reader.n_periods > 0 and link_names:
+            flows = reader.kind_values("link", "flow")
+            rows = np.nanargmax(np.abs(flows), axis=0)
+            peaks = flows[rows, np.arange(len(link_names))].astype("float64")
+            column = int(np.nanargmax(np.abs(peaks)))
+            summary["max_flow"] = round(float(peaks[column]), 3)
+            summary["max_flow_link"] = link_names[column]
+            summary["peak_flows"] = {
+                name: round(float(peaks[reader.names["link"][name]]), 3)
+                for name in links
+                if name in reader.names["link"]
+            }
+        if reader.n_periods > 0 and reader.labels["node"]:
+            flooding = reader.kind_values("node", "flooding").astype("float64")
+            step = reader.report_interval.total_seconds()
+            summary["flooding_volume"] = round(float(np.nansum(flooding)) * step, 3)
+            summary["flooded_nodes"] = int(np.count_nonzero(flooding.max(axis=0) > 0))
+        return summary
+    finally:
+        reader.close()
+
+
+def run_scenario_process(
+    inp_path: str, rpt_path: str, out_path: str, working_dir: str, links: List[str]
+) -> dict:
+    """在子进程中计算单个情景并汇总结果,结果汇总也在子进程中完成"""
+    start = time.perf_counter()
+    error = run_swmm_process(inp_path, rpt_path, out_path, working_dir)
+    result = {"error": error}
+    if error is None:
+        result.update(summarize_out(out_path, links))
+    result["duration"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+class SimulationJobManager:
+    """
+    后台 SWMM 计算任务管理
+
+    - 提交任务时在读锁内把当前内存中的模型写成快照,放到任务自己的工作目录中,
+      计算过程中模型继续修改也不影响本次计算
+    - 计算在进程池中进行,不阻塞事件循环,同时进行的计算数由 SIMULATION_MAX_WORKERS 控制
+    - 计算成功后把结果文件原子替换到 SWMM_FILE_OUT_PATH,供结果查询接口使用;
+      若更晚提交的任务已经发布过结果,则保留在任务目录中,避免旧结果覆盖新结果
+    - 逐步计算(stepping)的任务通过 pyswmm 运行,子进程经 multiprocessing 队列回传进度,
+      由 subscribe() 订阅的客户端(SSE)实时接收
+    """
+
+    _jobs: Dict[str, CalculateJobModel] = {}
+    _tasks: Dict[str, asyncio.Task] = {}
+    _executor: Optional[ProcessPoolExecutor] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _published_at: Optional[datetime] = None  # 当前已发布结果所属任务的提交时间
+    _subscribers: Dict[str, List[asyncio.Queue]] = {}
+    _mp_manager = None  # 跨进程传递进度队列用的 multiprocessing.Manager,按需启动
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=SwmmConfig.SIMULATION_MAX_WORKERS, mp_context=MP_CONTEXT
+            )
+        return cls._executor
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        # 由信号量控制并发,任务真正开始计算时才标记为 running,而不是在进程池中排队
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(SwmmConfig.SIMULATION_MAX_WORKERS)
+        return cls._semaphore
+
+    @classmethod
+    def _get_mp_manager(cls):
+        if cls._mp_manager is None:
+            cls._mp_manager = MP_CONTEXT.Manager()
+        return cls._mp_manager
+
+    @classmethod
+    def _work_dir(cls, job_id: str) -> str:
+        return os.path.abspath(os.path.join(SWMM_JOBS_DIR, job_id))
+
+    @classmethod
+    async def submit(
+        cls, request: Optional[CalculateJobRequest] = None
+    ) -> CalculateJobModel:
+        """提交一次计算任务,立即返回任务信息"""
+        request = request or CalculateJobRequest()
+        job_id = uuid.uuid4().hex[:12]
+        work_dir = cls._work_dir(job_id)
+        os.makedirs(work_dir, exist_ok=True)
+
+        # 写出当前模型的快照作为本次计算的输入文件
+        async with ModelStore.read() as INP:
+            INP.write_file(os.path.join(work_dir, "swmm.inp"), encoding=ENCODING)
+
+        job = CalculateJobModel(
+            id=job_id, created_at=datetime.now(), stepping=request.stepping
+        )
+        cls._jobs[job_id] = job
+        cls._tasks[job_id] = asyncio.create_task(cls._run(job, request))
+        cls._prune()
+        swmm_logger.info(f"计算任务已提交: {job_id}")
+        return job
+
+    @classmethod
+    async def wait(cls, job_id: str) -> CalculateJobModel:
+        """等待计算任务结束并返回任务信息"""
+        task = cls._tasks.get(job_id)
+        if task is not None:
+            # shield: 调用方(如断开的请求)被取消时,计算任务本身继续进行
+            await asyncio.shield(task)
+        return cls._jobs[job_id]
+
+    @classmethod
+    async def _run(cls, job: CalculateJobModel, request: CalculateJobRequest) -> None:
+        work_dir = cls._work_dir(job.id)
+        inp_path = os.path.join(work_dir, "swmm.inp")
+        rpt_path = os.path.join(work_dir, "swmm.rpt")
+        out_path = os.path.join(work_dir, "swmm.out")
+        # 工作目录仍为原模型所在目录,保证 INP 中引用的相对路径文件可以找到
+        working_dir = os.path.dirname(os.path.abspath(SWMM_FILE_INP_PATH))
+
+        try:
+            async with cls._get_semaphore():
+                job.status = CalculateJobStatus.RUNNING
+                job.started_at = datetime.now()
+                start = time.perf_counter()
+                cls._notify(job, "progress")
+                loop = asyncio.get_running_loop()
+                try:
+                    if request.stepping:
+                        error = await cls._run_stepping(
+                            job, request, inp_path, rpt_path, out_path, working_dir
+                        )
+                    else:
+                        error = await loop.run_in_executor(
+                            cls._get_executor(),
+                            run_swmm_process,
+                            inp_path,
+                            rpt_path,
+                            out_path,
+                            working_dir,
+                        )
+                except Exception as e:
+                    # 进程池本身出错(如子进程异常退出)
+                    error = str(e)
+                job.duration = round(time.perf_counter() - start, 3)
+                job.finished_at = datetime.now()
+
+            if error is None:
+                await cls._summarize(out_path)
+                job.out_path = cls._publish(job, rpt_path, out_path)
+                job.progress = 100.0
+                job.status = CalculateJobStatus.SUCCESS
+                swmm_logger.info(f"计算任务完成: {job.id} ({job.duration}s)")
+            else:
+                job.error = format_run_error(error)
+                job.status = CalculateJobStatus.FAILED
+                swmm_logger.error(f"计算任务失败: {job.id}: {job.error}")
+        except Exception as e:
+            job.error = f"计算时发生错误: {e}"
+            job.status = CalculateJobStatus.FAILED
+            job.finished_at = job.finished_at or datetime.now()
+            swmm_logger.error(f"计算任务失败: {job.id}: {e}")
+        finally:
+            cls._notify(job, "end")
+            for subscriber in cls._subscribers.pop(job.id, []):
+                subscriber.put_nowait(None)
+
+    @classmethod
+    async def _run_stepping(
+        cls,
+        job: CalculateJobModel,
+        request: CalculateJobRequest,
+        inp_path: str,
+        rpt_path: str,
+        out_path: str,
+        working_dir: str,
+    ) -> Optional[str]:
+        """逐步计算,同时把子进程回传的进度更新到任务并推送给订阅者"""
+        loop = asyncio.get_running_loop()
+        progress_queue = cls._get_mp_manager().Queue()
+        future = loop.run_in_executor(
+            cls._get_executor(),
+            run_swmm_stepping_process,
+            inp_path,
+            rpt_path,
+            out_path,
+            working_dir,
+            progress_queue,
+            request.nodes,
+            request.links,
+            SwmmConfig.SIMULATION_PROGRESS_INTERVAL_MS / 1000,
+        )
+        while True:
+            # 队列的 get 会阻塞,放到线程中等待;子进程异常退出时不会推送结束标记,
+            # 因此带超时等待,并检查计算是否已经结束
+            try:
+                item = await loop.run_in_executor(None, progress_queue.get, True, 1)
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            if item is None:
+                break
+            job.progress = item["progress"]
+            job.sim_time = item["sim_time"]
+            cls._notify(job, "progress", nodes=item["nodes"], links=item["links"])
+        return await future
+
+    @classmethod
+    async def run_scenario(cls, inp_path: str, links: List[str]) -> dict:
+        """
+        在进程池中计算单个情景(与计算任务共用进程池和并发限制),返回结果汇总
+
+        结果文件保留在 inp_path 所在目录,不会发布为当前结果
+        """
+        work_dir = os.path.dirname(inp_path)
+        # 工作目录仍为原模型所在目录,保证 INP 中引用的相对路径文件可以找到
+        working_dir = os.path.dirname(os.path.abspath(SWMM_FILE_INP_PATH))
+        async with cls._get_semaphore():
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(
+                    cls._get_executor(),
+                    run_scenario_process,
+                    inp_path,
+                    os.path.join(work_dir, "swmm.rpt"),
+                    os.path.join(work_dir, "swmm.out"),
+                    working_dir,
+                    links,
+                )
+            except Exception as e:
+                result = {"error": str(e)}
+        if result["error"] is not None:
+            result["error"] = format_run_error(result["error"])
+        return result
+
+    @classmethod
+    def _notify(cls, job: CalculateJobModel, event: str, **extra) -> None:
+        """向订阅该任务的客户端推送事件"""
+        subscribers = cls._subscribers.get(job.id)
+        if not subscribers:
+            return
+        message = {"event": event, "job": job.model_dump(mode="json"), **extra}
+        for subscriber in subscribers:
+            subscriber.put_nowait(message)
+
+    @classmethod
+    def subscribe(cls, job_id: str) -> asyncio.Queue:
+        """订阅任务进度,任务结束时队列中会放入 None"""
+        subscriber = asyncio.Queue()
+        cls._subscribers.setdefault(job_id, []).append(subscriber)
+        return subscriber
+
+    @classmethod
+    def unsubscribe(cls, job_id: str, subscriber: asyncio.Queue) -> None:
+        subscribers = cls._subscribers.get(job_id, [])
+        if subscriber in subscribers:
+            subscribers.remove(subscriber)
+
+    @classmethod
+    async def _summarize(cls, out_path: str) -> None:
+        """在进程池中预先计算结果统计并保存在结果文件旁边,失败时留待查询时再计算"""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(cls._get_executor(), write_summary, out_path)
+        except Exception as e:
+            swmm_logger.warning(f"计算结果统计失败: {out_path}: {e}")
+
+    @classmethod
+    def _publish(cls, job: CalculateJobModel, rpt_path: str, out_path: str) -> str:
+        """把任务结果发布为当前结果,返回结果文件最终所在路径"""
+        if cls._published_at is not None and cls._published_at > job.created_at:
+            return out_path
+        # 先丢弃旧结果的缓存,再原子替换结果文件
+        OutStore.invalidate()
+        os.replace(out_path, SWMM_FILE_OUT_PATH)
+        # 结果统计记录了 .out 的 mtime/size,os.replace 不改变二者,统计随结果一起发布
+        if os.path.exists(summary_path(out_path)):
+            os.replace(summary_path(out_path), summary_path(SWMM_FILE_OUT_PATH))
+        if os.path.exists(rpt_path):
+            os.replace(rpt_path, SWMM_FILE_RPT_PATH)
+        cls._published_at = job.created_at
+        return os.path.abspath(SWMM_FILE_OUT_PATH)
+
+    @classmethod
+    def _prune(cls) -> None:
+        """超出保留数量时,清理最早结束的任务及其工作目录"""
+        finished = [
+            job
+            for job in cls._jobs.values()
+            if job.status in (CalculateJobStatus.SUCCESS, CalculateJobStatus.FAILED)
+        ]
+        excess = len(cls._jobs) - SwmmConfig.SIMULATION_JOB_HISTORY
+        for job in finished[: max(excess, 0)]:
+            cls._jobs.pop(job.id, None)
+            cls._tasks.pop(job.id, None)
+            shutil.rmtree(cls._work_dir(job.id), ignore_errors=True)
+
+    @classmethod
+    def get(cls, job_id: str) -> Optional[CalculateJobModel]:
+        return cls._jobs.get(job_id)
+
+    @classmethod
+    def list(cls) -> List[CalculateJobModel]:
+        """按提交时间倒序返回全部任务"""
+        return list(reversed(cls._jobs.values()))
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭进程池,未开始的计算将被取消"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+        if cls._mp_manager is not None:
+            cls._mp_manager.shutdown()
+            cls._mp_manager = None
@@ -0,0 +1,80 @@
+from typing import Dict, List, Mapping, Tuple
+
+
+class TopologyIndex:
+    """
+    渠道拓扑索引
+
+    - 节点 -> 与之相连的渠道
+    - 无序起终点对 -> 连接这两个节点的渠道
+
+    由 ModelStore.topology() 按模型构建并缓存,修改渠道或节点名称的接口在同一次
+    mutate() 中调用 add / remove / rename_node 增量维护,查询均为 O(1)。
+    集合用 dict 保存(值为 None),保持与 INP 中渠道相同的先后顺序
+    """
+
+    def __init__(self):
+        self._endpoints: Dict[str, Tuple[str, str]] = {}
+        self._node_links: Dict[str, Dict[str, None]] = {}
+        self._pair_links: Dict[frozenset, Dict[str, None]] = {}
+
+    @classmethod
+    def from_conduits(cls, conduits: Mapping) -> "TopologyIndex":
+        """由 INP 的 [CONDUITS] 构建索引"""
+        index = cls()
+        for conduit in conduits.values():
+            index.add(conduit.name, conduit.from_node, conduit.to_node)
+        return index
+
+    def add(self, link: str, from_node: str, to_node: str) -> None:
+        """登记渠道,同名渠道已存在时先移除旧的记录"""
+        if link in self._endpoints:
+            self.remove(link)
+        self._endpoints[link] = (from_node, to_node)
+        for node in (from_node, to_node):
+            self._node_links.setdefault(node, {})[link] = None
+        self._pair_links.setdefault(frozenset((from_node, to_node)), {})[link] = None
+
+    def remove(self, link: str) -> None:
+        """移除渠道,渠道不存在时忽略"""
+        endpoints = self._endpoints.pop(link, None)
+        if endpoints is None:
+            return
+        for node in endpoints:
+            links = self._node_links.get(node)
+            if links is not None:
+                links.pop(link, None)
+                if not links:
+                    del self._node_links[node]
+        pair = frozenset(endpoints)
+        links = self._pair_links.get(pair)
+        if links is not None:
+            links.pop(link, None)
+            if not links:
+                del self._pair_links[pair]
+
+    def links_of(self, node: str) -> List[str]:
+        """与节点相连的全部渠道"""
+        return list(self._node_links.get(node, ()))
+
+    def links_between(self, node_a: str, node_b: str) -> List[str]:
+        """连接两个节点的渠道(不区分方向)"""
+        return list(self._pair_links.get(frozenset((node_a, node_b)), ()))
+
+    def rename_node(self, old: str, new: str, conduits: Mapping) -> List[str]:
+        """
+        节点改名:同步修改 conduits 中相连渠道的起点/终点名称并更新索引,
+        返回被修改的渠道名称
+        """
+        links = self.links_of(old)
+        for link in links:
+            conduit = conduits[link]
+            if conduit.from_node == old:
+                conduit.from_node = new
+            elif conduit.to_node == old:
+                conduit.to_node = new
+            self.add(link, conduit.from_node, conduit.to_node)
+        return links
+
+    def __len__(self) -> int:
+        return len(self._endpoints)
@@ -1,10 +1,21 @@
 from functools import wraps
-from fastapi import HTTPException
+from typing import Annotated, Optional
+from fastapi import Header, HTTPException
 from schemas.timeseries import TIMESERIES_PREFIXES_MAP
 from schemas.result import Result
 from utils.logger import api_logger, tools_logger
 
 
+# 修改接口的 If-Match 请求头,携带客户端读取时的模型版本号,版本不一致时返回 412
+IfMatchHeader = Annotated[
+    Optional[str],
+    Header(
+        alias="If-Match",
+        description="模型版本号(来自响应中的 version 字段),不传或为 * 时不校验",
+    ),
+]
+
+
 # 定义给API函数的异常处理装饰器
 def with_exception_handler(default_message="操作失败,发生未知错误"):
     def decorator(func):